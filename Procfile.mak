@@ -1 +1,2 @@
-web: kenyarentalhub_api.wsgi:application
+web: gunicorn -c gunicorn.conf.py
+worker: python manage.py process_payment_webhooks --forever
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import User, Profile, Property, RentalApplication, Payment, Review
+from .models import User, Profile, Property, RentalApplication, Payment, PaymentLedger, PaymentWebhookEvent, Review
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
@@ -18,6 +18,17 @@ class RentalApplicationAdmin(admin.ModelAdmin):
     list_display = ("tenant", "property", "status", "created_at")
     list_filter = ("status",)
 
+@admin.register(PaymentLedger)
+class PaymentLedgerAdmin(admin.ModelAdmin):
+    list_display = ("tenant", "property", "payment_count", "total_paid", "last_payment_at")
+    readonly_fields = ("payment_count", "total_paid", "last_payment_at", "last_payment_amount")
+
+@admin.register(PaymentWebhookEvent)
+class PaymentWebhookEventAdmin(admin.ModelAdmin):
+    list_display = ("event_id", "transaction_id", "status", "received_at", "processed_at", "result")
+    list_filter = ("status", "result")
+    search_fields = ("event_id", "transaction_id")
+
 admin.site.register(Profile)
 admin.site.register(Payment)
 admin.site.register(Review)
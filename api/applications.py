@@ -0,0 +1,75 @@
+"""
+Batch status changes for rental applications.
+
+Ownership of the whole id set is checked with one locking SELECT, and the
+change itself is a single UPDATE, all in one transaction. With
+``reject_others`` each approved application also rejects every other open
+application for the same property ("approve one, reject the rest").
+"""
+from django.db import transaction
+
+from .cache import invalidate_tags
+from .models import RentalApplication
+
+STATUSES = ("pending", "approved", "rejected")
+MAX_BATCH = 500
+
+
+def bulk_update_status(landlord, ids, new_status, reject_others=False, using="default"):
+    """
+    Set ``new_status`` on the applications in ``ids`` owned by ``landlord``.
+
+    Returns a list of ``{"id", "result", "status"}`` in request order, where
+    result is ``updated``, ``unchanged``, ``not_found`` (missing or someone
+    else's), or ``auto_rejected`` for applications rejected by
+    ``reject_others``. Raises ValueError when ``reject_others`` would approve
+    two applications for the same property.
+    """
+    if new_status not in STATUSES:
+        raise ValueError(f"Invalid status {new_status!r}.")
+    if reject_others and new_status != "approved":
+        raise ValueError("reject_others only applies when approving.")
+    ids = list(dict.fromkeys(ids))
+
+    with transaction.atomic(using=using):
+        owned = {
+            pk: (property_id, current)
+            for pk, property_id, current in RentalApplication.objects.using(using)
+            .select_for_update(of=("self",))
+            .filter(pk__in=ids, property__landlord=landlord)
+            .values_list("pk", "property_id", "status")
+        }
+        property_ids = [property_id for property_id, _status in owned.values()]
+        if reject_others and len(set(property_ids)) != len(property_ids):
+            raise ValueError("Only one application per property can be approved.")
+
+        changed = [pk for pk, (_property_id, current) in owned.items() if current != new_status]
+        if changed:
+            RentalApplication.objects.using(using).filter(pk__in=changed).update(status=new_status)
+
+        rejected = []
+        if reject_others and owned:
+            others = (RentalApplication.objects.using(using)
+                      .select_for_update(of=("self",))
+                      .filter(property_id__in=property_ids)
+                      .exclude(pk__in=list(owned))
+                      .exclude(status="rejected"))
+            rejected = list(others.values_list("pk", flat=True))
+            if rejected:
+                RentalApplication.objects.using(using).filter(pk__in=rejected).update(status="rejected")
+
+        # QuerySet.update() sends no post_save, so invalidate by hand
+        touched = changed + rejected
+        if touched:
+            invalidate_tags("applications", *(f"application:{pk}" for pk in touched), using=using)
+
+    changed_set = set(changed)
+    results = []
+    for pk in ids:
+        if pk not in owned:
+            results.append({"id": pk, "result": "not_found", "status": None})
+        else:
+            result = "updated" if pk in changed_set else "unchanged"
+            results.append({"id": pk, "result": result, "status": new_status})
+    results.extend({"id": pk, "result": "auto_rejected", "status": "rejected"} for pk in rejected)
+    return results
@@ -0,0 +1,210 @@
+"""
+Async read paths for the busiest public endpoints.
+
+``GET /api/properties/``, ``/api/properties/<pk>/`` and ``/api/reviews/`` are
+served by async views when ``settings.ASYNC_READ_VIEWS`` is on (under an
+ASGI worker, see gunicorn.conf.py). They reuse the viewsets' querysets,
+serializers, pagination, response cache and ETags, but do their database work
+with the async ORM (``acount``, ``aiterator``, ``aget``), so a worker holds
+many slow clients without a thread per request. Only the viewset's
+``initial()`` (authentication, permissions, throttles) runs in a thread, as on
+the sync path. Rows are ``.values()`` dicts through the viewsets' FastReadMixin
+row serializers. The cache keys and ETags come from the same helpers in
+api/mixins.py as the sync mixins'.
+
+Anything the async path does not cover (writes, authenticated requests, the
+browsable API, cursor pagination, ``?count=``, ``?stream=``) is handed to the
+regular DRF view, so the API behaves the same either way; only JSON bodies are
+built here.
+"""
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.paginator import InvalidPage
+from django.http import Http404, HttpResponse
+from rest_framework.exceptions import APIException, NotAcceptable, NotFound
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from .cache import entry_timeout
+from .mixins import (
+    CachedReadMixin, ConditionalGetMixin, StreamingListMixin, conditional_validators, fingerprint_cache_key,
+    not_modified_response, read_cache_tags, response_cache_key, set_validators,
+)
+from .pagination import HybridPagination, KeysetPagination
+from .replicas import use_replica
+from .views import PropertyViewSet, ReviewViewSet
+
+LIST_ACTIONS = {"get": "list", "post": "create"}
+DETAIL_ACTIONS = {"get": "retrieve", "put": "update", "patch": "partial_update", "delete": "destroy"}
+# Pagination modes that need the sync paginator (keyset pages, counts on demand), and streamed lists
+SYNC_ONLY_PARAMS = (HybridPagination.mode_query_param, KeysetPagination.cursor_query_param,
+                    KeysetPagination.count_query_param, StreamingListMixin.stream_query_param)
+
+
+def serves_async(request):
+    """Whether the async path can answer ``request`` exactly as the DRF view would."""
+    if request.method not in ("GET", "HEAD"):
+        return False
+    # A bad token must still get its 401 from the authenticators
+    if "Authorization" in request.headers:
+        return False
+    return not any(param in request.GET for param in SYNC_ONLY_PARAMS)
+
+
+async def paginate(view, queryset):
+    """HybridPagination's page-number mode, counting and fetching with the async ORM."""
+    paginator, request = view.paginator, view.request
+    page_size = paginator.get_page_size(request)
+    django_paginator = paginator.django_paginator_class(queryset, page_size)
+    django_paginator.count = await queryset.acount()
+    page_number = paginator.get_page_number(request, django_paginator)
+    try:
+        number = django_paginator.validate_number(page_number)
+    except InvalidPage as exc:
+        raise NotFound(paginator.invalid_page_message.format(page_number=page_number, message=str(exc)))
+    start = (number - 1) * page_size
+    rows = [obj async for obj in queryset[start:start + page_size].aiterator()]
+    paginator.keyset = None
+    paginator.page = django_paginator._get_page(rows, number, django_paginator)
+    paginator.request = request
+    return rows
+
+
+async def list_response(view):
+    queryset = view.filter_queryset(view.get_queryset())
+    row_serializer = view.get_row_serializer(queryset)
+    if row_serializer is not None:
+        rows = await paginate(view, view.values_queryset(row_serializer, queryset))
+        data = row_serializer.many(rows)
+    else:
+        rows = await paginate(view, queryset)
+        data = view.get_serializer(rows, many=True).data
+    return view.paginator.get_paginated_response(data)
+
+
+async def retrieve_response(view):
+    lookup = view.kwargs[view.lookup_url_kwarg or view.lookup_field]
+    queryset = view.filter_queryset(view.get_queryset())
+    model = queryset.model
+    row_serializer = view.get_row_serializer(queryset)
+    try:
+        if row_serializer is not None:
+            row = await row_serializer.values(queryset).aget(**{view.lookup_field: lookup})
+        else:
+            instance = await queryset.aget(**{view.lookup_field: lookup})
+    except (model.DoesNotExist, TypeError, ValueError):
+        raise Http404(f"No {model._meta.object_name} matches the given query.")
+    if row_serializer is not None:
+        return Response(row_serializer.to_representation(row))
+    return Response(view.get_serializer(instance).data)
+
+
+async def read_response(view):
+    """The viewset's list/retrieve, through its CachedReadMixin/ConditionalGetMixin layers."""
+    request, action = view.request, view.action
+    handler = list_response if action == "list" else retrieve_response
+
+    async def respond():
+        if not isinstance(view, CachedReadMixin):
+            return await handler(view)
+        key = await sync_to_async(response_cache_key)(view)
+        data = await cache.aget(key)
+        if data is not None:
+            return Response(data)
+        response = await handler(view)
+        if response.status_code == 200:
+            timeout = await sync_to_async(entry_timeout)(read_cache_tags(view), view.cache_timeout)
+            await cache.aset(key, response.data, timeout)
+        return response
+
+    if not isinstance(view, ConditionalGetMixin):
+        return await respond()
+    last, count = await fingerprint(view)
+    if not count:
+        return await respond()
+    etag, last_modified = conditional_validators(request, last, count)
+    response = not_modified_response(request, etag, last_modified, action == "retrieve")
+    if response is None:
+        response = await respond()
+    return set_validators(response, etag, last_modified)
+
+
+async def fingerprint(view):
+    """ConditionalGetMixin.get_fingerprint with aaggregate/afirst."""
+    async def compute():
+        if view.action == "list":
+            row = await view.fingerprint_queryset().order_by().aaggregate(**view.fingerprint_aggregates())
+            return row["last"], row["count"]
+        try:
+            last = await view.object_fingerprint_queryset().afirst()
+        except (TypeError, ValueError):
+            last = None
+        return last, int(last is not None)
+
+    tags = read_cache_tags(view)
+    if not tags:
+        return await compute()
+    key = await sync_to_async(fingerprint_cache_key)(view)
+    sentinel = object()
+    value = await cache.aget(key, sentinel)
+    if value is sentinel:
+        value = await compute()
+        timeout = await sync_to_async(entry_timeout)(tags, getattr(view, "cache_timeout", None))
+        await cache.aset(key, value, timeout)
+    return value
+
+
+def async_read_view(viewset_class, actions, basename, detail):
+    """
+    An async view for a router route: GETs it can serve run on the async
+    ORM, everything else goes to the viewset's own (sync) view.
+    """
+    sync_view = viewset_class.as_view(dict(actions), basename=basename, detail=detail)
+    sync_handler = sync_to_async(sync_view)
+
+    async def view(request, *args, **kwargs):
+        if not serves_async(request):
+            return await sync_handler(request, *args, **kwargs)
+        # What ViewSetMixin.as_view() and APIView.dispatch() set up
+        viewset = viewset_class(basename=basename, detail=detail)
+        viewset.action_map = {**actions, "head": actions["get"]}
+        for method, action in viewset.action_map.items():
+            setattr(viewset, method, getattr(viewset, action))
+        viewset.args, viewset.kwargs, viewset.format_kwarg = args, kwargs, None
+        drf_request = viewset.initialize_request(request, *args, **kwargs)
+        viewset.request, viewset.headers = drf_request, viewset.default_response_headers
+        try:
+            renderer, _media_type = viewset.perform_content_negotiation(drf_request)
+        except NotAcceptable:
+            renderer = None
+        if not isinstance(renderer, JSONRenderer):
+            return await sync_handler(request, *args, **kwargs)
+        # ReplicaReadMixin.initial() picks the replica in the worker thread;
+        # sync_to_async copies it back here, and the block scopes it to this request
+        with use_replica(None):
+            try:
+                # Authentication, permissions, throttles and negotiation, as on the sync path
+                await sync_to_async(viewset.initial)(drf_request, *args, **kwargs)
+                viewset.__dict__.pop("_replica_token", None)  # only resettable in that thread's context
+                response = await read_response(viewset)
+            except (APIException, Http404) as exc:
+                response = viewset.handle_exception(exc)
+        response = viewset.finalize_response(drf_request, response, *args, **kwargs)
+        if not isinstance(response, Response):  # 304 Not Modified
+            return response
+        # Render here: Django would otherwise hop to a thread to do it
+        response.render()
+        rendered = HttpResponse(response.content, status=response.status_code)
+        for header, value in response.items():
+            rendered[header] = value
+        return rendered
+
+    # Same attributes as the DRF view, for CSRF handling and metrics labels
+    view.csrf_exempt = True
+    view.cls, view.actions = viewset_class, actions
+    return view
+
+
+property_list = async_read_view(PropertyViewSet, LIST_ACTIONS, "property", detail=False)
+property_detail = async_read_view(PropertyViewSet, DETAIL_ACTIONS, "property", detail=True)
+review_list = async_read_view(ReviewViewSet, LIST_ACTIONS, "review", detail=False)
@@ -0,0 +1,137 @@
+"""
+JWT authentication without a user query per request.
+
+Access tokens carry the user's ``role``, ``username`` and ``token_version``
+(``ver``). With ``settings.JWT_STATELESS_AUTH`` on, StatelessJWTAuthentication
+builds ``request.user`` from those claims as a TokenUser, which is all
+IsLandlord/IsTenant and the role-scoped querysets read. Revocation
+(``token_version``), deactivation and role changes are checked against a
+small TTL-bounded in-process cache of user rows, which also supplies any other
+field a view reads. A process therefore queries a user at most once per
+``AUTH_USER_CACHE_TTL``, and a revoked token stops working within that window
+(at once in the process that revoked it). With the setting off, tokens are
+authenticated against a fresh user query, and ``ver`` is still checked
+against it, so revocation applies immediately either way.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings
+
+ROLE_CLAIM = "role"
+USERNAME_CLAIM = "username"
+VERSION_CLAIM = "ver"
+
+
+class UserCache:
+    """Thread-safe LRU of user rows (attname -> value dicts), each kept for ``ttl`` seconds."""
+
+    def __init__(self, ttl=None, max_entries=None):
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._rows = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def ttl(self):
+        return self._ttl if self._ttl is not None else getattr(settings, "AUTH_USER_CACHE_TTL", 30)
+
+    @property
+    def max_entries(self):
+        return self._max_entries or getattr(settings, "AUTH_USER_CACHE_SIZE", 1000)
+
+    def get(self, user_id):
+        """The user's row, or None if there is no such user. Queries only on a miss."""
+        from .models import User
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._rows.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._rows.move_to_end(user_id)
+                return entry[1]
+        attnames = [f.attname for f in User._meta.concrete_fields]
+        row = User.objects.filter(pk=user_id).values(*attnames).first()
+        with self._lock:
+            self._rows[user_id] = (now + self.ttl, row)
+            self._rows.move_to_end(user_id)
+            while len(self._rows) > self.max_entries:
+                self._rows.popitem(last=False)
+        return row
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._rows.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._rows.clear()
+
+
+user_cache = UserCache()
+
+
+def token_user(user_id, username, role, token_version):
+    """A TokenUser holding the claimed fields; the rest are deferred."""
+    from .models import TokenUser
+
+    claimed = {"id": user_id, "username": username, "role": role, "token_version": token_version}
+    fields = [f.attname for f in TokenUser._meta.concrete_fields if f.attname in claimed]
+    return TokenUser.from_db("default", fields, [claimed[name] for name in fields])
+
+
+class RoleTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Issues tokens carrying the claims StatelessJWTAuthentication needs."""
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token[ROLE_CLAIM] = user.role
+        token[USERNAME_CLAIM] = user.username
+        token[VERSION_CLAIM] = user.token_version
+        return token
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that, when ``settings.JWT_STATELESS_AUTH`` is on,
+    authenticates from the token's claims and the user cache instead of a
+    user query. Tokens without the claims (issued before they were added)
+    get a full user built from the cache. Either way a token whose ``ver``
+    is not the user's current ``token_version`` is rejected.
+    """
+
+    def get_user(self, validated_token):
+        if not getattr(settings, "JWT_STATELESS_AUTH", False):
+            user = super().get_user(validated_token)
+            version = validated_token.get(VERSION_CLAIM)
+            if version is not None and version != user.token_version:
+                raise AuthenticationFailed(_("Token has been revoked"), code="token_revoked")
+            return user
+        try:
+            user_id = int(validated_token[api_settings.USER_ID_CLAIM])
+        except (KeyError, TypeError, ValueError) as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        row = user_cache.get(user_id)
+        if row is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if api_settings.CHECK_USER_IS_ACTIVE and not row["is_active"]:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        role = validated_token.get(ROLE_CLAIM)
+        version = validated_token.get(VERSION_CLAIM)
+        if role is None or version is None:
+            from .models import User
+
+            return User.from_db("default", list(row), list(row.values()))
+        if version != row["token_version"] or role != row["role"]:
+            raise AuthenticationFailed(_("Token has been revoked"), code="token_revoked")
+        # The row, not the claim: a rename shows up without a new token
+        return token_user(user_id, row["username"], role, version)
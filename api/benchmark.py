@@ -0,0 +1,380 @@
+"""
+Endpoint benchmarks.
+
+run_benchmarks() drives a fixed set of API and HTML scenarios, either
+in-process through the Django test client (which also counts queries per
+request) or over HTTP against a running server (``base_url``, e.g. a local
+gunicorn, optionally with concurrent clients). Each scenario reports latency
+percentiles, queries per request and requests per second. By default the
+response cache is warm, as in production; ``cold=True`` clears it before every
+request to measure the uncached path. Results are plain dicts, written to and
+compared against the JSON baselines in ``benchmarks/``.
+
+run_slow_clients() measures worker capacity instead: while N slow clients
+trickle their requests to a running server, how long does a normal request
+take? Sync (WSGI) workers are held by each slow client in turn; ASGI workers
+wait on them in the event loop.
+
+run_serializer_benchmarks() is a micro-benchmark of the list serializers
+alone: the ModelSerializers over model instances against their compiled
+row plans over ``values()`` rows (api/rows.py), per 1,000 rows.
+"""
+import asyncio
+import json
+import platform
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from .seed import SEED_PASSWORD
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    path: str
+    user: str = "anonymous"  # anonymous, tenant or landlord
+
+
+SCENARIOS = (
+    Scenario("properties_list", "/api/properties/"),
+    Scenario("properties_available", "/api/properties/?is_available=true"),
+    Scenario("properties_filtered", "/api/properties/?category=apartment&min_price=20000&max_price=60000"),
+    Scenario("properties_search", "/api/properties/?q=kilimani"),
+    Scenario("properties_nearby", "/api/properties/?lat=-1.2864&lng=36.8172&radius_km=5&ordering=distance"),
+    Scenario("properties_facets", "/api/properties/facets/"),
+    Scenario("property_retrieve", "/api/properties/{property}/"),
+    Scenario("applications_tenant", "/api/applications/", user="tenant"),
+    Scenario("applications_landlord", "/api/applications/", user="landlord"),
+    Scenario("payments_tenant", "/api/payments/", user="tenant"),
+    Scenario("reviews_list", "/api/reviews/"),
+    Scenario("home_page", "/"),
+    Scenario("property_detail_page", "/properties/{property}/"),
+    Scenario("property_detail_page_tenant", "/properties/{property}/", user="tenant"),
+)
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, round(q / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def benchmark_subjects():
+    """The busiest property, landlord and tenant: worst cases for the per-object pages."""
+    from .models import Property, RentalApplication
+
+    prop = Property.objects.order_by("-review_count", "-id").first()
+    landlord = (Property.objects.values("landlord").annotate(n=Count("pk"))
+                .order_by("-n").values_list("landlord", flat=True).first())
+    tenant = (RentalApplication.objects.values("tenant").annotate(n=Count("pk"))
+              .order_by("-n").values_list("tenant", flat=True).first())
+    return prop, landlord, tenant
+
+
+class InProcessDriver:
+    """Django test client; counts the queries of each request."""
+
+    def __init__(self, users, cold=False):
+        self.cold = cold
+        self.clients = {"anonymous": Client(raise_request_exception=False)}
+        for role, user in users.items():
+            client = Client(raise_request_exception=False)
+            client.force_login(user)
+            self.clients[role] = client
+        self.roles = set(self.clients)
+
+    def request(self, scenario, path):
+        if self.cold:
+            cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            response = self.clients[scenario.user].get(path)
+        return response.status_code, len(captured)
+
+
+class HttpDriver:
+    """
+    A running server. Users authenticate with a JWT, which the HTML views do
+    not read, so the tenant page scenario renders as anonymous there.
+    """
+
+    def __init__(self, base_url, users):
+        import requests
+
+        self.base_url = base_url.rstrip("/")
+        self.sessions = {"anonymous": requests.Session()}
+        for role, user in users.items():
+            session = requests.Session()
+            token = session.post(f"{self.base_url}/api/auth/token/",
+                                 data={"username": user.username, "password": SEED_PASSWORD}).json()
+            session.headers["Authorization"] = f"Bearer {token['access']}"
+            self.sessions[role] = session
+        self.roles = set(self.sessions)
+
+    def request(self, scenario, path):
+        response = self.sessions[scenario.user].get(self.base_url + path)
+        return response.status_code, None
+
+
+def run_scenario(driver, scenario, path, iterations, warmup, concurrency=1):
+    for _ in range(warmup):
+        driver.request(scenario, path)
+
+    def timed(_i):
+        start = time.perf_counter()
+        status, queries = driver.request(scenario, path)
+        return (time.perf_counter() - start) * 1000, status, queries
+
+    start = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(concurrency) as pool:
+            samples = list(pool.map(timed, range(iterations)))
+    else:
+        samples = [timed(i) for i in range(iterations)]
+    elapsed = time.perf_counter() - start
+
+    timings = sorted(ms for ms, _status, _queries in samples)
+    queries = [q for _ms, _status, q in samples if q is not None]
+    return {
+        "path": path,
+        "requests": iterations,
+        "errors": sum(1 for _ms, status, _q in samples if status >= 400),
+        "p50_ms": round(percentile(timings, 50), 2),
+        "p90_ms": round(percentile(timings, 90), 2),
+        "p99_ms": round(percentile(timings, 99), 2),
+        "queries": round(sum(queries) / len(queries), 2) if queries else None,
+        "rps": round(iterations / elapsed, 1),
+    }
+
+
+def run_benchmarks(iterations=50, warmup=5, base_url=None, concurrency=1, cold=False, plain_static=False,
+                   only=None, log=None):
+    """
+    Run the scenarios (``only``: names to keep). ``plain_static`` renders
+    pages without the staticfiles manifest, for checkouts where collectstatic
+    has not run. Returns ``{"meta": ..., "scenarios": {...}}``.
+    """
+    from .models import Property, User
+
+    prop, landlord_id, tenant_id = benchmark_subjects()
+    if prop is None:
+        raise ValueError("No properties to benchmark; run seed_data first.")
+    users = {role: User.objects.get(pk=pk) for role, pk in (("landlord", landlord_id), ("tenant", tenant_id)) if pk}
+    log = log or (lambda name, result: None)
+
+    overrides = {"ALLOWED_HOSTS": [*settings.ALLOWED_HOSTS, "testserver"]}  # the test client's host
+    if plain_static:
+        overrides["STORAGES"] = {
+            **settings.STORAGES,
+            "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+        }
+    with override_settings(**overrides):
+        driver = HttpDriver(base_url, users) if base_url else InProcessDriver(users, cold=cold)
+        results = {}
+        for scenario in SCENARIOS:
+            if (only and scenario.name not in only) or scenario.user not in driver.roles:
+                continue
+            path = scenario.path.format(property=prop.pk)
+            # The test client is not thread-safe; only HTTP runs are concurrent
+            results[scenario.name] = run_scenario(driver, scenario, path, iterations, warmup,
+                                                  concurrency if base_url else 1)
+            log(scenario.name, results[scenario.name])
+
+    return {
+        "meta": {
+            "driver": "http" if base_url else "in-process",
+            "concurrency": concurrency if base_url else 1,
+            "cache": "cold" if cold and not base_url else "warm",
+            "iterations": iterations,
+            "database": connection.vendor,
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "properties": Property.objects.count(),
+        },
+        "scenarios": results,
+    }
+
+
+async def _http_get(host, port, path, timeout, trickle=0.0, chunks=1):
+    """A raw HTTP/1.1 GET, optionally sent in ``chunks`` pieces over ``trickle`` seconds. Returns the status."""
+    request = (f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\nAccept: application/json\r\n"
+               f"Connection: close\r\n\r\n").encode("ascii")
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    try:
+        step = -(-len(request) // chunks)
+        for i in range(0, len(request), step):
+            writer.write(request[i:i + step])
+            await writer.drain()
+            if i + step < len(request):
+                await asyncio.sleep(trickle / (chunks - 1))
+        status_line = await asyncio.wait_for(reader.readline(), timeout)
+        await asyncio.wait_for(reader.read(), timeout)
+        return int(status_line.split()[1])
+    finally:
+        writer.close()
+
+
+async def _slow_client_round(host, port, path, clients, duration, hold, probe_timeout):
+    deadline = time.monotonic() + duration
+    slow = {"completed": 0, "errors": 0}
+    probes = []  # (ms, ok)
+
+    async def slow_client():
+        while time.monotonic() < deadline:
+            try:
+                status = await _http_get(host, port, path, hold + probe_timeout, trickle=hold, chunks=10)
+                slow["completed" if status < 400 else "errors"] += 1
+            except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+                slow["errors"] += 1
+
+    async def probe():
+        await asyncio.sleep(min(hold / 2, 1.0))  # let the slow clients connect first
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                ok = await _http_get(host, port, path, probe_timeout) < 400
+            except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+                ok = False
+            probes.append(((time.perf_counter() - start) * 1000, ok))
+
+    await asyncio.gather(probe(), *(slow_client() for _ in range(clients)))
+    return slow, probes
+
+
+def run_slow_clients(base_url, clients=(0, 10, 50, 200), path="/api/properties/", duration=10.0, hold=2.0,
+                     probe_timeout=10.0, log=None):
+    """
+    For each count in ``clients``, keep that many slow clients busy for
+    ``duration`` seconds (each request trickled over ``hold`` seconds, like
+    a phone on a poor connection) while one fast client requests ``path``
+    back to back. Returns ``{"meta": ..., "rounds": {count: {...}}}``.
+    """
+    url = urlsplit(base_url)
+    host, port = url.hostname, url.port or 80
+    log = log or (lambda count, result: None)
+    rounds = {}
+    for count in clients:
+        slow, probes = asyncio.run(_slow_client_round(host, port, path, count, duration, hold, probe_timeout))
+        timings = sorted(ms for ms, _ok in probes)
+        rounds[str(count)] = result = {
+            "slow_completed": slow["completed"],
+            "slow_errors": slow["errors"],
+            "probes": len(probes),
+            "probe_errors": sum(1 for _ms, ok in probes if not ok),
+            "probe_p50_ms": round(percentile(timings, 50), 2) if timings else None,
+            "probe_p99_ms": round(percentile(timings, 99), 2) if timings else None,
+        }
+        log(count, result)
+    return {
+        "meta": {"driver": "http", "path": path, "duration_s": duration, "hold_s": hold,
+                 "probe_timeout_s": probe_timeout, "python": platform.python_version()},
+        "rounds": rounds,
+    }
+
+
+def run_serializer_benchmarks(rows=1000, repeat=5, log=None):
+    """
+    Fetch and serialize the newest ``rows`` properties, applications,
+    payments and reviews both ways: the serializer over model instances
+    (loaded as EagerLoadingMixin would) and the row serializer over
+    ``values()``. Reports the best of ``repeat`` runs, scaled to 1,000 rows,
+    and whether both rendered to the same JSON bytes.
+    """
+    from rest_framework.renderers import JSONRenderer
+    from rest_framework.test import APIRequestFactory
+
+    from .mixins import eager_loading_plan
+    from .models import Payment, Property, RentalApplication, Review
+    from .rows import RowSerializer, row_plan
+    from .serializers import PaymentSerializer, PropertySerializer, RentalApplicationSerializer, ReviewSerializer
+
+    subjects = (
+        ("properties", PropertySerializer, Property.objects.order_by("-created_at")),
+        ("applications", RentalApplicationSerializer, RentalApplication.objects.order_by("-created_at")),
+        ("payments", PaymentSerializer, Payment.objects.order_by("-created_at", "-id")),
+        ("reviews", ReviewSerializer, Review.objects.order_by("-created_at")),
+    )
+    log = log or (lambda name, result: None)
+    renderer = JSONRenderer()
+
+    def best(fn):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            value = fn()
+            timings.append((time.perf_counter() - start) * 1000)
+        return min(timings), value
+
+    results = {}
+    # Image URLs are built against the request's host
+    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+        context = {"request": APIRequestFactory().get("/api/")}
+        for name, serializer_class, queryset in subjects:
+            select, prefetch, only = eager_loading_plan(serializer_class)
+            queryset = queryset.select_related(*select).prefetch_related(*prefetch)
+            if only:
+                queryset = queryset.only(*only)
+            row_serializer = RowSerializer(serializer_class(context=context), row_plan(serializer_class), queryset)
+
+            fetch_ms, instances = best(lambda: list(queryset[:rows]))
+            serialize_ms, data = best(lambda: serializer_class(instances, many=True, context=context).data)
+            row_fetch_ms, values = best(lambda: list(row_serializer.values(queryset)[:rows]))
+            row_serialize_ms, row_data = best(lambda: row_serializer.many(values))
+            scale = 1000 / max(len(instances), 1)
+            results[name] = result = {
+                "rows": len(instances),
+                "instances_fetch_ms": round(fetch_ms * scale, 2),
+                "instances_serialize_ms": round(serialize_ms * scale, 2),
+                "rows_fetch_ms": round(row_fetch_ms * scale, 2),
+                "rows_serialize_ms": round(row_serialize_ms * scale, 2),
+                "serialize_speedup": round(serialize_ms / row_serialize_ms, 1) if row_serialize_ms else None,
+                "total_speedup": round((fetch_ms + serialize_ms) / (row_fetch_ms + row_serialize_ms), 1),
+                "identical": renderer.render(data) == renderer.render(row_data),
+            }
+            log(name, result)
+    return {
+        "meta": {"rows": rows, "repeat": repeat, "database": connection.vendor,
+                 "python": platform.python_version(), "django": django.get_version()},
+        "serializers": results,
+    }
+
+
+def compare(results, baseline, tolerance=25.0):
+    """
+    Regressions of ``results`` against ``baseline``: ``[(scenario, metric,
+    baseline value, new value)]`` where p50/p90 latency grew by more than
+    ``tolerance`` percent or the query count grew at all.
+    """
+    regressions = []
+    for name, new in results["scenarios"].items():
+        old = baseline.get("scenarios", {}).get(name)
+        if old is None:
+            continue
+        for metric in ("p50_ms", "p90_ms"):
+            if old[metric] and new[metric] > old[metric] * (1 + tolerance / 100):
+                regressions.append((name, metric, old[metric], new[metric]))
+        if old.get("queries") is not None and new.get("queries") is not None and new["queries"] > old["queries"]:
+            regressions.append((name, "queries", old["queries"], new["queries"]))
+    return regressions
+
+
+def load_results(path):
+    with open(path, encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def save_results(results, path):
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(results, fh, indent=2, sort_keys=True)
+        fh.write("\n")
@@ -0,0 +1,157 @@
+"""
+Bulk property import and export.
+
+Imports are parsed row by row from the uploaded stream (CSV or JSON Lines),
+validated in chunks through PropertySerializer and written with one
+bulk_create per chunk (a save() per row where bulk_create returns no pks,
+as on MySQL), so memory stays bounded by the chunk size and a bad
+row is reported by its line number instead of aborting the whole file.
+Exports stream rows from a chunked iterator, never the full result set.
+"""
+import csv
+import json
+from pathlib import PurePath
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+
+from .cache import invalidate_tags
+from .geo import apply_geocoding
+from .listings import refresh_listings
+from .models import Property
+from .search import index_properties
+from .serializers import PropertySerializer
+
+FORMATS = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+EXTENSIONS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+IMPORT_FIELDS = ("name", "category", "description", "location", "price", "is_available")
+REQUIRED_COLUMNS = ("name", "category", "location", "price")
+EXPORT_FIELDS = (
+    "id", "landlord__username", "name", "category", "description", "location",
+    "latitude", "longitude", "price", "is_available", "created_at", "updated_at",
+)
+BATCH_SIZE = 500
+EXPORT_CHUNK_SIZE = 2000
+# Beyond this the report only counts errors; a broken 100k-row file should
+# not produce a 100k-entry response.
+MAX_REPORTED_ERRORS = 500
+
+
+def detect_format(filename, default=None):
+    return EXTENSIONS.get(PurePath(filename or "").suffix.lower(), default)
+
+
+# ---------- Import ----------
+def read_rows(stream, fmt):
+    """
+    Yield ``(line, data, error)`` for each record of a text stream. ``data``
+    only holds the importable columns; ``error`` is set for unparseable lines.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        missing = [c for c in REQUIRED_COLUMNS if c not in (reader.fieldnames or ())]
+        if missing:
+            raise ValueError(f"Missing column(s): {', '.join(missing)}")
+        for row in reader:
+            yield reader.line_num, {k: v for k, v in row.items() if k in IMPORT_FIELDS and v != ""}, None
+    elif fmt == "jsonl":
+        for line, text in enumerate(stream, 1):
+            if not text.strip():
+                continue
+            try:
+                row = json.loads(text)
+            except ValueError as exc:
+                yield line, None, f"Invalid JSON: {exc}"
+                continue
+            if not isinstance(row, dict):
+                yield line, None, "Expected a JSON object."
+                continue
+            yield line, {k: v for k, v in row.items() if k in IMPORT_FIELDS}, None
+    else:
+        raise ValueError(f"Unsupported format {fmt!r}; expected one of: {', '.join(FORMATS)}")
+
+
+def _write_batch(batch):
+    with transaction.atomic():
+        if not connection.features.can_return_rows_from_bulk_insert:
+            # MySQL's bulk_create leaves the pks unset; save() each row so its
+            # post_save signals index and list it
+            for prop in batch:
+                prop.save()
+            return len(batch)
+        created = Property.objects.bulk_create(batch)
+        # bulk_create sends no post_save, so index and list the new rows here
+        index_properties(created)
+        refresh_listings([prop.pk for prop in created], created=True)
+    return len(created)
+
+
+def import_properties(stream, fmt, landlord, batch_size=BATCH_SIZE, dry_run=False):
+    """
+    Import properties owned by ``landlord`` from a CSV/JSONL text stream.
+
+    Valid rows are written in batches of ``batch_size`` (each batch in its own
+    transaction); invalid rows are skipped and reported. Returns
+    ``{"rows", "created", "error_count", "errors": [{"line", "errors"}]}``.
+    """
+    report = {"rows": 0, "created": 0, "error_count": 0, "errors": []}
+
+    def reject(line, errors):
+        report["error_count"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"line": line, "errors": errors})
+
+    batch = []
+    for line, data, error in read_rows(stream, fmt):
+        report["rows"] += 1
+        if error:
+            reject(line, {"non_field_errors": [error]})
+            continue
+        serializer = PropertySerializer(data=data)
+        if not serializer.is_valid():
+            reject(line, serializer.errors)
+            continue
+        prop = Property(landlord=landlord, **serializer.validated_data)
+        apply_geocoding(prop)  # the pre_save signal does not run either
+        batch.append(prop)
+        if len(batch) >= batch_size:
+            report["created"] += len(batch) if dry_run else _write_batch(batch)
+            batch = []
+    if batch:
+        report["created"] += len(batch) if dry_run else _write_batch(batch)
+    if report["created"] and not dry_run:
+        invalidate_tags("properties")
+    return report
+
+
+# ---------- Export ----------
+class _Echo:
+    """File-like object whose write() hands back the line for a streaming response."""
+
+    def write(self, value):
+        return value
+
+
+def export_properties(queryset, fmt, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield the queryset as CSV or JSONL text, ``chunk_size`` rows at a time."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format {fmt!r}; expected one of: {', '.join(FORMATS)}")
+    header = [name.replace("landlord__username", "landlord") for name in EXPORT_FIELDS]
+    rows = queryset.order_by("pk").values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+    if fmt == "csv":
+        writer = csv.writer(_Echo())
+        encode = writer.writerow
+        yield encode(header)
+    else:
+        encoder = DjangoJSONEncoder()
+
+        def encode(row):
+            return encoder.encode(dict(zip(header, row))) + "\n"
+    lines = []
+    for row in rows:
+        lines.append(encode(row))
+        if len(lines) >= chunk_size:
+            yield "".join(lines)
+            lines = []
+    if lines:
+        yield "".join(lines)
@@ -0,0 +1,100 @@
+"""
+Tag-versioned caching.
+
+Every cache entry's key embeds the current version of each tag it depends on
+(``properties``, ``property:42``...). Invalidating a tag bumps its version, so
+all entries built from it stop being addressable at once and age out of the
+backend on their own: no key scanning, and it works the same on Redis and on
+the in-process LRU backend.
+
+Entries built from a read replica (see api/replicas.py) get keys of their
+own, so a client pinned to the primary after a write never sees them. A
+replica read just after a write may still return the old rows; entries built
+then are only kept for ``REPLICA_STICKY_SECONDS`` (see entry_timeout).
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .replicas import read_alias
+
+TAG_KEY = "tag:{}"
+WRITTEN_KEY = "tag-written:{}"
+
+
+def _fresh_version():
+    # Seeded from the clock rather than 1, so a tag evicted from an LRU backend
+    # never comes back at a version some stale entry was built with.
+    return time.time_ns()
+
+
+def tag_versions(tags):
+    """Current version of each tag (created on first use)."""
+    keys = [TAG_KEY.format(tag) for tag in tags]
+    found = cache.get_many(keys)
+    versions = []
+    for key in keys:
+        if key not in found:
+            cache.add(key, _fresh_version(), timeout=None)
+            found[key] = cache.get(key, 0)
+        versions.append(found[key])
+    return versions
+
+
+def cache_key(prefix, *parts, tags=()):
+    """Build a key for ``parts`` that changes whenever one of ``tags`` is invalidated."""
+    raw = "|".join([*map(str, parts), *(f"{t}={v}" for t, v in zip(tags, tag_versions(tags)))])
+    if read_alias.get():
+        raw += "|replica"
+    return f"{prefix}:{hashlib.md5(raw.encode('utf-8')).hexdigest()}"
+
+
+def _bump(tags):
+    for tag in tags:
+        try:
+            cache.incr(TAG_KEY.format(tag))
+        except ValueError:
+            cache.add(TAG_KEY.format(tag), _fresh_version(), timeout=None)
+
+
+def invalidate_tags(*tags, using="default"):
+    """
+    Invalidate every entry built from ``tags``. The bump is repeated once the
+    surrounding transaction commits, so a reader that re-cached the old rows
+    in between is invalidated too.
+    """
+    _bump(tags)
+    transaction.on_commit(lambda: _committed(tags), using=using)
+
+
+def _committed(tags):
+    _bump(tags)
+    if getattr(settings, "DATABASE_REPLICAS", None):
+        lag = getattr(settings, "REPLICA_STICKY_SECONDS", 10)
+        cache.set_many({WRITTEN_KEY.format(tag): True for tag in tags}, lag)
+
+
+def entry_timeout(tags, timeout):
+    """
+    How long to keep an entry built from ``tags``: ``timeout``, unless it was
+    read from a replica that may not have caught up with a recent write yet.
+    """
+    if not read_alias.get() or not tags:
+        return timeout
+    if cache.get_many([WRITTEN_KEY.format(tag) for tag in tags]):
+        lag = getattr(settings, "REPLICA_STICKY_SECONDS", 10)
+        return lag if timeout is None else min(timeout, lag)
+    return timeout
+
+
+def get_or_set(key, default, timeout=None, tags=()):
+    """cache.get_or_set that also caches falsy values such as empty lists."""
+    sentinel = object()
+    value = cache.get(key, sentinel)
+    if value is sentinel:
+        value = default()
+        cache.set(key, value, entry_timeout(tags, timeout))
+    return value
@@ -0,0 +1,93 @@
+"""
+Facet counts for the property catalog's filter sidebar.
+
+Every facet (category, price bucket, availability) comes out of a single
+GROUP BY over the filtered queryset: rows are grouped on the combination of
+the three facet values, and the per-facet totals are summed up in Python.
+The grouped result has at most categories x buckets x 2 rows, however large
+the catalog is.
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db.models import Case, Count, IntegerField, Value, When
+from rest_framework import serializers
+
+from .models import Property
+
+DEFAULT_PRICE_BUCKETS = (10000, 20000, 35000, 50000, 100000)
+MAX_PRICE_BUCKETS = 20
+# Bucket bounds are prices: serialized like PropertySerializer.price ("10000.00")
+_price_field = Property._meta.get_field("price")
+PRICE_FIELD = serializers.DecimalField(max_digits=_price_field.max_digits, decimal_places=_price_field.decimal_places)
+
+
+def price_buckets():
+    """Default bucket boundaries, from ``settings.FACET_PRICE_BUCKETS``."""
+    return tuple(Decimal(b) for b in getattr(settings, "FACET_PRICE_BUCKETS", DEFAULT_PRICE_BUCKETS))
+
+
+def parse_price_buckets(raw):
+    """
+    Parse ``?price_buckets=10000,25000,50000`` into sorted, distinct bucket
+    boundaries. Returns None when the value is malformed.
+    """
+    try:
+        bounds = sorted({Decimal(v) for v in raw.split(",") if v.strip()})
+    except InvalidOperation:
+        return None
+    if not bounds or len(bounds) > MAX_PRICE_BUCKETS or not all(b.is_finite() and b > 0 for b in bounds):
+        return None
+    # Only bounds a price can hold, so each is reported as it was given
+    try:
+        for bound in bounds:
+            PRICE_FIELD.validate_precision(bound)
+    except serializers.ValidationError:
+        return None
+    return tuple(bounds)
+
+
+def bucket_expression(bounds):
+    """Bucket index of ``price``: 0 below bounds[0], len(bounds) at or above the last."""
+    return Case(
+        *(When(price__lt=bound, then=Value(i)) for i, bound in enumerate(bounds)),
+        default=Value(len(bounds)),
+        output_field=IntegerField(),
+    )
+
+
+def property_facets(queryset, bounds=None):
+    bounds = tuple(bounds or price_buckets())
+    rows = (
+        queryset.order_by()
+        .annotate(price_bucket=bucket_expression(bounds))
+        .values("category", "is_available", "price_bucket")
+        .annotate(n=Count("pk"))
+    )
+    choices = Property._meta.get_field("category").choices
+    categories = {value: 0 for value, _label in choices}
+    buckets = [0] * (len(bounds) + 1)
+    availability = {True: 0, False: 0}
+    total = 0
+    for row in rows:
+        categories[row["category"]] = categories.get(row["category"], 0) + row["n"]
+        buckets[row["price_bucket"]] += row["n"]
+        availability[row["is_available"]] += row["n"]
+        total += row["n"]
+
+    labels = dict(choices)
+    edges = [None, *(PRICE_FIELD.to_representation(bound) for bound in bounds), None]
+    return {
+        "count": total,
+        "category": [
+            {"value": value, "label": labels.get(value, value), "count": n}
+            for value, n in categories.items()
+        ],
+        "price": [
+            {"min": edges[i], "max": edges[i + 1], "count": n}
+            for i, n in enumerate(buckets)
+        ],
+        "is_available": [
+            {"value": value, "count": availability[value]} for value in (True, False)
+        ],
+    }
@@ -0,0 +1,142 @@
+"""
+Offline geocoding and geohash-based spatial lookups for properties.
+
+Coordinates come from a bundled gazetteer of Kenyan towns and estates
+(api/data/kenya_gazetteer.csv), so no network geocoder is involved. Each
+geocoded property also stores its geohash; radius and bounding-box searches
+first narrow the table to the handful of geohash cells covering the area
+(index range scans), and only those candidates get an exact distance.
+"""
+import csv
+import math
+import re
+from functools import lru_cache
+from pathlib import Path
+
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import ACos, Cos, Greatest, Least, Radians, Sin
+
+GAZETTEER_PATH = Path(__file__).resolve().parent / "data" / "kenya_gazetteer.csv"
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+GEOHASH_PRECISION = 9
+MAX_COVER_CELLS = 24
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+# ---------- Gazetteer ----------
+@lru_cache(maxsize=1)
+def load_gazetteer():
+    """[(pattern, kind, latitude, longitude)], most specific names first."""
+    with open(GAZETTEER_PATH, newline="", encoding="utf-8") as fh:
+        rows = list(csv.DictReader(fh))
+    entries = [
+        (re.compile(r"\b%s\b" % re.escape(row["name"].lower())), row["kind"],
+         float(row["latitude"]), float(row["longitude"]), len(row["name"]))
+        for row in rows
+    ]
+    # Estates beat towns ("Westlands, Nairobi"), longer names beat shorter ones
+    # ("Kahawa West" over "Kahawa").
+    entries.sort(key=lambda e: (e[1] != "estate", -e[4]))
+    return [(pattern, kind, lat, lng) for pattern, kind, lat, lng, _length in entries]
+
+
+def geocode(location):
+    """Return ``(latitude, longitude)`` for a free-text location, or None."""
+    text = (location or "").lower()
+    for pattern, _kind, lat, lng in load_gazetteer():
+        if pattern.search(text):
+            return lat, lng
+    return None
+
+
+def apply_geocoding(prop):
+    """Fill in coordinates and geohash from ``prop.location`` when it changed."""
+    if prop.location == prop.geocoded_from and prop.latitude is not None:
+        return
+    point = geocode(prop.location)
+    prop.latitude, prop.longitude = point if point else (None, None)
+    prop.geohash = encode_geohash(*point) if point else ""
+    prop.geocoded_from = prop.location
+
+
+# ---------- Geohash ----------
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, value = (lng_range, longitude) if even else (lat_range, latitude)
+        mid = (rng[0] + rng[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits, bit_count = 0, 0
+    return "".join(chars)
+
+
+def cell_size(precision):
+    """(height, width) in degrees of a geohash cell."""
+    lng_bits = math.ceil(precision * 5 / 2)
+    lat_bits = precision * 5 // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+
+def covering_cells(south, west, north, east, max_cells=MAX_COVER_CELLS):
+    """The finest set of at most ``max_cells`` geohash prefixes covering the box."""
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        rows = range(math.floor((south + 90) / height), math.floor((north + 90) / height) + 1)
+        cols = range(math.floor((west + 180) / width), math.floor((east + 180) / width) + 1)
+        if len(rows) * len(cols) <= max_cells:
+            return sorted({
+                encode_geohash(-90 + (r + 0.5) * height, -180 + (c + 0.5) * width, precision)
+                for r in rows for c in cols
+            })
+    return [""]
+
+
+def cells_q(cells):
+    # Ranges rather than startswith so the geohash index is usable on every backend
+    q = Q()
+    for cell in cells:
+        q |= Q(geohash__gte=cell, geohash__lt=cell + "~") if cell else Q(geohash__gt="")
+    return q
+
+
+# ---------- Queries ----------
+def radius_box(latitude, longitude, radius_km):
+    dlat = radius_km / KM_PER_DEGREE
+    dlng = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01))
+    return latitude - dlat, longitude - dlng, latitude + dlat, longitude + dlng
+
+
+def within_box(qs, south, west, north, east):
+    """Properties inside the bounding box: geohash cells first, then exact bounds."""
+    return qs.filter(cells_q(covering_cells(south, west, north, east))).filter(
+        latitude__gte=south, latitude__lte=north, longitude__gte=west, longitude__lte=east,
+    )
+
+
+def distance_expression(latitude, longitude):
+    """Great-circle distance in km from a point (spherical law of cosines)."""
+    lat = math.radians(latitude)
+    cos_angle = (
+        math.sin(lat) * Sin(Radians(F("latitude")))
+        + math.cos(lat) * Cos(Radians(F("latitude"))) * Cos(Radians(F("longitude")) - math.radians(longitude))
+    )
+    # Clamp: rounding can push the cosine a hair outside [-1, 1]
+    return EARTH_RADIUS_KM * ACos(Least(Greatest(cos_angle, -1.0), 1.0), output_field=FloatField())
+
+
+def within_radius(qs, latitude, longitude, radius_km):
+    """Properties within ``radius_km``, annotated with ``distance_km``."""
+    qs = within_box(qs, *radius_box(latitude, longitude, radius_km))
+    return qs.annotate(distance_km=distance_expression(latitude, longitude)).filter(distance_km__lte=radius_km)
@@ -0,0 +1,92 @@
+"""
+Idempotency keys for non-repeatable POSTs (payment submission).
+
+A request carrying an ``Idempotency-Key`` is executed at most once per
+(user, scope, key): the key row is inserted in the same transaction as the
+work, so a concurrent duplicate blocks on it and, once the first request
+commits, replays the stored response instead of running again. Keys expire
+after ``IDEMPOTENCY_KEY_TTL`` seconds and are purged in the background of
+later requests (or by ``purge_idempotency_keys``).
+"""
+import hashlib
+import json
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+MAX_KEY_LENGTH = 255
+DEFAULT_TTL = 60 * 60 * 24
+# Fraction of new keys that also sweep expired ones, keeping the table compact
+# without a scheduler.
+PURGE_PROBABILITY = 0.01
+
+
+class IdempotencyKeyReused(Exception):
+    """The key was already used for a different request."""
+
+
+def ttl():
+    return timedelta(seconds=getattr(settings, "IDEMPOTENCY_KEY_TTL", DEFAULT_TTL))
+
+
+def key_digest(user_id, scope, key):
+    return hashlib.sha256(f"{user_id}:{scope}:{key}".encode("utf-8")).hexdigest()
+
+
+def request_fingerprint(data):
+    raw = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def purge_expired(using="default"):
+    from .models import IdempotencyKey
+
+    count, _ = IdempotencyKey.objects.using(using).filter(expires_at__lte=timezone.now()).delete()
+    return count
+
+
+def run_once(user_id, scope, key, fingerprint, execute, using="default"):
+    """
+    Run ``execute()`` (returning ``(status, body)``) once for this key.
+
+    Returns ``(status, body, replayed)``. Raises IdempotencyKeyReused when the
+    key was last used with a different ``fingerprint``. If ``execute`` raises,
+    the key is rolled back with the rest of the transaction and a retry runs
+    afresh; 5xx results are not stored either.
+    """
+    from .models import IdempotencyKey
+
+    if len(key) > MAX_KEY_LENGTH:
+        raise ValueError(f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters.")
+    digest = key_digest(user_id, scope, key)
+    now = timezone.now()
+    with transaction.atomic(using=using):
+        keys = IdempotencyKey.objects.using(using)
+        record, created = keys.select_for_update().get_or_create(
+            key=digest, defaults={"request_hash": fingerprint, "expires_at": now + ttl()},
+        )
+        if not created and record.expires_at <= now:
+            # Expired: treat as a fresh key
+            record.request_hash, record.response_status, record.response_body = fingerprint, None, None
+            record.expires_at = now + ttl()
+            created = True
+        if not created:
+            if record.request_hash != fingerprint:
+                raise IdempotencyKeyReused()
+            if record.response_status is not None:
+                return record.response_status, record.response_body, True
+
+        status, body = execute()
+        if status >= 500:
+            transaction.set_rollback(True, using=using)
+            return status, body, False
+        record.response_status = status
+        record.response_body = json.loads(json.dumps(body, default=str))
+        record.save(using=using)
+
+    if created and random.random() < PURGE_PROBABILITY:
+        transaction.on_commit(lambda: purge_expired(using=using), using=using)
+    return status, body, False
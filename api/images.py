@@ -0,0 +1,140 @@
+"""
+Background image renditions for Property.image.
+
+Uploads are stored as-is and the request returns; once the transaction
+commits, a local worker pool resizes the original into thumbnail and medium
+JPEGs plus WebP variants and records their storage paths in
+Property.image_renditions.
+"""
+import hashlib
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.db.models.functions import Now
+from PIL import Image, ImageOps
+
+from .cache import invalidate_tags
+from .listings import refresh_listings
+
+logger = logging.getLogger(__name__)
+
+# name -> bounding box; images are only ever scaled down
+RENDITIONS = {"thumbnail": (320, 240), "medium": (960, 720)}
+FORMATS = {"jpeg": ("JPEG", ".jpg", {"quality": 82, "optimize": True, "progressive": True}),
+           "webp": ("WEBP", ".webp", {"quality": 80, "method": 4})}
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, "IMAGE_WORKERS", 2), thread_name_prefix="renditions"
+        )
+    return _executor
+
+
+def image_storage():
+    """Property.image's storage, which holds the originals and their renditions."""
+    from .models import Property
+
+    return Property._meta.get_field("image").storage
+
+
+def rendition_path(property_id, source_name, rendition, extension):
+    # Basenames collide across properties (a.jpg and a.png), so key on the
+    # property and the full source name
+    base, _ = os.path.splitext(os.path.basename(source_name))
+    digest = hashlib.sha1(source_name.encode()).hexdigest()[:10]
+    return f"property_images/renditions/{property_id}/{base}_{digest}_{rendition}{extension}"
+
+
+def render_image(source, box, image_format, options):
+    image = source.copy()
+    image.thumbnail(box, Image.Resampling.LANCZOS)
+    if image_format == "JPEG" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    buffer = BytesIO()
+    image.save(buffer, image_format, **options)
+    return ContentFile(buffer.getvalue())
+
+
+def build_renditions(property_id, source_name):
+    """Write every rendition of ``source_name`` to storage and return their paths."""
+    storage = image_storage()
+    with storage.open(source_name, "rb") as fh:
+        source = ImageOps.exif_transpose(Image.open(fh))
+        source.load()
+    paths = {"source": source_name}
+    for rendition, box in RENDITIONS.items():
+        for key, (image_format, extension, options) in FORMATS.items():
+            # save() picks a free name if an older set is still there
+            path = rendition_path(property_id, source_name, rendition, extension)
+            paths[f"{rendition}_{key}"] = storage.save(
+                path, render_image(source, box, image_format, options)
+            )
+    return paths
+
+
+def delete_renditions(renditions):
+    """Remove the rendition files (never the source) in ``renditions`` from storage."""
+    storage = image_storage()
+    for key, path in (renditions or {}).items():
+        if key != "source" and path:
+            try:
+                storage.delete(path)
+            except OSError:
+                logger.warning("Could not delete rendition %s", path)
+
+
+def process_property_image(property_id, source_name):
+    """Worker entry point: render the renditions and attach them to the property."""
+    from .models import Property
+
+    close_old_connections()
+    try:
+        renditions = build_renditions(property_id, source_name)
+        # Skip if the image was replaced while we were working
+        updated = (Property.objects.filter(pk=property_id, image=source_name)
+                   .update(image_renditions=renditions, updated_at=Now()))
+        if updated:
+            refresh_listings([property_id])
+            invalidate_tags("properties", f"property:{property_id}")
+        else:
+            delete_renditions(renditions)
+    except Exception:
+        logger.exception("Could not build renditions for property %s (%s)", property_id, source_name)
+    finally:
+        close_old_connections()
+
+
+def schedule_renditions(prop, using="default"):
+    """Queue rendition work for ``prop`` once the current transaction commits."""
+    from .models import Property
+
+    source_name = prop.image.name if prop.image else ""
+    renditions = prop.image_renditions or {}
+    if renditions.get("source") == source_name or (not source_name and not renditions):
+        return
+    if renditions:
+        # Renditions of a replaced or removed image must not be served, and
+        # their files go once the change is committed
+        Property.objects.using(using).filter(pk=prop.pk).update(image_renditions={})
+        prop.image_renditions = {}
+        transaction.on_commit(lambda: delete_renditions(renditions), using=using)
+    if not source_name:
+        return
+
+    def run():
+        if getattr(settings, "IMAGE_PROCESSING_EAGER", False):
+            process_property_image(prop.pk, source_name)
+        else:
+            get_executor().submit(process_property_image, prop.pk, source_name)
+
+    transaction.on_commit(run, using=using)
@@ -0,0 +1,161 @@
+"""
+Payment ledger: completed-payment totals per (tenant, property).
+
+Every payment write adjusts its ledger row with relative UPDATEs, so payment
+summaries read a handful of ledger rows instead of summing payment history.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, IntegerField, Q, Value, When
+
+LEDGER_FIELDS = ("payment_count", "total_paid", "last_payment_at", "last_payment_amount")
+EMPTY_ROW = {"payment_count": 0, "total_paid": Decimal("0"), "last_payment_at": None, "last_payment_amount": None}
+
+def contribution(status, amount):
+    """(count, amount) a payment adds to its ledger row."""
+    return (1, amount) if status == "completed" else (0, Decimal("0"))
+
+
+def apply_payment_delta(tenant_id, property_id, count, amount, paid_at=None, paid_amount=None, using="default"):
+    """
+    Add ``count`` completed payments totalling ``amount`` to a ledger row.
+    ``paid_at``/``paid_amount`` describe the payment being added; when a
+    payment is taken away, the latest remaining one is looked up instead.
+    """
+    from .models import Payment, PaymentLedger
+
+    if not count and not amount:
+        return
+    with transaction.atomic(using=using):
+        if count > 0:
+            # Removals never create a row: during a cascade delete the ledger
+            # row may already be gone along with its property or tenant.
+            PaymentLedger.objects.using(using).get_or_create(tenant_id=tenant_id, property_id=property_id)
+        rows = PaymentLedger.objects.using(using).filter(tenant_id=tenant_id, property_id=property_id)
+        rows.update(payment_count=F("payment_count") + count, total_paid=F("total_paid") + amount)
+        if count > 0:
+            rows.filter(Q(last_payment_at__isnull=True) | Q(last_payment_at__lte=paid_at)).update(
+                last_payment_at=paid_at, last_payment_amount=paid_amount,
+            )
+        elif count < 0:
+            latest = (Payment.objects.using(using)
+                      .filter(tenant_id=tenant_id, property_id=property_id, status="completed")
+                      .order_by("-created_at", "-id")
+                      .values("created_at", "amount").first()) or {}
+            rows.update(last_payment_at=latest.get("created_at"), last_payment_amount=latest.get("amount"))
+
+
+def apply_payment_change(previous, payment, using="default"):
+    """Move a payment's contribution from its ``previous`` stored state to its current one."""
+    if previous is not None:
+        count, amount = contribution(previous["status"], previous["amount"])
+        if count:
+            apply_payment_delta(previous["tenant_id"], previous["property_id"], -count, -amount, using=using)
+    count, amount = contribution(payment.status, payment.amount)
+    if count:
+        apply_payment_delta(payment.tenant_id, payment.property_id, count, amount,
+                            paid_at=payment.created_at, paid_amount=payment.amount, using=using)
+
+
+def apply_completed_batch(payments, using="default"):
+    """
+    Ledger update for many payments that just became completed (dicts with
+    tenant_id, property_id, amount, created_at): one insert of any missing
+    ledger rows and one CASE-driven UPDATE, whatever the batch size.
+    """
+    from .models import PaymentLedger
+
+    pairs = {}
+    for payment in payments:
+        row = pairs.setdefault((payment["tenant_id"], payment["property_id"]),
+                               {"count": 0, "amount": Decimal("0"), "last_at": None, "last_amount": None})
+        row["count"] += 1
+        row["amount"] += payment["amount"]
+        if row["last_at"] is None or payment["created_at"] >= row["last_at"]:
+            row["last_at"], row["last_amount"] = payment["created_at"], payment["amount"]
+    if not pairs:
+        return
+
+    match, counts, amounts, last_ats, last_amounts = Q(), [], [], [], []
+    for (tenant_id, property_id), row in pairs.items():
+        pair = Q(tenant_id=tenant_id, property_id=property_id)
+        newer = pair & (Q(last_payment_at__isnull=True) | Q(last_payment_at__lte=row["last_at"]))
+        match |= pair
+        counts.append(When(pair, then=Value(row["count"])))
+        amounts.append(When(pair, then=Value(row["amount"])))
+        last_amounts.append(When(newer, then=Value(row["last_amount"])))
+        last_ats.append(When(newer, then=Value(row["last_at"])))
+    money = DecimalField(max_digits=14, decimal_places=2)
+    with transaction.atomic(using=using):
+        PaymentLedger.objects.using(using).bulk_create(
+            [PaymentLedger(tenant_id=tenant_id, property_id=property_id) for tenant_id, property_id in pairs],
+            ignore_conflicts=True,
+        )
+        # last_payment_amount is set before last_payment_at because its
+        # condition reads the old last_payment_at (MySQL applies SET left to right)
+        PaymentLedger.objects.using(using).filter(match).update(
+            payment_count=F("payment_count") + Case(*counts, default=Value(0), output_field=IntegerField()),
+            total_paid=F("total_paid") + Case(*amounts, default=Value(Decimal("0")), output_field=money),
+            last_payment_amount=Case(*last_amounts, default=F("last_payment_amount"), output_field=money),
+            last_payment_at=Case(*last_ats, default=F("last_payment_at")),
+        )
+
+
+def summarize(rows):
+    """Fold ledger rows (dicts with LEDGER_FIELDS) into one summary."""
+    summary = dict(EMPTY_ROW)
+    for row in rows:
+        summary["payment_count"] += row["payment_count"]
+        summary["total_paid"] += row["total_paid"]
+        if row["last_payment_at"] and (summary["last_payment_at"] is None
+                                       or row["last_payment_at"] > summary["last_payment_at"]):
+            summary["last_payment_at"] = row["last_payment_at"]
+            summary["last_payment_amount"] = row["last_payment_amount"]
+    return summary
+
+
+def actual_ledger(using="default"):
+    """{(tenant_id, property_id): row} recomputed from payment history in one pass."""
+    from .models import Payment
+
+    ledger = {}
+    rows = (Payment.objects.using(using).filter(status="completed")
+            .order_by("created_at", "id")
+            .values_list("tenant_id", "property_id", "amount", "created_at"))
+    for tenant_id, property_id, amount, created_at in rows.iterator(chunk_size=2000):
+        row = ledger.setdefault((tenant_id, property_id), {"payment_count": 0, "total_paid": Decimal("0")})
+        row["payment_count"] += 1
+        row["total_paid"] += amount
+        row["last_payment_at"], row["last_payment_amount"] = created_at, amount
+    return ledger
+
+
+def stale_ledger_rows(using="default"):
+    """[(tenant_id, property_id, stored, actual)] for ledger rows that disagree with history."""
+    from .models import PaymentLedger
+
+    actual = actual_ledger(using=using)
+    stored = {
+        (row.pop("tenant_id"), row.pop("property_id")): row
+        for row in PaymentLedger.objects.using(using).values("tenant_id", "property_id", *LEDGER_FIELDS)
+    }
+    stale = []
+    for key in stored.keys() | actual.keys():
+        have, want = stored.get(key, EMPTY_ROW), actual.get(key, EMPTY_ROW)
+        if any(have[f] != want[f] for f in LEDGER_FIELDS):
+            stale.append((*key, have, want))
+    return stale
+
+
+def rebuild_payment_ledger(using="default"):
+    """Rewrite every ledger row that has drifted from payment history. Returns the number fixed."""
+    from .models import PaymentLedger
+
+    with transaction.atomic(using=using):
+        stale = stale_ledger_rows(using=using)
+        for tenant_id, property_id, _stored, actual in stale:
+            PaymentLedger.objects.using(using).update_or_create(
+                tenant_id=tenant_id, property_id=property_id, defaults=actual,
+            )
+    return len(stale)
@@ -0,0 +1,157 @@
+"""
+Available listings: a summary table of the available properties.
+
+The home page and the default ``/api/properties/?is_available=true`` list
+both read the available properties, newest first, with their landlord's
+username. AvailableListing stores exactly what those pages show (and the
+list's ETag fingerprint), so either is one index scan of one table, with no
+join and no filter.
+
+Rows are kept in step incrementally, in the transaction of the write that
+changed them: property saves upsert their row (or delete it once the
+property is unavailable), review deltas copy the new rating aggregates,
+username changes are copied to the landlord's rows, and the bulk paths that
+send no signals refresh the rows they wrote. ``python manage.py
+recompute_listings`` verifies or rebuilds the table.
+"""
+from django.db import connections, transaction
+from django.utils import timezone
+from django.db.models import BooleanField, F, OuterRef, Subquery, Value
+
+from .cache import invalidate_tags
+
+# Property columns copied as they are
+LISTING_FIELDS = (
+    "name", "category", "description", "location", "latitude", "longitude", "price", "image",
+    "image_renditions", "created_at", "updated_at", "review_count", "avg_rating",
+)
+COMPARED_FIELDS = ("landlord_username", *LISTING_FIELDS, "thumbnail", "thumbnail_webp")
+# values() columns of a property that the listing stores under another name
+RENAMED = {
+    "id": F("property_id"),
+    "landlord__username": F("landlord_username"),
+    "is_available": Value(True, output_field=BooleanField()),
+}
+
+
+def listing_row(row):
+    """The listing fields of a property ``values()`` row (with ``pk`` and ``landlord__username``)."""
+    renditions = row["image_renditions"] or {}
+    return {
+        "property_id": row["pk"],
+        "landlord_username": row["landlord__username"],
+        **{field: row[field] for field in LISTING_FIELDS},
+        # Property.thumbnail_url falls back to the original until renditions exist
+        "thumbnail": renditions.get("thumbnail_jpeg") or row["image"] or "",
+        "thumbnail_webp": renditions.get("thumbnail_webp") or "",
+    }
+
+
+def actual_listings(queryset):
+    """{property_id: listing fields} for the available properties in ``queryset``."""
+    rows = queryset.filter(is_available=True).values("pk", "landlord__username", *LISTING_FIELDS)
+    return {row["pk"]: listing_row(row) for row in rows.iterator(chunk_size=2000)}
+
+
+def refresh_listings(property_ids, using="default", created=False):
+    """
+    Bring the listing rows of ``property_ids`` in line with the properties:
+    upsert the available ones, drop the rest. ``created`` properties (just
+    bulk-inserted) have no rows yet, so there is nothing to drop.
+    """
+    from .models import AvailableListing, Property
+
+    property_ids = list(property_ids)
+    if not property_ids:
+        return
+    actual = actual_listings(Property.objects.using(using).filter(pk__in=property_ids))
+    if created:
+        AvailableListing.objects.using(using).bulk_create([AvailableListing(**row) for row in actual.values()])
+        return
+    with transaction.atomic(using=using):
+        (AvailableListing.objects.using(using)
+         .filter(property_id__in=property_ids).exclude(property_id__in=list(actual)).delete())
+        # MySQL upserts on any unique key and takes no conflict target
+        target = ["property"] if connections[using].features.supports_update_conflicts_with_target else None
+        AvailableListing.objects.using(using).bulk_create(
+            [AvailableListing(**row) for row in actual.values()],
+            update_conflicts=True, unique_fields=target, update_fields=COMPARED_FIELDS,
+        )
+
+
+def refresh_listing_ratings(property_ids, using="default"):
+    """
+    Copy the properties' rating aggregates (and updated_at, which moves with
+    them) onto their listing rows. Never
+    creates a row: during a cascade delete the property is on its way out.
+    """
+    from .models import AvailableListing, Property
+
+    source = Property.objects.using(using).filter(pk=OuterRef("property_id"))
+    AvailableListing.objects.using(using).filter(property_id__in=property_ids).update(
+        review_count=Subquery(source.values("review_count")),
+        avg_rating=Subquery(source.values("avg_rating")),
+        updated_at=Subquery(source.values("updated_at")),
+    )
+
+
+def rename_landlord(user_id, username, using="default"):
+    """
+    Copy a landlord's new username onto their listing rows. The rows'
+    updated_at (the list's ETag) moves, together with their properties' so
+    the two stay equal, and the cached responses are invalidated.
+    """
+    from .models import AvailableListing, Property
+
+    property_ids = list(Property.objects.using(using).filter(landlord_id=user_id).values_list("pk", flat=True))
+    if not property_ids:
+        return
+    now = timezone.now()
+    Property.objects.using(using).filter(pk__in=property_ids).update(updated_at=now)
+    (AvailableListing.objects.using(using).filter(property_id__in=property_ids)
+     .update(landlord_username=username, updated_at=now))
+    invalidate_tags("properties", *(f"property:{pk}" for pk in property_ids), using=using)
+
+
+def listing_values(columns, using=None):
+    """
+    The listings, newest first, as ``values(*columns)`` rows of the
+    available-property queryset they stand for (columns as in api/rows.py).
+    """
+    from .models import AvailableListing
+
+    names = [column for column in columns if column not in RENAMED]
+    renamed = {column: RENAMED[column] for column in columns if column in RENAMED}
+    return AvailableListing.objects.db_manager(using).order_by("-created_at").values(*names, **renamed)
+
+
+def stale_listings(using="default"):
+    """[(property_id, stored, actual)] for listing rows missing, extra or out of date."""
+    from .models import AvailableListing, Property
+
+    actual = actual_listings(Property.objects.using(using))
+    stored = {
+        row["property_id"]: row
+        for row in AvailableListing.objects.using(using).values("property_id", *COMPARED_FIELDS)
+    }
+    stale = []
+    for pk in stored.keys() | actual.keys():
+        have, want = stored.get(pk), actual.get(pk)
+        if have is None or want is None or any(have[f] != want[f] for f in COMPARED_FIELDS):
+            stale.append((pk, have, want))
+    return stale
+
+
+def rebuild_listings(using="default"):
+    """
+    Rewrite every listing row that has drifted from the properties, and
+    invalidate the cached responses built from them. Returns the number fixed.
+    """
+    with transaction.atomic(using=using):
+        stale = stale_listings(using=using)
+        pks = [pk for pk, _stored, _actual in stale]
+        for start in range(0, len(pks), 500):
+            refresh_listings(pks[start:start + 500], using=using)
+    if pks:
+        invalidate_tags("properties", *(f"property:{pk}" for pk in pks), using=using)
+    return len(stale)
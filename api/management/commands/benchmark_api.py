@@ -0,0 +1,92 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmark import SCENARIOS, compare, load_results, run_benchmarks, run_slow_clients, save_results
+
+
+class Command(BaseCommand):
+    help = ("Benchmark the API and HTML endpoints (latency percentiles, queries per request, RPS) "
+            "and compare against a saved baseline.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument("--warmup", type=int, default=5)
+        parser.add_argument("--url", help="Base URL of a running server (e.g. local gunicorn); "
+                                          "defaults to the in-process test client.")
+        parser.add_argument("--concurrency", type=int, default=1, help="Concurrent clients (with --url).")
+        parser.add_argument("--cold", action="store_true",
+                            help="Clear the cache before every request (in-process only).")
+        parser.add_argument("--plain-static", action="store_true",
+                            help="Render pages without the staticfiles manifest (collectstatic not run).")
+        parser.add_argument("--scenario", action="append", choices=[s.name for s in SCENARIOS],
+                            help="Only run this scenario (repeatable).")
+        parser.add_argument("--save", help="Write the results to this JSON file.")
+        parser.add_argument("--compare", help="Baseline JSON file to compare against.")
+        parser.add_argument("--tolerance", type=float, default=25.0,
+                            help="Allowed p50/p90 slowdown against the baseline, in percent.")
+        parser.add_argument("--fail-on-regression", action="store_true")
+        parser.add_argument("--slow-clients", metavar="N,N,...",
+                            help="With --url: instead of the scenarios, measure a fast client's latency "
+                                 "while N slow clients trickle their requests (e.g. 0,10,50,200).")
+        parser.add_argument("--slow-path", default="/api/properties/", help="Path the slow-client run requests.")
+        parser.add_argument("--hold", type=float, default=2.0,
+                            help="Seconds each slow client takes to send its request.")
+        parser.add_argument("--duration", type=float, default=10.0, help="Seconds per slow-client round.")
+
+    def handle(self, *args, **options):
+        if options["slow_clients"]:
+            return self.handle_slow_clients(options)
+        self.stdout.write(f"{'scenario':<30} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} "
+                          f"{'queries':>7} {'rps':>7} {'errors':>6}")
+
+        def log(name, r):
+            queries = "-" if r["queries"] is None else f"{r['queries']:g}"
+            self.stdout.write(f"{name:<30} {r['p50_ms']:>8.2f} {r['p90_ms']:>8.2f} {r['p99_ms']:>8.2f} "
+                              f"{queries:>7} {r['rps']:>7.1f} {r['errors']:>6}")
+
+        try:
+            results = run_benchmarks(
+                iterations=options["iterations"], warmup=options["warmup"], base_url=options["url"],
+                concurrency=options["concurrency"], cold=options["cold"], plain_static=options["plain_static"],
+                only=options["scenario"], log=log,
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        if options["save"]:
+            save_results(results, options["save"])
+            self.stdout.write(f"Saved results to {options['save']}.")
+        if not options["compare"]:
+            return
+        baseline = load_results(options["compare"])
+        for key in ("driver", "cache", "database", "properties"):
+            if baseline["meta"].get(key) != results["meta"][key]:
+                self.stderr.write(f"Warning: baseline {key} is {baseline['meta'].get(key)!r}, "
+                                  f"this run's is {results['meta'][key]!r}.")
+        regressions = compare(results, baseline, tolerance=options["tolerance"])
+        for name, metric, old, new in regressions:
+            self.stdout.write(self.style.WARNING(f"{name}: {metric} {old} -> {new}"))
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
+        elif options["fail_on_regression"]:
+            raise CommandError(f"{len(regressions)} regressions against {options['compare']}.")
+
+    def handle_slow_clients(self, options):
+        if not options["url"]:
+            raise CommandError("--slow-clients needs --url: it measures a running server.")
+        try:
+            counts = [int(n) for n in options["slow_clients"].split(",")]
+        except ValueError:
+            raise CommandError("--slow-clients expects comma-separated integers.")
+        self.stdout.write(f"{'slow clients':>12} {'completed':>9} {'errors':>6} {'probes':>6} "
+                          f"{'probe errors':>12} {'probe p50 ms':>12} {'probe p99 ms':>12}")
+
+        def log(count, r):
+            p50 = "-" if r["probe_p50_ms"] is None else f"{r['probe_p50_ms']:.1f}"
+            p99 = "-" if r["probe_p99_ms"] is None else f"{r['probe_p99_ms']:.1f}"
+            self.stdout.write(f"{count:>12} {r['slow_completed']:>9} {r['slow_errors']:>6} {r['probes']:>6} "
+                              f"{r['probe_errors']:>12} {p50:>12} {p99:>12}")
+
+        results = run_slow_clients(options["url"], counts, path=options["slow_path"],
+                                   duration=options["duration"], hold=options["hold"], log=log)
+        if options["save"]:
+            save_results(results, options["save"])
+            self.stdout.write(f"Saved results to {options['save']}.")
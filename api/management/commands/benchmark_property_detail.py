@@ -0,0 +1,52 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from api.models import Property
+from api.views import property_detail
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Report query count and latency of the property detail page for anonymous, tenant and landlord viewers."
+
+    def add_arguments(self, parser):
+        parser.add_argument("pk", nargs="?", type=int, help="Property id (defaults to the most reviewed one).")
+        parser.add_argument("--iterations", type=int, default=50)
+
+    def handle(self, *args, **options):
+        if options["pk"]:
+            prop = Property.objects.filter(pk=options["pk"]).first()
+        else:
+            prop = Property.objects.order_by("-review_count", "-id").first()
+        if prop is None:
+            raise CommandError("No property to benchmark.")
+        tenant = (User.objects.filter(role="tenant", applications__property=prop).first()
+                  or User.objects.filter(role="tenant").first())
+        viewers = [("anonymous", AnonymousUser()), ("tenant", tenant), ("landlord", prop.landlord)]
+
+        factory = RequestFactory()
+        self.stdout.write(f"Property {prop.pk}: {prop.review_count} reviews, {options['iterations']} iterations")
+        self.stdout.write(f"{'viewer':<10} {'queries':>7} {'p50 ms':>8} {'p95 ms':>8}")
+        for label, user in viewers:
+            if user is None:
+                continue
+            timings, queries = [], 0
+            for _ in range(options["iterations"]):
+                request = factory.get(f"/properties/{prop.pk}/")
+                request.user = user
+                with CaptureQueriesContext(connection) as captured:
+                    start = time.perf_counter()
+                    property_detail(request, prop.pk)
+                    timings.append((time.perf_counter() - start) * 1000)
+                queries = len(captured)
+            timings.sort()
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            self.stdout.write(f"{label:<10} {queries:>7} {statistics.median(timings):>8.2f} {p95:>8.2f}")
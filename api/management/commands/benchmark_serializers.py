@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmark import run_serializer_benchmarks, save_results
+
+
+class Command(BaseCommand):
+    help = ("Time the list serializers per 1,000 rows: ModelSerializer over model instances "
+            "against the compiled row serializer over values() rows.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000)
+        parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement; the best is kept.")
+        parser.add_argument("--save", help="Write the results to this JSON file.")
+
+    def handle(self, *args, **options):
+        self.stdout.write("ms per 1,000 rows (fetch + serialize)")
+        self.stdout.write(f"{'serializer':<14} {'rows':>6} {'instances':>16} {'values rows':>16} "
+                          f"{'serialize x':>11} {'total x':>8} {'identical':>9}")
+
+        def log(name, r):
+            instances = f"{r['instances_fetch_ms']:.1f} + {r['instances_serialize_ms']:.1f}"
+            rows = f"{r['rows_fetch_ms']:.1f} + {r['rows_serialize_ms']:.1f}"
+            self.stdout.write(f"{name:<14} {r['rows']:>6} {instances:>16} {rows:>16} "
+                              f"{r['serialize_speedup'] or 0:>11.1f} {r['total_speedup']:>8.1f} "
+                              f"{'yes' if r['identical'] else 'NO':>9}")
+
+        results = run_serializer_benchmarks(rows=options["rows"], repeat=options["repeat"], log=log)
+        if options["save"]:
+            save_results(results, options["save"])
+            self.stdout.write(f"Saved results to {options['save']}.")
+        if not all(r["identical"] for r in results["serializers"].values()):
+            raise CommandError("The row serializers' JSON differs from the serializers'.")
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from api.bulk import EXPORT_CHUNK_SIZE, export_properties
+from api.models import Property
+
+
+class Command(BaseCommand):
+    help = "Stream every property to a CSV or JSON Lines file (stdout by default)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--type", choices=["csv", "jsonl"], default="csv")
+        parser.add_argument("--output", help="Destination file (default: stdout).")
+        parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        chunks = export_properties(Property.objects.all(), options["type"], chunk_size=options["chunk_size"])
+        if not options["output"]:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
+            return
+        with open(options["output"], "w", encoding="utf-8", newline="") as fh:
+            for chunk in chunks:
+                fh.write(chunk)
+        self.stderr.write(self.style.SUCCESS(f"Wrote {options['output']}."))
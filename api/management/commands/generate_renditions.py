@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db.models.functions import Now
+
+from api.cache import invalidate_tags
+from api.images import build_renditions, delete_renditions
+from api.listings import refresh_listings
+from api.models import Property
+
+
+class Command(BaseCommand):
+    help = "Build missing (or, with --all, every) image rendition synchronously."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Rebuild renditions that already exist.")
+
+    def handle(self, *args, **options):
+        done = 0
+        rows = Property.objects.exclude(image="").exclude(image__isnull=True).only("id", "image", "image_renditions")
+        for prop in rows.iterator(chunk_size=200):
+            if not options["all"] and prop.image_renditions.get("source") == prop.image.name:
+                continue
+            try:
+                renditions = build_renditions(prop.pk, prop.image.name)
+            except (OSError, ValueError) as exc:
+                self.stderr.write(f"Property {prop.pk}: {exc}")
+                continue
+            updated = (Property.objects.filter(pk=prop.pk, image=prop.image.name)
+                       .update(image_renditions=renditions, updated_at=Now()))
+            if updated:
+                refresh_listings([prop.pk])
+                invalidate_tags(f"property:{prop.pk}")
+                # Only this property's rows point at its renditions
+                delete_renditions({k: v for k, v in prop.image_renditions.items() if v not in renditions.values()})
+            else:
+                delete_renditions(renditions)
+            done += 1
+        if done:
+            invalidate_tags("properties")
+        self.stdout.write(self.style.SUCCESS(f"Built renditions for {done} properties."))
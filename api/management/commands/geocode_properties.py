@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.cache import invalidate_tags
+from api.geo import apply_geocoding
+from api.listings import refresh_listings
+from api.models import Property
+
+FIELDS = ["latitude", "longitude", "geohash", "geocoded_from", "updated_at"]
+
+
+class Command(BaseCommand):
+    help = "Geocode property locations against the bundled gazetteer and store their geohash."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Re-geocode properties that already have coordinates.")
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        rows = Property.objects.only("id", "location", "latitude", "longitude", "geohash", "geocoded_from")
+        if not options["all"]:
+            rows = rows.filter(latitude__isnull=True)
+        ids = list(rows.values_list("pk", flat=True))
+
+        located = 0
+        for start in range(0, len(ids), options["batch_size"]):
+            chunk = ids[start:start + options["batch_size"]]
+            batch = list(rows.filter(pk__in=chunk))
+            for prop in batch:
+                prop.geocoded_from = None  # force a fresh lookup
+                apply_geocoding(prop)
+                prop.updated_at = timezone.now()
+                located += prop.latitude is not None
+            Property.objects.bulk_update(batch, FIELDS)
+            refresh_listings(chunk)
+            invalidate_tags(*(f"property:{prop.pk}" for prop in batch))
+        invalidate_tags("properties")
+        self.stdout.write(self.style.SUCCESS(f"Geocoded {located} of {len(ids)} properties."))
@@ -0,0 +1,36 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from api.bulk import BATCH_SIZE, detect_format, import_properties
+
+
+class Command(BaseCommand):
+    help = "Bulk-import properties for a landlord from a CSV or JSON Lines file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--landlord", required=True, help="Username of the owning landlord.")
+        parser.add_argument("--type", choices=["csv", "jsonl"], help="File format (default: from the extension).")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument("--dry-run", action="store_true", help="Validate only; write nothing.")
+
+    def handle(self, *args, **options):
+        try:
+            landlord = get_user_model().objects.get(username=options["landlord"], role="landlord")
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"No landlord named {options['landlord']!r}.")
+        fmt = options["type"] or detect_format(options["path"])
+        try:
+            with open(options["path"], encoding="utf-8-sig", newline="") as stream:
+                report = import_properties(
+                    stream, fmt, landlord, batch_size=options["batch_size"], dry_run=options["dry_run"],
+                )
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+
+        for error in report["errors"]:
+            self.stderr.write(f"line {error['line']}: {error['errors']}")
+        verb = "Validated" if options["dry_run"] else "Imported"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {report['created']} of {report['rows']} rows ({report['error_count']} rejected)."
+        ))
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.webhooks import BATCH_SIZE, process_inbox
+
+
+class Command(BaseCommand):
+    help = "Apply queued payment gateway callbacks to payments in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument("--forever", action="store_true",
+                            help="Keep polling the inbox instead of exiting once it is empty.")
+        parser.add_argument("--interval", type=float, default=1.0,
+                            help="Seconds to wait between polls of an empty inbox (with --forever).")
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **options):
+        while True:
+            totals = process_inbox(batch_size=options["batch_size"], using=options["database"])
+            if totals:
+                summary = ", ".join(f"{n} {result}" for result, n in sorted(totals.items()))
+                self.stdout.write(self.style.SUCCESS(f"Processed callbacks: {summary}."))
+            elif not options["forever"]:
+                self.stdout.write("No pending callbacks.")
+            if not options["forever"]:
+                return
+            if not totals:
+                time.sleep(options["interval"])
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from api.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Recompute the full-text search document for every property."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default")
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        count = rebuild_index(using=options["database"], batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} properties."))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.listings import rebuild_listings, stale_listings
+
+
+class Command(BaseCommand):
+    help = "Rebuild (or, with --check, verify) the available-listings table read by the list pages."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default")
+        parser.add_argument(
+            "--check", action="store_true",
+            help="Only report listing rows that disagree with the properties.",
+        )
+
+    def handle(self, *args, **options):
+        using = options["database"]
+        if options["check"]:
+            stale = stale_listings(using=using)
+            for pk, stored, actual in stale[:50]:
+                self.stdout.write(f"Property {pk}: {stored} != {actual}")
+            if stale:
+                raise CommandError(f"{len(stale)} listing rows are stale.")
+            self.stdout.write(self.style.SUCCESS("Available listings are consistent."))
+            return
+        count = rebuild_listings(using=using)
+        self.stdout.write(self.style.SUCCESS(f"Fixed {count} listing rows."))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.ledger import rebuild_payment_ledger, stale_ledger_rows
+
+
+class Command(BaseCommand):
+    help = "Rebuild (or, with --check, verify) the per-tenant, per-property payment ledger."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default")
+        parser.add_argument(
+            "--check", action="store_true",
+            help="Only report ledger rows that disagree with payment history.",
+        )
+
+    def handle(self, *args, **options):
+        using = options["database"]
+        if options["check"]:
+            stale = stale_ledger_rows(using=using)
+            for tenant_id, property_id, stored, actual in stale[:50]:
+                self.stdout.write(f"Tenant {tenant_id} / property {property_id}: {stored} != {actual}")
+            if stale:
+                raise CommandError(f"{len(stale)} payment ledger rows are stale.")
+            self.stdout.write(self.style.SUCCESS("Payment ledger is consistent."))
+            return
+        count = rebuild_payment_ledger(using=using)
+        self.stdout.write(self.style.SUCCESS(f"Fixed {count} payment ledger rows."))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.ratings import recompute_review_aggregates, stale_review_aggregates
+
+
+class Command(BaseCommand):
+    help = "Recompute (or, with --check, verify) the review counters stored on each property."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default")
+        parser.add_argument(
+            "--check", action="store_true",
+            help="Only report properties whose counters disagree with their reviews.",
+        )
+
+    def handle(self, *args, **options):
+        using = options["database"]
+        stale = stale_review_aggregates(using=using)
+        if options["check"]:
+            mismatches = list(stale.values_list(
+                "pk", "review_count", "actual_count", "rating_sum", "actual_sum"
+            )[:50])
+            for pk, count, actual_count, total, actual_sum in mismatches:
+                self.stdout.write(
+                    f"Property {pk}: review_count {count} != {actual_count} "
+                    f"or rating_sum {total} != {actual_sum}"
+                )
+            if mismatches:
+                raise CommandError(f"{stale.count()} properties have stale review aggregates.")
+            self.stdout.write(self.style.SUCCESS("Review aggregates are consistent."))
+            return
+        count = recompute_review_aggregates(using=using)
+        self.stdout.write(self.style.SUCCESS(f"Fixed review aggregates on {count} properties."))
@@ -0,0 +1,98 @@
+"""
+Local stand-in for the payment gateway, for development and tests.
+
+GatewaySimulator settles pending payments the way the real gateway does:
+signed callbacks keyed on transaction_id, delivered in batches, with some
+payments failing and some callbacks redelivered. Callbacks go to a running
+server over HTTP, or straight to the webhook handler in-process.
+"""
+import json
+import random
+import urllib.request
+import uuid
+
+from django.core.management.base import BaseCommand
+
+from api.models import Payment
+from api.webhooks import SIGNATURE_HEADER, receive, sign
+
+
+def post_in_process(body, headers):
+    """Deliver a callback to the webhook handler without a running server."""
+    status_code, _data = receive(body, headers.get(SIGNATURE_HEADER))
+    return status_code
+
+
+def http_sender(url, timeout=10):
+    def post(body, headers):
+        request = urllib.request.Request(
+            url, data=body, headers={"Content-Type": "application/json", **headers}, method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status
+    return post
+
+
+class GatewaySimulator:
+    def __init__(self, send=post_in_process, fail_rate=0.1, duplicate_rate=0.05, seed=None):
+        self.send = send
+        self.fail_rate = fail_rate
+        self.duplicate_rate = duplicate_rate
+        self.random = random.Random(seed)
+
+    def events(self, transaction_ids):
+        """One callback per transaction, plus redeliveries of some of them."""
+        events = []
+        for transaction_id in transaction_ids:
+            event = {
+                "event_id": f"evt_{uuid.uuid4().hex}",
+                "transaction_id": transaction_id,
+                "status": "failed" if self.random.random() < self.fail_rate else "completed",
+            }
+            events.append(event)
+            if self.random.random() < self.duplicate_rate:
+                events.append(dict(event))
+        return events
+
+    def deliver(self, events, batch_size=100):
+        """Post ``events`` in signed batches. Returns the HTTP status of each post."""
+        statuses = []
+        for start in range(0, len(events), batch_size):
+            body = json.dumps({"events": events[start:start + batch_size]}).encode("utf-8")
+            statuses.append(self.send(body, {SIGNATURE_HEADER: sign(body)}))
+        return statuses
+
+    def settle(self, transaction_ids, batch_size=100):
+        """Build and deliver callbacks for ``transaction_ids``. Returns (events, statuses)."""
+        events = self.events(transaction_ids)
+        return events, self.deliver(events, batch_size=batch_size)
+
+
+class Command(BaseCommand):
+    help = "Send simulated gateway callbacks for pending payments (local testing only)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", help="Webhook URL of a running server; posts in-process when omitted.")
+        parser.add_argument("--limit", type=int, default=1000, help="Pending payments to settle.")
+        parser.add_argument("--batch-size", type=int, default=100, help="Callbacks per request.")
+        parser.add_argument("--fail-rate", type=float, default=0.1)
+        parser.add_argument("--duplicate-rate", type=float, default=0.05)
+        parser.add_argument("--seed", type=int)
+
+    def handle(self, *args, **options):
+        transaction_ids = list(
+            Payment.objects.filter(status="pending").exclude(transaction_id=None)
+            .order_by("id").values_list("transaction_id", flat=True)[:options["limit"]]
+        )
+        simulator = GatewaySimulator(
+            send=http_sender(options["url"]) if options["url"] else post_in_process,
+            fail_rate=options["fail_rate"], duplicate_rate=options["duplicate_rate"], seed=options["seed"],
+        )
+        events, statuses = simulator.settle(transaction_ids, batch_size=options["batch_size"])
+        rejected = [s for s in statuses if s != 202]
+        self.stdout.write(f"Sent {len(events)} callbacks for {len(transaction_ids)} payments "
+                          f"in {len(statuses)} requests.")
+        if rejected:
+            self.stderr.write(self.style.ERROR(f"{len(rejected)} requests were rejected: {sorted(set(rejected))}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("All callbacks accepted."))
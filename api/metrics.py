@@ -0,0 +1,315 @@
+"""
+Request-level performance metrics.
+
+MetricsMiddleware records, per endpoint (viewset action such as
+``PropertyViewSet.list``, else the URL name), the wall time, number and time
+of DB queries, serializer time and response size of every request into
+in-process histograms with log-spaced buckets (HDR-style: constant relative
+error across the whole range). ``/metrics`` exposes them in the Prometheus
+text format. Requests slower than ``METRICS_SLOW_REQUEST_MS`` are logged to
+``api.metrics.slow`` with the SQL they ran, slowest statements first.
+
+The histograms live in each worker process; scrape every worker (or run one
+worker per scrape target) to see the whole picture.
+"""
+import bisect
+import hmac
+import logging
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse
+
+slow_logger = logging.getLogger("api.metrics.slow")
+
+PREFIX = "krh_http_"
+MAX_RECORDED_QUERIES = 100
+SLOW_LOG_QUERIES = 20
+# Any other client-sent method is recorded as OTHER, so it cannot add series
+METHODS = frozenset({"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"})
+
+
+def log_buckets(low, high, per_decade):
+    """Log-spaced bucket bounds from ``low`` to ``high``, rounded to 2 significant digits."""
+    bounds, i = [], 0
+    while True:
+        bound = float(f"{low * 10 ** (i / per_decade):.2g}")
+        if bound > high:
+            return tuple(bounds)
+        if not bounds or bound > bounds[-1]:
+            bounds.append(bound)
+        i += 1
+
+
+class Histogram:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # the last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.bounds, value)] += 1
+            self.sum += value
+            self.count += 1
+
+    def percentile(self, q):
+        """Approximate ``q``-th percentile (0-100): the upper bound of the bucket holding it."""
+        with self._lock:
+            if not self.count:
+                return None
+            rank, seen = q / 100 * self.count, 0
+            for i, n in enumerate(self.counts):
+                seen += n
+                if seen >= rank and n:
+                    return self.bounds[i] if i < len(self.bounds) else float("inf")
+        return float("inf")
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+# name: (help, bucket bounds)
+METRICS = {
+    "request_duration_seconds": ("Wall time of the request.", log_buckets(0.0005, 60, 4)),
+    "db_queries": ("Database queries run by the request.", (0, 1, 2, 3, 4, 5, 7, 10, 15, 20, 30, 50, 100, 200, 500)),
+    "db_duration_seconds": ("Time spent in database queries.", log_buckets(0.0001, 60, 4)),
+    "serializer_duration_seconds": ("Time spent building serializer output.", log_buckets(0.0001, 60, 4)),
+    "response_size_bytes": ("Size of the response body.", log_buckets(100, 64 * 1024 * 1024, 2)),
+}
+
+
+class Registry:
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name, endpoint, method):
+        key = (name, endpoint, method)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram(METRICS[name][1]))
+        return histogram
+
+    def observe(self, endpoint, method, **values):
+        for name, value in values.items():
+            if value is not None:
+                self.histogram(name, endpoint, method).observe(value)
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def render(self):
+        """All histograms in the Prometheus text exposition format."""
+        with self._lock:
+            items = sorted(self._histograms.items())
+        lines = []
+        for name, (help_text, bounds) in METRICS.items():
+            series = [(key, h) for key, h in items if key[0] == name]
+            if not series:
+                continue
+            metric = PREFIX + name
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} histogram"]
+            for (_name, endpoint, method), histogram in series:
+                counts, total, count = histogram.snapshot()
+                labels = f'endpoint="{_escape(endpoint)}",method="{method}"'
+                cumulative = 0
+                for bound, n in zip([*bounds, "+Inf"], counts):
+                    cumulative += n
+                    lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f"{metric}_sum{{{labels}}} {total!r}")
+                lines.append(f"{metric}_count{{{labels}}} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = Registry()
+
+
+# ---------- Per-request collection ----------
+class RequestStats:
+    def __init__(self):
+        self.query_count = 0
+        self.query_time = 0.0
+        self.queries = []  # (seconds, sql), the first MAX_RECORDED_QUERIES
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.query_count += 1
+            self.query_time += elapsed
+            if len(self.queries) < MAX_RECORDED_QUERIES:
+                self.queries.append((elapsed, sql))
+
+
+current_stats = ContextVar("request_stats", default=None)
+
+
+@contextmanager
+def timed_serialization():
+    """Add the block's time to the request's serializer time; nested blocks are not counted twice."""
+    stats = current_stats.get()
+    if stats is None or stats.serializer_depth:
+        yield
+        return
+    stats.serializer_depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.serializer_depth -= 1
+        stats.serializer_time += time.perf_counter() - start
+
+
+def timed_serializer_data(data_property):
+    """Wrap BaseSerializer.data so the outermost call adds to the request's serializer time."""
+    fget = data_property.fget
+
+    def data(serializer):
+        with timed_serialization():
+            return fget(serializer)
+
+    return property(data)
+
+
+def install_serializer_timing():
+    from rest_framework.serializers import BaseSerializer
+
+    if not getattr(BaseSerializer.data.fget, "_timed", False):
+        BaseSerializer.data = timed_serializer_data(BaseSerializer.data)
+        BaseSerializer.data.fget._timed = True
+
+
+def endpoint_name(request, view_func):
+    """``ViewSet.action`` for DRF viewsets, else the URL name (or view name)."""
+    actions = getattr(view_func, "actions", None)
+    cls = getattr(view_func, "cls", None)
+    if actions and cls:
+        return f"{cls.__name__}.{actions.get(request.method.lower(), request.method.lower())}"
+    match = getattr(request, "resolver_match", None)
+    if match is not None and match.url_name:
+        return match.url_name
+    if cls:
+        return cls.__name__
+    return getattr(view_func, "__name__", "<unresolved>")
+
+
+def response_size(response):
+    if response.streaming:
+        return None
+    return len(response.content)
+
+
+class MetricsMiddleware:
+    """
+    Sync and async capable. Under ASGI, queries run in the request's
+    thread-sensitive executor thread (connections are per thread), so the
+    query wrapper is installed and removed there.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "METRICS_ENABLED", True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        install_serializer_timing()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                wrap_queries(stack, stats)
+                response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        self.record(request, response, time.perf_counter() - start, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        start = time.perf_counter()
+        stack = ExitStack()
+        try:
+            await sync_to_async(wrap_queries)(stack, stats)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(stack.close)()
+        finally:
+            current_stats.reset(token)
+        self.record(request, response, time.perf_counter() - start, stats)
+        return response
+
+    def record(self, request, response, duration, stats):
+        endpoint = getattr(request, "_metrics_endpoint", "<unresolved>")
+        registry.observe(
+            endpoint, request.method if request.method in METHODS else "OTHER",
+            request_duration_seconds=duration,
+            db_queries=stats.query_count,
+            db_duration_seconds=stats.query_time,
+            serializer_duration_seconds=stats.serializer_time,
+            response_size_bytes=response_size(response),
+        )
+        if duration * 1000 >= getattr(settings, "METRICS_SLOW_REQUEST_MS", 500):
+            log_slow_request(request, endpoint, response, duration, stats)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._metrics_endpoint = endpoint_name(request, view_func)
+
+
+def wrap_queries(stack, stats):
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(stats))
+
+
+def log_slow_request(request, endpoint, response, duration, stats):
+    slowest = sorted(stats.queries, key=lambda q: q[0], reverse=True)[:SLOW_LOG_QUERIES]
+    sql = "\n".join(f"  {seconds * 1000:.1f}ms  {statement}" for seconds, statement in slowest)
+    slow_logger.warning(
+        "Slow request %s %s (%s): %.0fms, status %s, %d queries in %.0fms, serializer %.0fms\n%s",
+        request.method, request.get_full_path(), endpoint, duration * 1000, response.status_code,
+        stats.query_count, stats.query_time * 1000, stats.serializer_time * 1000, sql,
+    )
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint; requires ``Authorization: Bearer <METRICS_TOKEN>``.
+    Without a token it is only served when DEBUG is on, and is a 404 otherwise.
+    """
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if not token:
+        if not settings.DEBUG:
+            return HttpResponse(status=404)
+    elif not hmac.compare_digest(request.headers.get("Authorization", "").encode("utf-8"),
+                                 f"Bearer {token}".encode("utf-8")):
+        return HttpResponse(status=403)
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
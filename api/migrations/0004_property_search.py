@@ -0,0 +1,118 @@
+# Generated by Django 5.2.18 on 2026-10-17 14:10
+
+import re
+
+import django.contrib.postgres.search
+import django.db.models.deletion
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations, models
+from django.db.models import Value
+from django.db.models.functions import Coalesce
+
+# The search document as api/search.py built it when this migration was
+# written; copied so later changes there do not rewrite this backfill.
+FIELD_WEIGHTS = (("name", "A", 4), ("location", "B", 2), ("description", "C", 1))
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def build_terms(name, location, description):
+    values = {"name": name, "location": location, "description": description}
+    terms = {}
+    for field, _label, weight in FIELD_WEIGHTS:
+        for term in TOKEN_RE.findall((values[field] or "").lower()):
+            term = term[:64]
+            terms[term] = terms.get(term, 0) + weight
+    return terms
+
+
+def search_vector():
+    vector = None
+    for field, label, _weight in FIELD_WEIGHTS:
+        part = SearchVector(Coalesce(field, Value("")), weight=label, config="simple")
+        vector = part if vector is None else vector + part
+    return vector
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS api_property_search_gin "
+        "ON api_property USING gin (search_vector)"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS api_property_search_gin")
+
+
+def backfill_search_documents(apps, schema_editor):
+    Property = apps.get_model("api", "Property")
+    PropertySearchTerm = apps.get_model("api", "PropertySearchTerm")
+    db = schema_editor.connection.alias
+    if schema_editor.connection.vendor == "postgresql":
+        Property.objects.using(db).update(search_vector=search_vector())
+        return
+    rows = Property.objects.using(db).values_list(
+        "pk", "name", "location", "description"
+    )
+    PropertySearchTerm.objects.using(db).bulk_create(
+        [
+            PropertySearchTerm(property_id=pk, term=term, weight=weight)
+            for pk, name, location, description in rows
+            for term, weight in build_terms(name, location, description).items()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0003_property_image_alter_payment_amount_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="property",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                blank=True, editable=False, null=True
+            ),
+        ),
+        migrations.CreateModel(
+            name="PropertySearchTerm",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("term", models.CharField(max_length=64)),
+                ("weight", models.PositiveIntegerField(default=1)),
+                (
+                    "property",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="search_terms",
+                        to="api.property",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["term", "property"], name="api_search_term_idx"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(backfill_search_documents, migrations.RunPython.noop),
+    ]
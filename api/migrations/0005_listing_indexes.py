@@ -0,0 +1,87 @@
+# Generated by Django 5.2.18 on 2026-10-17 14:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0004_property_search"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="payment",
+            index=models.Index(
+                fields=["application", "-created_at"], name="api_pay_app_recent_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="payment",
+            index=models.Index(
+                fields=["status", "-created_at"], name="api_pay_status_recent_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="property",
+            index=models.Index(
+                condition=models.Q(("is_available", True)),
+                fields=["-created_at"],
+                name="api_prop_avail_recent_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="property",
+            index=models.Index(fields=["-created_at"], name="api_prop_recent_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="property",
+            index=models.Index(
+                fields=["category", "-created_at"], name="api_prop_cat_recent_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="property",
+            index=models.Index(
+                fields=["category", "price"], name="api_prop_cat_price_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="property",
+            index=models.Index(fields=["price"], name="api_prop_price_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="property",
+            index=models.Index(
+                fields=["landlord", "-created_at"], name="api_prop_landlord_recent_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="rentalapplication",
+            index=models.Index(
+                fields=["tenant", "-created_at"], name="api_app_tenant_recent_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="rentalapplication",
+            index=models.Index(
+                fields=["property", "-created_at"], name="api_app_prop_recent_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="rentalapplication",
+            index=models.Index(
+                fields=["property", "status"], name="api_app_prop_status_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="review",
+            index=models.Index(
+                fields=["property", "-created_at"], name="api_review_prop_recent_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="review",
+            index=models.Index(fields=["-created_at"], name="api_review_recent_idx"),
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-17 14:16
+
+from django.db import migrations, models
+from django.db.models import Case, Count, F, FloatField, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, Round
+
+
+def backfill_review_aggregates(apps, schema_editor):
+    Property = apps.get_model("api", "Property")
+    Review = apps.get_model("api", "Review")
+    db = schema_editor.connection.alias
+    reviews = (
+        Review.objects.using(db)
+        .filter(property=OuterRef("pk"))
+        .order_by()
+        .values("property")
+    )
+    Property.objects.using(db).update(
+        review_count=Coalesce(
+            Subquery(
+                reviews.annotate(c=Count("id")).values("c"), output_field=IntegerField()
+            ),
+            0,
+        ),
+        rating_sum=Coalesce(
+            Subquery(
+                reviews.annotate(s=Sum("rating")).values("s"),
+                output_field=IntegerField(),
+            ),
+            0,
+        ),
+    )
+    # As api.ratings.average_expression() was when this migration was written
+    Property.objects.using(db).update(
+        avg_rating=Case(
+            When(review_count=0, then=Value(0.0)),
+            default=Round(Cast(F("rating_sum"), FloatField()) / F("review_count"), 2),
+            output_field=FloatField(),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0005_listing_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="property",
+            name="avg_rating",
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="property",
+            name="rating_sum",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="property",
+            name="review_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="property",
+            index=models.Index(
+                fields=["-avg_rating", "-review_count"], name="api_prop_rating_idx"
+            ),
+        ),
+        migrations.RunPython(backfill_review_aggregates, migrations.RunPython.noop),
+    ]
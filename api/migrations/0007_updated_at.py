@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-17 14:20
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_updated_at(apps, schema_editor):
+    db = schema_editor.connection.alias
+    for model_name in ("Property", "Review"):
+        apps.get_model("api", model_name).objects.using(db).update(
+            updated_at=F("created_at")
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0006_property_review_aggregates"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="property",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="review",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name="property",
+            index=models.Index(fields=["updated_at"], name="api_prop_updated_idx"),
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+    ]
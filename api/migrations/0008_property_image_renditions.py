@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 14:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0007_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="property",
+            name="image_renditions",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-17 14:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_payment_owners(apps, schema_editor):
+    Payment = apps.get_model("api", "Payment")
+    RentalApplication = apps.get_model("api", "RentalApplication")
+    db = schema_editor.connection.alias
+    application = RentalApplication.objects.using(db).filter(
+        pk=OuterRef("application_id")
+    )
+    Payment.objects.using(db).update(
+        tenant_id=Subquery(application.values("tenant_id")[:1]),
+        property_id=Subquery(application.values("property_id")[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0009_property_geolocation"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="payment",
+            name="property",
+            field=models.ForeignKey(
+                db_index=False,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="payments",
+                to="api.property",
+            ),
+        ),
+        migrations.AddField(
+            model_name="payment",
+            name="tenant",
+            field=models.ForeignKey(
+                db_index=False,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="payments",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.RunPython(backfill_payment_owners, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,129 @@
+# Generated by Django 5.2.18 on 2026-10-17 14:37
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_payment_ledger(apps, schema_editor):
+    Payment = apps.get_model("api", "Payment")
+    PaymentLedger = apps.get_model("api", "PaymentLedger")
+    db = schema_editor.connection.alias
+    ledger = {}
+    rows = (
+        Payment.objects.using(db)
+        .filter(status="completed")
+        .order_by("created_at", "id")
+        .values_list("tenant_id", "property_id", "amount", "created_at")
+    )
+    for tenant_id, property_id, amount, created_at in rows.iterator(chunk_size=2000):
+        row = ledger.setdefault(
+            (tenant_id, property_id),
+            PaymentLedger(
+                tenant_id=tenant_id,
+                property_id=property_id,
+                payment_count=0,
+                total_paid=Decimal("0"),
+            ),
+        )
+        row.payment_count += 1
+        row.total_paid += amount
+        row.last_payment_at, row.last_payment_amount = created_at, amount
+    PaymentLedger.objects.using(db).bulk_create(ledger.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+    # Separate from 0010: Postgres refuses to ALTER a table with pending
+    # trigger events from the backfill UPDATE in the same transaction.
+
+    dependencies = [
+        ("api", "0010_payment_owner_fields"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="payment",
+            name="property",
+            field=models.ForeignKey(
+                db_index=False,
+                editable=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="payments",
+                to="api.property",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="payment",
+            name="tenant",
+            field=models.ForeignKey(
+                db_index=False,
+                editable=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="payments",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="payment",
+            index=models.Index(
+                fields=["tenant", "-created_at"], name="api_pay_tenant_recent_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="payment",
+            index=models.Index(
+                fields=["property", "-created_at"], name="api_pay_prop_recent_idx"
+            ),
+        ),
+        migrations.CreateModel(
+            name="PaymentLedger",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("payment_count", models.PositiveIntegerField(default=0)),
+                (
+                    "total_paid",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                ("last_payment_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "last_payment_amount",
+                    models.DecimalField(
+                        blank=True, decimal_places=2, max_digits=10, null=True
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="paymentledger",
+            name="property",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="payment_ledger",
+                to="api.property",
+            ),
+        ),
+        migrations.AddField(
+            model_name="paymentledger",
+            name="tenant",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="payment_ledger",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="paymentledger",
+            unique_together={("tenant", "property")},
+        ),
+        migrations.RunPython(backfill_payment_ledger, migrations.RunPython.noop),
+    ]
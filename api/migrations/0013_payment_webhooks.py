@@ -0,0 +1,93 @@
+# Generated by Django 5.2.18 on 2026-10-17 14:45
+
+import uuid
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def clean_transaction_ids(apps, schema_editor):
+    """Blank and duplicated transaction ids would break the unique index."""
+    Payment = apps.get_model("api", "Payment")
+    db = schema_editor.connection.alias
+    payments = Payment.objects.using(db)
+    payments.filter(transaction_id="").update(transaction_id=None)
+    duplicated = (
+        payments.exclude(transaction_id=None)
+        .values("transaction_id")
+        .annotate(n=Count("id"))
+        .filter(n__gt=1)
+        .values_list("transaction_id", flat=True)
+    )
+    for transaction_id in list(duplicated):
+        keep = payments.filter(transaction_id=transaction_id).order_by("id").first()
+        payments.filter(transaction_id=transaction_id).exclude(pk=keep.pk).update(
+            transaction_id=None
+        )
+
+
+def assign_transaction_ids(apps, schema_editor):
+    Payment = apps.get_model("api", "Payment")
+    db = schema_editor.connection.alias
+    missing = list(Payment.objects.using(db).filter(transaction_id=None).only("id"))
+    for payment in missing:
+        payment.transaction_id = f"KRH-{uuid.uuid4().hex.upper()}"
+    Payment.objects.using(db).bulk_update(missing, ["transaction_id"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0012_idempotency_key"),
+    ]
+
+    operations = [
+        migrations.RunPython(clean_transaction_ids, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="payment",
+            name="transaction_id",
+            field=models.CharField(blank=True, max_length=100, null=True, unique=True),
+        ),
+        migrations.CreateModel(
+            name="PaymentWebhookEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("event_id", models.CharField(max_length=100, unique=True)),
+                ("transaction_id", models.CharField(max_length=100)),
+                ("status", models.CharField(max_length=50)),
+                ("payload", models.JSONField(default=dict)),
+                ("received_at", models.DateTimeField(auto_now_add=True)),
+                ("processed_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "result",
+                    models.CharField(
+                        blank=True,
+                        choices=[
+                            ("applied", "Applied"),
+                            ("ignored", "Ignored"),
+                            ("unknown", "Unknown transaction"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("processed_at__isnull", True)),
+                        fields=["id"],
+                        name="api_webhook_pending_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(assign_transaction_ids, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+LISTING_FIELDS = (
+    "name", "category", "description", "location", "latitude", "longitude", "price", "image",
+    "image_renditions", "created_at", "updated_at", "review_count", "avg_rating",
+)
+
+
+def backfill_listings(apps, schema_editor):
+    Property = apps.get_model("api", "Property")
+    AvailableListing = apps.get_model("api", "AvailableListing")
+    db = schema_editor.connection.alias
+    rows = (
+        Property.objects.using(db)
+        .filter(is_available=True)
+        .values("pk", "landlord__username", *LISTING_FIELDS)
+    )
+    listings = []
+    for row in rows.iterator(chunk_size=2000):
+        renditions = row["image_renditions"] or {}
+        listings.append(
+            AvailableListing(
+                property_id=row["pk"],
+                landlord_username=row["landlord__username"],
+                thumbnail=renditions.get("thumbnail_jpeg") or row["image"] or "",
+                thumbnail_webp=renditions.get("thumbnail_webp") or "",
+                **{field: row[field] for field in LISTING_FIELDS},
+            )
+        )
+    AvailableListing.objects.using(db).bulk_create(listings, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0014_user_token_version"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AvailableListing",
+            fields=[
+                (
+                    "property",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="listing",
+                        serialize=False,
+                        to="api.property",
+                    ),
+                ),
+                ("landlord_username", models.CharField(max_length=150)),
+                ("name", models.CharField(max_length=200)),
+                ("category", models.CharField(max_length=100)),
+                ("description", models.TextField(blank=True, null=True)),
+                ("location", models.CharField(max_length=255)),
+                ("latitude", models.FloatField(blank=True, null=True)),
+                ("longitude", models.FloatField(blank=True, null=True)),
+                ("price", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("image", models.CharField(blank=True, max_length=100, null=True)),
+                ("image_renditions", models.JSONField(blank=True, default=dict)),
+                ("thumbnail", models.CharField(blank=True, default="", max_length=255)),
+                (
+                    "thumbnail_webp",
+                    models.CharField(blank=True, default="", max_length=255),
+                ),
+                ("created_at", models.DateTimeField()),
+                ("updated_at", models.DateTimeField()),
+                ("review_count", models.PositiveIntegerField(default=0)),
+                ("avg_rating", models.FloatField(default=0)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["-created_at"], name="api_listing_recent_idx")
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_listings, migrations.RunPython.noop),
+    ]
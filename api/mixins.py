@@ -0,0 +1,319 @@
+import hashlib
+from functools import lru_cache
+
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+from rest_framework.generics import get_object_or_404
+from rest_framework.permissions import BasePermission, IsAuthenticated
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from .cache import cache_key, entry_timeout, get_or_set
+from .replicas import read_alias, replica_for
+from .rows import RowSerializer, row_plan
+from .streaming import StreamingJSONRenderer, streaming_response
+
+READ_ACTIONS = ("list", "retrieve")
+
+
+@lru_cache(maxsize=None)
+def eager_loading_plan(serializer_class):
+    """
+    Work out, once per serializer class, which relations its fields read.
+
+    Returns ``(select_related, prefetch_related, only)``. ``only`` is None when
+    a field reads something that is not a concrete model field (a method,
+    ``source="*"``...), in which case no columns are deferred. Fields listed
+    in ``Meta.annotated_fields`` are queryset annotations and are skipped.
+    """
+    model = serializer_class.Meta.model
+    annotated = set(getattr(serializer_class.Meta, "annotated_fields", ()))
+    select, prefetch, only = set(), set(), {model._meta.pk.name}
+    for name, field in serializer_class().fields.items():
+        if field.write_only or name in annotated:
+            continue
+        if field.source == "*":
+            only = None
+            continue
+        current, path = model, []
+        parts = field.source.split(".")
+        for i, part in enumerate(parts):
+            try:
+                model_field = current._meta.get_field(part)
+            except FieldDoesNotExist:
+                only = None
+                break
+            path.append(model_field.name)
+            lookup = "__".join(path)
+            if model_field.many_to_many or model_field.one_to_many:
+                prefetch.add(lookup)
+                break
+            if only is not None:
+                only.add(lookup)
+            if not model_field.is_relation or i == len(parts) - 1:
+                break
+            # FK / one-to-one traversed by a dotted source
+            select.add(lookup)
+            current = model_field.related_model
+    return tuple(sorted(select)), tuple(sorted(prefetch)), (tuple(sorted(only)) if only else None)
+
+
+class EagerLoadingMixin:
+    """
+    Viewset mixin that applies select_related/prefetch_related (and only() on
+    read actions) derived from the serializer's fields, so list endpoints do
+    not issue a query per row for dotted ``source`` lookups.
+    """
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        select, prefetch, only = eager_loading_plan(self.get_serializer_class())
+        if select:
+            qs = qs.select_related(*select)
+        if prefetch:
+            qs = qs.prefetch_related(*prefetch)
+        if only and getattr(self, "action", None) in READ_ACTIONS:
+            qs = qs.only(*only)
+        return qs
+
+
+class FastReadMixin:
+    """
+    Viewset mixin that serves JSON list and retrieve from ``.values()`` rows
+    through the serializer's compiled row plan (see api/rows.py) instead of
+    model instances, with the same output. Serializers the plan cannot cover,
+    other renderers (the browsable API builds forms from the serializer) and
+    retrieve under a permission that checks objects keep the serializer.
+    Goes after the caching/ETag/streaming mixins, before EagerLoadingMixin.
+    """
+
+    def get_row_serializer(self, queryset):
+        """A RowSerializer for ``queryset`` on this request, or None."""
+        plan = row_plan(self.get_serializer_class())
+        if plan is None or not isinstance(getattr(self.request, "accepted_renderer", None), JSONRenderer):
+            return None
+        return RowSerializer(self.get_serializer(), plan, queryset)
+
+    def values_queryset(self, row_serializer, queryset):
+        """The list's ``values()`` rows; viewsets may read them from a summary table instead."""
+        return row_serializer.values(queryset)
+
+    def checks_objects(self):
+        return any(type(permission).has_object_permission is not BasePermission.has_object_permission
+                   for permission in self.get_permissions())
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = self.get_row_serializer(queryset)
+        if rows is None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.values_queryset(rows, queryset)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(rows.many(page))
+        return Response(rows.many(queryset))
+
+    def retrieve(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = self.get_row_serializer(queryset)
+        if rows is None or self.checks_objects():
+            return super().retrieve(request, *args, **kwargs)
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = get_object_or_404(rows.values(queryset), **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        return Response(rows.to_representation(row))
+
+
+def read_cache_tags(view):
+    """
+    The cache tags of ``view``'s current list/retrieve: ``cache_tag`` for a
+    list, ``<cache_object_tag>:<pk>`` for an object; () if it has none.
+    """
+    if not getattr(view, "cache_tag", None):
+        return ()
+    if view.action == "list":
+        return (view.cache_tag,)
+    return (f"{view.cache_object_tag}:{view.kwargs[view.lookup_field]}",)
+
+
+def response_cache_key(view):
+    # Paginated bodies embed absolute links, so key on the full URI
+    return cache_key(f"api:{view.basename}:{view.action}", view.request.build_absolute_uri(),
+                     tags=read_cache_tags(view))
+
+
+def fingerprint_cache_key(view):
+    return cache_key(f"fingerprint:{view.basename}:{view.action}", view.request.get_full_path(),
+                     tags=read_cache_tags(view))
+
+
+def conditional_validators(request, last, count):
+    """The ``(ETag, Last-Modified timestamp)`` for a ``(last, count)`` fingerprint of ``request``."""
+    raw = f"{request.get_full_path()}|{request.accepted_renderer.format}|{last.isoformat()}|{count}"
+    return quote_etag(hashlib.md5(raw.encode("utf-8")).hexdigest()), int(last.timestamp())
+
+
+def not_modified_response(request, etag, last_modified, use_last_modified):
+    """A 304 (or 412) when the request's preconditions match the validators, else None."""
+    return get_conditional_response(
+        request, etag=etag, last_modified=last_modified if use_last_modified else None,
+    )
+
+
+def set_validators(response, etag, last_modified):
+    if response.status_code in (200, 304):
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+    return response
+
+
+class CachedReadMixin:
+    """
+    Viewset mixin that caches list/retrieve response data under tag-versioned
+    keys: ``cache_tag`` covers lists and ``<cache_object_tag>:<pk>`` a single
+    object. Only use it where the serialized output does not depend on
+    the requesting user.
+    """
+    cache_tag = None
+    cache_object_tag = None
+    cache_timeout = 60 * 5
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        key = response_cache_key(self)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, entry_timeout(read_cache_tags(self), self.cache_timeout))
+        return response
+
+
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified support for list and retrieve.
+
+    The validators come from a fingerprint of the (filtered) queryset,
+    ``MAX(updated_at)`` plus ``COUNT(*)``, which is far cheaper than
+    serializing the page, and a matching ``If-None-Match`` gets a 304. For
+    lists, ``If-Modified-Since`` is not honoured: deleting a row does not
+    move ``MAX(updated_at)``, only the ETag notices it.
+
+    Related values a serializer embeds (a landlord's username, a review's
+    property name) are not part of the fingerprint; changing one touches
+    ``updated_at`` on the rows that embed it instead (api/signals.py).
+    """
+    fingerprint_field = "updated_at"
+
+    def list(self, request, *args, **kwargs):
+        def fingerprint():
+            row = self.fingerprint_queryset().order_by().aggregate(**self.fingerprint_aggregates())
+            return row["last"], row["count"]
+
+        return self.conditional_response(fingerprint, False, super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        def fingerprint():
+            try:
+                last = self.object_fingerprint_queryset().first()
+            except (TypeError, ValueError):
+                last = None
+            return last, int(last is not None)
+
+        return self.conditional_response(fingerprint, True, super().retrieve, request, *args, **kwargs)
+
+    def fingerprint_queryset(self):
+        """The rows a list's fingerprint covers; viewsets may read them from a summary table instead."""
+        return self.filter_queryset(self.get_queryset())
+
+    def fingerprint_aggregates(self):
+        return {"last": Max(self.fingerprint_field), "count": Count("pk")}
+
+    def object_fingerprint_queryset(self):
+        """The retrieved object's ``fingerprint_field``, as a flat values_list."""
+        return (self.get_queryset().order_by().filter(pk=self.kwargs[self.lookup_field])
+                .values_list(self.fingerprint_field, flat=True))
+
+    def get_fingerprint(self, compute):
+        # Reuse the response cache's tags when the viewset has them, so a
+        # cached fingerprint costs no query either.
+        tags = read_cache_tags(self)
+        if not tags:
+            return compute()
+        return get_or_set(fingerprint_cache_key(self), compute, getattr(self, "cache_timeout", None), tags=tags)
+
+    def conditional_response(self, compute, use_last_modified, handler, request, *args, **kwargs):
+        last, count = self.get_fingerprint(compute)
+        if not count:
+            return handler(request, *args, **kwargs)
+        etag, last_modified = conditional_validators(request, last, count)
+        response = not_modified_response(request, etag, last_modified, use_last_modified)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        return set_validators(response, etag, last_modified)
+
+
+class StreamingListMixin:
+    """
+    ``?stream=true`` on list returns every matching row, unpaginated, as one
+    JSON array. Rows are read with a chunked iterator (a server-side cursor on
+    Postgres), serialized one at a time and sent as they are produced, so
+    memory stays bounded by ``stream_chunk_size`` rows whatever the size of
+    the result. A stream skips pagination, so it is only served to clients
+    passing ``stream_permission_classes`` (signed-in users by default), even
+    on public lists. Goes after ConditionalGetMixin (streams get ETags too)
+    and before CachedReadMixin (streams are not cached).
+    """
+    stream_query_param = "stream"
+    stream_chunk_size = 500
+    stream_permission_classes = (IsAuthenticated,)
+
+    def check_stream_permissions(self, request):
+        for permission in (permission_class() for permission_class in self.stream_permission_classes):
+            if not permission.has_permission(request, self):
+                self.permission_denied(request, message=getattr(permission, "message", None),
+                                       code=getattr(permission, "code", None))
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get(self.stream_query_param) not in ("true", "1"):
+            return super().list(request, *args, **kwargs)
+        self.check_stream_permissions(request)
+        queryset = self.filter_queryset(self.get_queryset())
+        # The rows are read after the view returns: bind the database
+        # (possibly a replica) chosen for this request now
+        queryset = queryset.using(queryset.db)
+        row_serializer = self.get_row_serializer(queryset) if isinstance(self, FastReadMixin) else None
+        if row_serializer is not None:
+            queryset, represent = row_serializer.values(queryset), row_serializer.to_representation
+        else:
+            represent = self.get_serializer(many=True).child.to_representation
+        rows = (represent(obj) for obj in queryset.iterator(chunk_size=self.stream_chunk_size))
+        return streaming_response(request, StreamingJSONRenderer().render_array(rows), "application/json")
+
+
+class ReplicaReadMixin:
+    """
+    Viewset mixin that runs ``replica_actions`` with their reads routed to a
+    read replica (see api/replicas.py), unless the client wrote recently.
+    """
+    replica_actions = ("list", "retrieve")
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.action in self.replica_actions:
+            # After authentication, so a token client's recent writes are seen
+            self._replica_token = read_alias.set(replica_for(request, request.user))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = self.__dict__.pop("_replica_token", None)
+        if token is not None:
+            read_alias.reset(token)
+        return super().finalize_response(request, response, *args, **kwargs)
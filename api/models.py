@@ -1,16 +1,95 @@
-from django.db import models
+import uuid
+
+from django.db import models, router, transaction
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.search import SearchVectorField
 from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
 
+class TracksLoadedValues:
+    """
+    Remembers ``tracked_fields`` as loaded (or last saved) so post_save
+    receivers can tell which of them a save changed. Instances not loaded
+    from the database count as changed.
+    """
+    tracked_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_loaded()
+        return instance
+
+    def _remember_loaded(self):
+        # Deferred fields are remembered as missing
+        self._loaded_values = {name: self.__dict__[name] for name in self.tracked_fields if name in self.__dict__}
+
+    def has_changed(self, name):
+        loaded = getattr(self, "_loaded_values", {})
+        return name not in loaded or loaded[name] != getattr(self, name)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._remember_loaded()
+
+
 # -------- Custom User --------
-class User(AbstractUser):
+class User(TracksLoadedValues, AbstractUser):
     ROLE_CHOICES = (("tenant", "Tenant"), ("landlord", "Landlord"))
     role = models.CharField(max_length=20, choices=ROLE_CHOICES)
+    # Embedded in issued JWTs; bumping it revokes every token issued before
+    token_version = models.PositiveIntegerField(default=0, editable=False)
+    # Embedded in cached property and review responses (api/signals.py)
+    tracked_fields = ("username",)
 
     def __str__(self):
         return f"{self.username} ({self.role})"
 
+    def save(self, *args, **kwargs):
+        # A set_password() being saved is an explicit password change (the
+        # auth views and forms, the admin, changepassword) and revokes the
+        # user's tokens. check_password() clears _password before saving the
+        # rehash of an outdated hash, so logging in revokes nothing.
+        if self._password is not None and not self._state.adding:
+            self.token_version += 1
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "token_version"}
+        super().save(*args, **kwargs)
+
+    def revoke_tokens(self):
+        """Invalidate every JWT issued to this user so far."""
+        from .authentication import user_cache
+
+        User.objects.filter(pk=self.pk).update(token_version=models.F("token_version") + 1)
+        user_cache.invalidate(self.pk)  # update() sends no post_save
+        self.refresh_from_db(fields=["token_version"])
+
+
+class TokenUser(User):
+    """
+    User built from JWT claims by api.authentication.StatelessJWTAuthentication:
+    id, username, role and token_version come from the token, every other
+    field from the in-process user cache the first time one is read.
+    """
+
+    class Meta:
+        proxy = True
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        from .authentication import user_cache
+
+        # Reading a deferred field asks for just that field; answer it, and
+        # every other deferred one, from the cached row.
+        deferred = self.get_deferred_fields()
+        if from_queryset is None and fields and set(fields) <= deferred:
+            row = user_cache.get(self.pk)
+            if row is not None:
+                for attname in deferred:
+                    setattr(self, attname, row[attname])
+                return
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+
 
 # Optional profile (keep minimal for now)
 class Profile(models.Model):
@@ -19,7 +98,7 @@ class Profile(models.Model):
 
 
 # -------- Property --------
-class Property(models.Model):
+class Property(TracksLoadedValues, models.Model):
     landlord = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="properties"
     )
@@ -35,14 +114,116 @@ class Property(models.Model):
     )
     description = models.TextField(blank=True, null=True)
     location = models.CharField(max_length=255)
+    # Geocoded from `location` against the bundled gazetteer (api/geo.py)
+    latitude = models.FloatField(blank=True, null=True, editable=False)
+    longitude = models.FloatField(blank=True, null=True, editable=False)
+    geohash = models.CharField(max_length=12, blank=True, default="", editable=False)
+    geocoded_from = models.CharField(max_length=255, blank=True, default="", editable=False)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     image = models.ImageField(upload_to="property_images/", blank=True, null=True)
+    # Storage paths of the resized/WebP variants, filled in by api/images.py
+    image_renditions = models.JSONField(default=dict, blank=True, editable=False)
     is_available = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Denormalized review aggregates, maintained by Review.save()/post_delete (api/ratings.py)
+    review_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    avg_rating = models.FloatField(default=0, editable=False)
+    # Precomputed weighted tsvector (Postgres only, GIN-indexed); see api/search.py
+    search_vector = SearchVectorField(null=True, blank=True, editable=False)
+    # Embedded in review responses (api/signals.py)
+    tracked_fields = ("name",)
+
+    class Meta:
+        indexes = [
+            # Home page and ?is_available=true: available-only, newest first
+            models.Index(
+                fields=["-created_at"],
+                condition=models.Q(is_available=True),
+                name="api_prop_avail_recent_idx",
+            ),
+            models.Index(fields=["-created_at"], name="api_prop_recent_idx"),
+            models.Index(fields=["category", "-created_at"], name="api_prop_cat_recent_idx"),
+            models.Index(fields=["category", "price"], name="api_prop_cat_price_idx"),
+            models.Index(fields=["price"], name="api_prop_price_idx"),
+            models.Index(fields=["landlord", "-created_at"], name="api_prop_landlord_recent_idx"),
+            models.Index(fields=["-avg_rating", "-review_count"], name="api_prop_rating_idx"),
+            models.Index(fields=["updated_at"], name="api_prop_updated_idx"),
+            models.Index(fields=["geohash"], name="api_prop_geohash_idx"),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.location}"
 
+    def rendition_url(self, name):
+        """URL of a rendition such as ``thumbnail_webp``, or None until it has been built."""
+        path = (self.image_renditions or {}).get(name)
+        return self.image.storage.url(path) if path and name != "source" else None
+
+    @property
+    def thumbnail_url(self):
+        # Falls back to the original while the renditions are being built
+        return self.rendition_url("thumbnail_jpeg") or (self.image.url if self.image else None)
+
+    @property
+    def thumbnail_webp_url(self):
+        return self.rendition_url("thumbnail_webp")
+
+
+class AvailableListing(models.Model):
+    """
+    One row per available property with what the list pages show (its
+    landlord's username, rating aggregates and thumbnails included),
+    maintained by api.listings.
+    """
+    property = models.OneToOneField(Property, on_delete=models.CASCADE, primary_key=True, related_name="listing")
+    landlord_username = models.CharField(max_length=150)
+    name = models.CharField(max_length=200)
+    category = models.CharField(max_length=100)
+    description = models.TextField(blank=True, null=True)
+    location = models.CharField(max_length=255)
+    latitude = models.FloatField(blank=True, null=True)
+    longitude = models.FloatField(blank=True, null=True)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    # Storage paths, as stored on the property
+    image = models.CharField(max_length=100, blank=True, null=True)
+    image_renditions = models.JSONField(default=dict, blank=True)
+    thumbnail = models.CharField(max_length=255, blank=True, default="")
+    thumbnail_webp = models.CharField(max_length=255, blank=True, default="")
+    created_at = models.DateTimeField()
+    # The list's ETag fingerprint (ConditionalGetMixin)
+    updated_at = models.DateTimeField()
+    review_count = models.PositiveIntegerField(default=0)
+    avg_rating = models.FloatField(default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=["-created_at"], name="api_listing_recent_idx")]
+
+    def __str__(self):
+        return f"Listing {self.property_id}: {self.name}"
+
+    # Methods, not properties: the ``property`` field shadows the builtin
+    # here. Templates call them all the same.
+    def thumbnail_url(self):
+        return Property._meta.get_field("image").storage.url(self.thumbnail) if self.thumbnail else None
+
+    def thumbnail_webp_url(self):
+        return Property._meta.get_field("image").storage.url(self.thumbnail_webp) if self.thumbnail_webp else None
+
+
+# Inverted-index fallback for full-text search on databases without tsvector (SQLite)
+class PropertySearchTerm(models.Model):
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name="search_terms")
+    term = models.CharField(max_length=64)
+    weight = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        indexes = [models.Index(fields=["term", "property"], name="api_search_term_idx")]
+
+    def __str__(self):
+        return f"{self.term} -> {self.property_id}"
+
 
 # -------- Rental Application --------
 class RentalApplication(models.Model):
@@ -58,6 +239,11 @@ class RentalApplication(models.Model):
 
     class Meta:
         unique_together = ("property", "tenant")
+        indexes = [
+            models.Index(fields=["tenant", "-created_at"], name="api_app_tenant_recent_idx"),
+            models.Index(fields=["property", "-created_at"], name="api_app_prop_recent_idx"),
+            models.Index(fields=["property", "status"], name="api_app_prop_status_idx"),
+        ]
 
     def __str__(self):
         return f"{self.tenant.username} -> {self.property.name} ({self.status})"
@@ -75,12 +261,110 @@ class Payment(models.Model):
         choices=[("pending", "Pending"), ("completed", "Completed"), ("failed", "Failed")],
         default="pending"
     )
-    transaction_id = models.CharField(max_length=100, blank=True, null=True)
+    # Gateway reference; assigned on creation and used to match webhook callbacks
+    transaction_id = models.CharField(max_length=100, blank=True, null=True, unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Copied from the application on save so per-user history is one index range
+    tenant = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="payments",
+        editable=False, db_index=False,
+    )
+    property = models.ForeignKey(
+        Property, on_delete=models.CASCADE, related_name="payments", editable=False, db_index=False,
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["application", "-created_at"], name="api_pay_app_recent_idx"),
+            models.Index(fields=["status", "-created_at"], name="api_pay_status_recent_idx"),
+            models.Index(fields=["tenant", "-created_at"], name="api_pay_tenant_recent_idx"),
+            models.Index(fields=["property", "-created_at"], name="api_pay_prop_recent_idx"),
+        ]
 
     def __str__(self):
         return f"Payment {self.id} - {self.status}"
 
+    def save(self, *args, **kwargs):
+        from .ledger import apply_payment_change
+
+        self.tenant_id = self.application.tenant_id
+        self.property_id = self.application.property_id
+        if not self.transaction_id:
+            self.transaction_id = new_transaction_id()
+        # Where Model.save() will write: the router, which falls back to
+        # the instance's own database when no router decides
+        using = kwargs.get("using") or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            previous = None
+            if self.pk is not None:
+                # Lock the stored row so concurrent status changes apply in turn
+                previous = (Payment.objects.using(using).select_for_update()
+                            .filter(pk=self.pk)
+                            .values("tenant_id", "property_id", "status", "amount", "created_at").first())
+            super().save(*args, **kwargs)
+            apply_payment_change(previous, self, using=using)
+
+
+class PaymentLedger(models.Model):
+    """Completed-payment totals per (tenant, property), maintained by api.ledger."""
+    tenant = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="payment_ledger")
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name="payment_ledger")
+    payment_count = models.PositiveIntegerField(default=0)
+    total_paid = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    last_payment_at = models.DateTimeField(blank=True, null=True)
+    last_payment_amount = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+
+    class Meta:
+        unique_together = ("tenant", "property")
+
+    def __str__(self):
+        return f"Ledger {self.tenant_id}/{self.property_id}: {self.total_paid}"
+
+
+def new_transaction_id():
+    return f"KRH-{uuid.uuid4().hex.upper()}"
+
+
+class PaymentWebhookEvent(models.Model):
+    """
+    Inbox of gateway callbacks. The webhook only inserts rows here; the
+    worker in api.webhooks applies them to payments in batches.
+    """
+    RESULTS = [("applied", "Applied"), ("ignored", "Ignored"), ("unknown", "Unknown transaction")]
+
+    event_id = models.CharField(max_length=100, unique=True)
+    transaction_id = models.CharField(max_length=100)
+    status = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+    result = models.CharField(max_length=20, choices=RESULTS, blank=True)
+
+    class Meta:
+        indexes = [
+            # The worker's queue: only unprocessed events, oldest first
+            models.Index(fields=["id"], condition=models.Q(processed_at__isnull=True),
+                         name="api_webhook_pending_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.event_id}: {self.transaction_id} -> {self.status}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    A client Idempotency-Key and the response it produced (api.idempotency).
+    Stored as a digest of (user, scope, key) so rows stay small and fixed-size.
+    """
+    key = models.CharField(max_length=64, primary_key=True)
+    request_hash = models.CharField(max_length=64)
+    response_status = models.PositiveSmallIntegerField(blank=True, null=True)
+    response_body = models.JSONField(blank=True, null=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.key
+
 
 class Review(models.Model):
     property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name="reviews")
@@ -88,9 +372,35 @@ class Review(models.Model):
     rating = models.IntegerField(validators=[MinValueValidator(1), MaxValueValidator(5)])  # 1–5 scale
     comment = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ("property", "tenant")
+        indexes = [
+            models.Index(fields=["property", "-created_at"], name="api_review_prop_recent_idx"),
+            models.Index(fields=["-created_at"], name="api_review_recent_idx"),
+        ]
 
     def __str__(self):
         return f"Review by {self.tenant.username} on {self.property.name}"
+
+    def save(self, *args, **kwargs):
+        from .ratings import apply_review_delta
+
+        # Where Model.save() will write: the router, which falls back to
+        # the instance's own database when no router decides
+        using = kwargs.get("using") or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            previous = None
+            if self.pk is not None:
+                # Lock the stored row so concurrent edits apply their deltas in turn
+                previous = (Review.objects.using(using).select_for_update()
+                            .filter(pk=self.pk).values("property_id", "rating").first())
+            super().save(*args, **kwargs)
+            if previous is None:
+                apply_review_delta(self.property_id, 1, self.rating, using=using)
+            elif previous["property_id"] != self.property_id:
+                apply_review_delta(previous["property_id"], -1, -previous["rating"], using=using)
+                apply_review_delta(self.property_id, 1, self.rating, using=using)
+            else:
+                apply_review_delta(self.property_id, 0, self.rating - previous["rating"], using=using)
@@ -0,0 +1,204 @@
+import base64
+import datetime
+import json
+from collections import OrderedDict
+
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+# Below this many (estimated) rows an exact COUNT(*) is cheap enough to run.
+ESTIMATE_THRESHOLD = 10000
+
+
+def estimate_count(queryset, threshold=ESTIMATE_THRESHOLD):
+    """
+    Return ``(count, is_estimate)``. On Postgres the planner's row estimate is
+    used when it is at least ``threshold``; otherwise an exact count is run.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == "postgresql":
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        estimate = int(plan[0]["Plan"]["Plan Rows"])
+        if estimate >= threshold:
+            return estimate, True
+    return queryset.count(), False
+
+
+def parse_datetime_or_date(value):
+    """An ISO datetime, or a date meaning its midnight (current timezone). None if invalid."""
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            return None
+        parsed = datetime.datetime.combine(day, datetime.time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class EstimatedPage(Page):
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+    def end_index(self):
+        return (self.number - 1) * self.paginator.per_page + len(self.object_list)
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator whose ``count`` may be the planner's estimate. The estimate is
+    only reported: which pages exist and whether there is a next one come
+    from the rows themselves (``per_page + 1`` are fetched), since an
+    estimate on a filtered list can be far off either way.
+    """
+
+    @cached_property
+    def count(self):
+        count, self.count_is_estimate = estimate_count(self.object_list)
+        return count
+
+    def validate_number(self, number):
+        # Paginator.validate_number() without the upper bound, which needs the count
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(self.error_messages["invalid_page"])
+        if number < 1:
+            raise EmptyPage(self.error_messages["min_page"])
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage(self.error_messages["no_results"])
+        return EstimatedPage(rows[:self.per_page], number, self, has_next=len(rows) > self.per_page)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on ``(created_at, id)``, newest first.
+
+    Each page is a single index range scan regardless of depth, and no
+    COUNT(*) is run unless the client asks for one with ``count=exact`` or
+    ``count=estimate``.
+    """
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+    ordering = ("-created_at", "-id")
+    page_size = api_settings.PAGE_SIZE
+
+    def supports(self, queryset):
+        # Only querysets already ordered newest-first (or unordered) can be
+        # keyset-paginated without changing their meaning.
+        order_by = queryset.query.order_by
+        return not order_by or order_by[0] == self.ordering[0]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.count = None
+        self.count_is_estimate = False
+        count_mode = request.query_params.get(self.count_query_param)
+        if count_mode == "exact":
+            self.count = queryset.count()
+        elif count_mode == "estimate":
+            self.count, self.count_is_estimate = estimate_count(queryset)
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        if position is not None:
+            created_at, pk = position
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+            )
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            created_at, pk = base64.urlsafe_b64decode(encoded.encode("ascii")).decode("ascii").split("|")
+            created_at = parse_datetime(created_at)
+            pk = int(pk)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound("Invalid cursor")
+        if created_at is None:
+            raise NotFound("Invalid cursor")
+        return created_at, pk
+
+    def encode_cursor(self, obj):
+        # Pages from FastReadMixin are values() rows
+        created_at, pk = (obj["created_at"], obj["id"]) if isinstance(obj, dict) else (obj.created_at, obj.pk)
+        raw = f"{created_at.isoformat()}|{pk}"
+        return base64.urlsafe_b64encode(raw.encode("ascii")).decode("ascii")
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        payload = OrderedDict()
+        if self.count is not None:
+            payload["count"] = self.count
+            payload["count_is_estimate"] = self.count_is_estimate
+        payload["next"] = self.get_next_link()
+        payload["previous"] = None
+        payload["results"] = data
+        return Response(payload)
+
+
+class HybridPagination(PageNumberPagination):
+    """
+    Page-number pagination by default. Clients opt into keyset pages per
+    request with ``?pagination=cursor`` (or by following a ``cursor`` link), and
+    into an estimated total with ``?count=estimate``.
+    """
+    mode_query_param = "pagination"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        params = request.query_params
+        if params.get(self.mode_query_param) == "cursor" or KeysetPagination.cursor_query_param in params:
+            keyset = KeysetPagination()
+            if keyset.supports(queryset):
+                self.keyset = keyset
+                return keyset.paginate_queryset(queryset, request, view)
+        if params.get(KeysetPagination.count_query_param) == "estimate":
+            self.django_paginator_class = EstimatedCountPaginator
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        response = super().get_paginated_response(data)
+        if self.django_paginator_class is EstimatedCountPaginator:
+            response.data["count_is_estimate"] = self.page.paginator.count_is_estimate
+        return response
@@ -0,0 +1,39 @@
+import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Payment, RentalApplication
+
+
+class DuplicatePayment(Exception):
+    """A pending payment of the same amount was just submitted for the application."""
+
+    def __init__(self, payment):
+        super().__init__(f"Payment {payment.pk} is already pending.")
+        self.payment = payment
+
+
+def submit_payment(application_id, amount, create, using="default"):
+    """
+    Run ``create()`` to record a payment, serialized per application.
+
+    The application row is locked first, so concurrent submissions for the
+    same application run one after the other and the second one sees the
+    first one's pending payment (and raises DuplicatePayment) instead of
+    inserting a copy. Only payments from the last
+    ``PAYMENT_DUPLICATE_WINDOW`` seconds count: rent is the same amount every
+    month and stays pending until reconciled, so an older pending payment is
+    no reason to refuse a new one.
+    """
+    window = datetime.timedelta(seconds=getattr(settings, "PAYMENT_DUPLICATE_WINDOW", 120))
+    with transaction.atomic(using=using):
+        RentalApplication.objects.using(using).select_for_update().only("pk").get(pk=application_id)
+        pending = (Payment.objects.using(using)
+                   .filter(application_id=application_id, status="pending", amount=amount,
+                           created_at__gte=timezone.now() - window)
+                   .first())
+        if pending is not None:
+            raise DuplicatePayment(pending)
+        return create()
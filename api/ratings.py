@@ -0,0 +1,73 @@
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, Now, Round
+
+from .cache import invalidate_tags
+from .listings import refresh_listing_ratings
+
+
+def average_expression():
+    """avg_rating computed from the stored counters (0 when there are no reviews)."""
+    return Case(
+        When(review_count=0, then=Value(0.0)),
+        default=Round(Cast(F("rating_sum"), FloatField()) / F("review_count"), 2),
+        output_field=FloatField(),
+    )
+
+
+def apply_review_delta(property_id, count, rating, using="default"):
+    """
+    Add ``count`` reviews totalling ``rating`` points to a property's counters.
+
+    The counters are bumped with a single relative UPDATE, so concurrent
+    writers never lose each other's increments; avg_rating is then derived
+    from the stored counters in a second statement (MySQL evaluates SET
+    clauses left to right, so it cannot share the first one).
+    """
+    from .models import Property
+
+    if not count and not rating:
+        return
+    with transaction.atomic(using=using):
+        rows = Property.objects.using(using).filter(pk=property_id)
+        rows.update(review_count=F("review_count") + count, rating_sum=F("rating_sum") + rating)
+        rows.update(avg_rating=average_expression(), updated_at=Now())
+        refresh_listing_ratings([property_id], using=using)
+    invalidate_tags("properties", f"property:{property_id}", using=using)
+
+
+def review_aggregate_subqueries():
+    from .models import Review
+
+    reviews = Review.objects.filter(property=OuterRef("pk")).order_by().values("property")
+    count = Subquery(reviews.annotate(c=Count("id")).values("c"), output_field=IntegerField())
+    total = Subquery(reviews.annotate(s=Sum("rating")).values("s"), output_field=IntegerField())
+    return Coalesce(count, 0), Coalesce(total, 0)
+
+
+def stale_review_aggregates(using="default"):
+    """Properties whose stored counters disagree with their reviews."""
+    from .models import Property
+
+    count, total = review_aggregate_subqueries()
+    return (Property.objects.using(using)
+            .annotate(actual_count=count, actual_sum=total)
+            .exclude(review_count=F("actual_count"), rating_sum=F("actual_sum")))
+
+
+def recompute_review_aggregates(using="default"):
+    """
+    Rebuild the counters of every property that has drifted from its reviews,
+    in two bulk UPDATEs. Returns the number of properties fixed.
+    """
+    from .models import Property
+
+    count, total = review_aggregate_subqueries()
+    with transaction.atomic(using=using):
+        stale = list(stale_review_aggregates(using=using).values_list("pk", flat=True))
+        rows = Property.objects.using(using).filter(pk__in=stale)
+        updated = rows.update(review_count=count, rating_sum=total)
+        rows.update(avg_rating=average_expression(), updated_at=Now())
+        refresh_listing_ratings(stale, using=using)
+    invalidate_tags("properties", *(f"property:{pk}" for pk in stale), using=using)
+    return updated
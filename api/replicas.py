@@ -0,0 +1,132 @@
+"""
+Read replicas.
+
+ReplicaRouter sends reads to the aliases in ``settings.DATABASE_REPLICAS``,
+but only inside ``use_replica()``: the public read paths opt in (the
+ReplicaReadMixin viewset actions, views decorated with ``replica_reads``),
+everything else reads and writes the primary. Sessions and users are always
+read from the primary, so logins and token revocation never see a lagging
+copy.
+
+Read-your-writes: after any unsafe request (POST, PATCH...),
+ReplicaStickinessMiddleware pins the client to the primary for
+``REPLICA_STICKY_SECONDS``, with a cookie for browsers and a cache entry
+keyed on the user for token clients, which rarely keep cookies. Set it
+comfortably above the replicas' usual lag.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+STICKY_COOKIE = "krh_primary"
+STICKY_KEY = "replica:sticky:{}"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS", "TRACE")
+
+read_alias = ContextVar("read_alias", default=None)
+
+
+def replicas():
+    return getattr(settings, "DATABASE_REPLICAS", [])
+
+
+def primary_only_models():
+    return {settings.AUTH_USER_MODEL.lower(), "sessions.session"}
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = read_alias.get()
+        if alias and model._meta.label_lower not in primary_only_models():
+            return alias
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Explicit, or an instance read from a replica would be saved back to it
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {"default", *replicas()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema through replication
+        if db in replicas():
+            return False
+        return None
+
+
+@contextmanager
+def use_replica(alias):
+    """Route reads (of replica-safe models) in this block to ``alias``; None keeps them on the primary."""
+    token = read_alias.set(alias)
+    try:
+        yield alias
+    finally:
+        read_alias.reset(token)
+
+
+def is_sticky(request, user=None):
+    """Whether ``request``'s client wrote recently and must read the primary."""
+    if request.COOKIES.get(STICKY_COOKIE):
+        return True
+    return bool(user is not None and user.is_authenticated and cache.get(STICKY_KEY.format(user.pk)))
+
+
+def replica_for(request, user=None):
+    """The replica alias to read from for ``request``, or None for the primary."""
+    aliases = replicas()
+    if not aliases or request.method not in SAFE_METHODS or is_sticky(request, user):
+        return None
+    return random.choice(aliases)
+
+
+def replica_reads(view):
+    """Decorator for function views whose reads may come from a replica."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with use_replica(replica_for(request, request.user)):
+            return view(request, *args, **kwargs)
+
+    return wrapper
+
+
+def mark_sticky(request, response):
+    seconds = getattr(settings, "REPLICA_STICKY_SECONDS", 10)
+    response.set_cookie(STICKY_COOKIE, "1", max_age=seconds, httponly=True, samesite="Lax",
+                        secure=settings.SESSION_COOKIE_SECURE)
+    # DRF stores the token-authenticated user on the underlying request too
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        cache.set(STICKY_KEY.format(user.pk), True, seconds)
+
+
+class ReplicaStickinessMiddleware:
+    """Pins clients to the primary after a write. Goes after AuthenticationMiddleware."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        if replicas() and request.method not in SAFE_METHODS:
+            mark_sticky(request, response)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if replicas() and request.method not in SAFE_METHODS:
+            await sync_to_async(mark_sticky)(request, response)
+        return response
@@ -0,0 +1,183 @@
+"""
+Read-only fast path for ModelSerializers.
+
+Serializing model instances costs, per row and per field, a dotted-source
+``get_attribute()``, the None/SkipField checks and a ``to_representation()``
+that works out its settings again every time (DecimalField copies a decimal
+context, DateTimeField looks up the timezone). row_plan() works out once per
+serializer class which ``.values()`` column feeds each readable field;
+RowSerializer binds that plan to one request's serializer and turns row dicts
+into the dicts the serializer would have produced, formatting the common
+field types inline with the settings resolved once.
+
+A serializer qualifies when every readable field reads a concrete column: a
+model field, a forward FK's id (PrimaryKeyRelatedField), or a dotted source
+through non-null FKs. Anything else (methods, ``source="*"``, nested
+serializers) makes row_plan() return None, and callers keep the serializer.
+"""
+import datetime
+import decimal
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from rest_framework import ISO_8601, fields, relations
+from rest_framework.settings import api_settings
+
+from .metrics import timed_serialization
+
+# Field types whose to_representation() returns a column value unchanged
+PASSTHROUGH = (fields.ReadOnlyField, fields.CharField, fields.ChoiceField, fields.IntegerField, fields.BooleanField)
+
+
+def source_column(model, field):
+    """The ``.values()`` column feeding serializer ``field``, and its model field; None if it has none."""
+    if field.source == "*":
+        return None
+    current, path = model, []
+    parts = field.source.split(".")
+    for i, part in enumerate(parts):
+        try:
+            model_field = current._meta.get_field(part)
+        except FieldDoesNotExist:
+            return None
+        if not model_field.concrete or model_field.many_to_many:
+            return None
+        path.append(model_field.name)
+        if i == len(parts) - 1:
+            break
+        # A null FK part way makes the serializer omit the key, which a
+        # values() row cannot tell from a null column
+        if not model_field.is_relation or model_field.null:
+            return None
+        current = model_field.related_model
+    if model_field.is_relation:
+        if not isinstance(field, relations.PrimaryKeyRelatedField) or field.pk_field is not None:
+            return None
+    elif isinstance(model_field, models.FileField) != isinstance(field, fields.FileField):
+        return None
+    return "__".join(path), model_field
+
+
+@lru_cache(maxsize=None)
+def row_plan(serializer_class):
+    """
+    ``(name, column, model_field, annotated)`` for each readable field of
+    ``serializer_class``, or None when some field cannot be read from a
+    column. Fields in ``Meta.annotated_fields`` read the queryset annotation
+    of the same name, when there is one.
+    """
+    model = serializer_class.Meta.model
+    annotated = set(getattr(serializer_class.Meta, "annotated_fields", ()))
+    plan = []
+    for name, field in serializer_class().fields.items():
+        if field.write_only:
+            continue
+        if name in annotated:
+            plan.append((name, field.source, None, True))
+            continue
+        column = source_column(model, field)
+        if column is None:
+            return None
+        plan.append((name, *column, False))
+    return tuple(plan)
+
+
+def converter(field, model_field, context):
+    """``field.to_representation``, or an equivalent with its settings resolved now; None for identity."""
+    if type(field) in PASSTHROUGH or isinstance(field, relations.PrimaryKeyRelatedField):
+        return None
+    if type(field) is fields.FloatField:
+        return float
+    if type(field) is fields.DecimalField:
+        return decimal_converter(field)
+    if type(field) is fields.DateTimeField:
+        return datetime_converter(field)
+    if isinstance(field, fields.FileField):
+        return file_converter(field, model_field, context)
+    return field.to_representation
+
+
+def decimal_converter(field):
+    if (not getattr(field, "coerce_to_string", api_settings.COERCE_DECIMAL_TO_STRING) or field.localize
+            or field.normalize_output or field.decimal_places is None):
+        return field.to_representation
+    # What DecimalField.quantize() builds on every call
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    exponent = decimal.Decimal(".1") ** field.decimal_places
+    rounding = field.rounding
+
+    def convert(value):
+        if not isinstance(value, decimal.Decimal):
+            return field.to_representation(value)
+        return f"{value.quantize(exponent, rounding=rounding, context=context):f}"
+
+    return convert
+
+
+def datetime_converter(field):
+    output_format = getattr(field, "format", api_settings.DATETIME_FORMAT)
+    tz = field.timezone if hasattr(field, "timezone") else field.default_timezone()
+    if tz is None or output_format is None or output_format.lower() != ISO_8601:
+        return field.to_representation
+
+    def convert(value):
+        if not isinstance(value, datetime.datetime) or value.utcoffset() is None:
+            return field.to_representation(value)
+        value = value.astimezone(tz).isoformat()
+        return value[:-6] + "Z" if value.endswith("+00:00") else value
+
+    return convert
+
+
+def file_converter(field, model_field, context):
+    if not getattr(field, "use_url", api_settings.UPLOADED_FILES_USE_URL):
+        return lambda name: name or None
+    storage, request = model_field.storage, context.get("request")
+
+    def convert(name):
+        if not name:
+            return None
+        url = storage.url(name)
+        return request.build_absolute_uri(url) if request is not None else url
+
+    return convert
+
+
+class RowSerializer:
+    """
+    ``serializer``'s representation of ``values()`` rows of ``queryset``:
+    ``rows.values(queryset)`` selects the columns, ``to_representation(row)``
+    and ``many(rows)`` build the same data as the serializer.
+    """
+
+    def __init__(self, serializer, plan, queryset):
+        bound = serializer.fields
+        annotations = queryset.query.annotations
+        self.fields = [
+            (name, column, converter(bound[name], model_field, serializer.context))
+            for name, column, model_field, annotated in plan
+            if not annotated or column in annotations
+        ]
+        self.columns = list(dict.fromkeys(column for _, column, _ in self.fields))
+
+    def values(self, queryset):
+        return queryset.prefetch_related(None).values(*self.columns)
+
+    def represent(self, row):
+        ret = {}
+        for name, column, convert in self.fields:
+            value = row[column]
+            ret[name] = value if value is None or convert is None else convert(value)
+        return ret
+
+    # Timed like BaseSerializer.data, which this stands in for (api/metrics.py)
+    def to_representation(self, row):
+        with timed_serialization():
+            return self.represent(row)
+
+    def many(self, rows):
+        with timed_serialization():
+            return [self.represent(row) for row in rows]
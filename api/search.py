@@ -0,0 +1,139 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connections
+from django.db.models import F, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+# Field weights used by both backends: name matches outrank location matches,
+# which outrank description matches.
+FIELD_WEIGHTS = (("name", "A", 4), ("location", "B", 2), ("description", "C", 1))
+SEARCH_CONFIG = "simple"
+MAX_TERM_LENGTH = 64
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text):
+    """Split free text into lower-cased search terms."""
+    return [t[:MAX_TERM_LENGTH] for t in _TOKEN_RE.findall((text or "").lower())]
+
+
+def build_terms(name, location, description):
+    """Return {term: weight} for a property's searchable fields (inverted-index fallback)."""
+    values = {"name": name, "location": location, "description": description}
+    terms = {}
+    for field, _label, weight in FIELD_WEIGHTS:
+        for term in tokenize(values[field]):
+            terms[term] = terms.get(term, 0) + weight
+    return terms
+
+
+def search_vector():
+    """Weighted tsvector expression stored in Property.search_vector on Postgres."""
+    vector = None
+    for field, label, _weight in FIELD_WEIGHTS:
+        part = SearchVector(Coalesce(field, Value("")), weight=label, config=SEARCH_CONFIG)
+        vector = part if vector is None else vector + part
+    return vector
+
+
+def uses_postgres(using="default"):
+    return connections[using].vendor == "postgresql"
+
+
+def index_property(prop, using="default"):
+    """Refresh the precomputed search document for a single property."""
+    from .models import Property, PropertySearchTerm
+
+    if uses_postgres(using):
+        Property.objects.using(using).filter(pk=prop.pk).update(search_vector=search_vector())
+        return
+    PropertySearchTerm.objects.using(using).filter(property_id=prop.pk).delete()
+    PropertySearchTerm.objects.using(using).bulk_create([
+        PropertySearchTerm(property_id=prop.pk, term=term, weight=weight)
+        for term, weight in build_terms(prop.name, prop.location, prop.description).items()
+    ])
+
+
+def index_properties(props, using="default"):
+    """index_property for a batch (e.g. rows written by bulk_create) in two queries."""
+    from .models import Property, PropertySearchTerm
+
+    pks = [prop.pk for prop in props]
+    if uses_postgres(using):
+        Property.objects.using(using).filter(pk__in=pks).update(search_vector=search_vector())
+        return
+    PropertySearchTerm.objects.using(using).filter(property_id__in=pks).delete()
+    PropertySearchTerm.objects.using(using).bulk_create([
+        PropertySearchTerm(property_id=prop.pk, term=term, weight=weight)
+        for prop in props
+        for term, weight in build_terms(prop.name, prop.location, prop.description).items()
+    ])
+
+
+def rebuild_index(using="default", batch_size=500):
+    """Recompute the search document for every property. Returns the number indexed."""
+    from .models import Property, PropertySearchTerm
+
+    if uses_postgres(using):
+        return Property.objects.using(using).update(search_vector=search_vector())
+
+    PropertySearchTerm.objects.using(using).all().delete()
+    count, batch = 0, []
+    rows = Property.objects.using(using).values_list("pk", "name", "location", "description")
+    for pk, name, location, description in rows.iterator(chunk_size=batch_size):
+        count += 1
+        batch.extend(
+            PropertySearchTerm(property_id=pk, term=term, weight=weight)
+            for term, weight in build_terms(name, location, description).items()
+        )
+        if len(batch) >= batch_size:
+            PropertySearchTerm.objects.using(using).bulk_create(batch)
+            batch = []
+    if batch:
+        PropertySearchTerm.objects.using(using).bulk_create(batch)
+    return count
+
+
+def _prefix_q(term):
+    # A range on the indexed term column instead of LIKE so the index is usable.
+    return Q(term__gte=term, term__lt=term + "\uffff")
+
+
+def search_properties(qs, q):
+    """
+    Filter ``qs`` down to properties matching every term of ``q`` (prefix match)
+    and annotate a ``search_rank``, ordered best match first.
+    """
+    from .models import PropertySearchTerm
+
+    terms = tokenize(q)
+    if not terms:
+        return qs.none()
+
+    if uses_postgres(qs.db):
+        query = SearchQuery(
+            " & ".join(f"{t}:*" for t in terms),
+            config=SEARCH_CONFIG,
+            search_type="raw",
+        )
+        return (qs.filter(search_vector=query)
+                  .annotate(search_rank=SearchRank(F("search_vector"), query))
+                  .order_by("-search_rank", "-created_at", "-id"))
+
+    # Uncorrelated IN subqueries are driven from the term index; a correlated
+    # EXISTS would scan every property instead.
+    for term in terms:
+        qs = qs.filter(pk__in=PropertySearchTerm.objects.filter(_prefix_q(term)).values("property_id"))
+    any_term = Q()
+    for term in terms:
+        any_term |= _prefix_q(term)
+    rank = (PropertySearchTerm.objects
+            .filter(any_term, property=OuterRef("pk"))
+            .order_by()
+            .values("property")
+            .annotate(total=Sum("weight"))
+            .values("total"))
+    return (qs.annotate(search_rank=Coalesce(Subquery(rank, output_field=IntegerField()), 0))
+              .order_by("-search_rank", "-created_at", "-id"))
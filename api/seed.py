@@ -0,0 +1,229 @@
+"""
+Synthetic data for load tests and benchmarks.
+
+seed_data() writes landlords, tenants, properties, applications, payments and
+reviews with bulk_create, skewed the way real traffic is: a few landlords own
+most listings, Nairobi estates dominate the locations, a few popular listings
+draw most applications and reviews, prices are log-normal per category and
+ratings lean positive. The generator is seeded, so a given configuration
+always produces the same dataset, which keeps benchmark baselines comparable.
+
+Seeded users are named ``seed_landlord_<n>``/``seed_tenant_<n>`` and share
+the password SEED_PASSWORD.
+"""
+import csv
+import math
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import invalidate_tags
+from .geo import GAZETTEER_PATH, apply_geocoding
+from .ledger import rebuild_payment_ledger
+from .listings import rebuild_listings
+from .ratings import recompute_review_aggregates
+from .search import index_properties
+
+SEED_PREFIX = "seed_"
+SEED_PASSWORD = "seed-password"
+BATCH_SIZE = 1000
+HISTORY_DAYS = 730
+
+# category: (weight, median monthly rent in KES)
+CATEGORIES = {
+    "apartment": (45, 35000),
+    "bedsitter": (25, 9000),
+    "single_room": (15, 5000),
+    "house": (15, 90000),
+}
+ADJECTIVES = ("Spacious", "Modern", "Cosy", "Serviced", "Furnished", "Affordable", "Executive", "Quiet", "Bright")
+KINDS = {"apartment": "Apartment", "bedsitter": "Bedsitter", "single_room": "Single Room", "house": "Maisonette"}
+FEATURES = ("borehole water", "backup generator", "secure parking", "CCTV", "balcony", "gym access",
+            "near the matatu stage", "fibre internet", "DSQ", "garden", "lift", "swimming pool")
+APPLICATION_STATUSES = {"pending": 60, "approved": 25, "rejected": 15}
+PAYMENT_STATUSES = {"completed": 90, "pending": 7, "failed": 3}
+RATING_WEIGHTS = (5, 7, 15, 35, 38)  # 1 to 5 stars
+
+
+def zipf_weights(n, s=1.1):
+    """Cumulative weights of a Zipf distribution over ``n`` ranks."""
+    return list(accumulate(1 / (rank ** s) for rank in range(1, n + 1)))
+
+
+def locations():
+    """(location text, cumulative weight): Nairobi estates most, other towns least."""
+    with open(GAZETTEER_PATH, newline="", encoding="utf-8") as fh:
+        rows = list(csv.DictReader(fh))
+    texts, weights = [], []
+    for row in rows:
+        if row["kind"] == "estate":
+            texts.append(f"{row['name']}, {row['town']}")
+            weights.append(6 if row["town"] == "Nairobi" else 3)
+        else:
+            texts.append(row["name"])
+            weights.append(10 if row["name"] == "Nairobi" else 1)
+    return texts, list(accumulate(weights))
+
+
+def weighted(mapping):
+    return list(mapping), list(accumulate(mapping.values()))
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Let bulk_create keep given created_at/updated_at values (auto_now fields)."""
+    fields = [f for model in models for f in model._meta.concrete_fields
+              if getattr(f, "auto_now", False) or getattr(f, "auto_now_add", False)]
+    saved = [(f, f.auto_now, f.auto_now_add) for f in fields]
+    for f in fields:
+        f.auto_now = f.auto_now_add = False
+    try:
+        yield
+    finally:
+        for f, auto_now, auto_now_add in saved:
+            f.auto_now, f.auto_now_add = auto_now, auto_now_add
+
+
+def _bulk(model, objs, batch_size):
+    for start in range(0, len(objs), batch_size):
+        model.objects.bulk_create(objs[start:start + batch_size])
+
+
+def seed_data(landlords=200, tenants=5000, properties=20000, applications=50000, seed=1,
+              batch_size=BATCH_SIZE, log=None):
+    """Write a synthetic dataset. Returns the number of rows created per model."""
+    from .models import Payment, Property, RentalApplication, Review, User, new_transaction_id
+
+    log = log or (lambda message: None)
+    rng = random.Random(seed)
+    now = timezone.now()
+    password = make_password(SEED_PASSWORD)
+
+    def past(max_days, recent_bias=2.0):
+        # More recent than uniform: the catalog and traffic grow over time
+        return now - timedelta(days=max_days * rng.random() ** recent_bias, seconds=rng.randrange(86400))
+
+    counts = {}
+    with transaction.atomic(), explicit_timestamps(User, Property, RentalApplication, Payment, Review):
+        # ---------- Users ----------
+        users = [
+            User(username=f"{SEED_PREFIX}landlord_{i}", email=f"landlord{i}@example.com", role="landlord",
+                 password=password, date_joined=past(HISTORY_DAYS))
+            for i in range(landlords)
+        ] + [
+            User(username=f"{SEED_PREFIX}tenant_{i}", email=f"tenant{i}@example.com", role="tenant",
+                 password=password, date_joined=past(HISTORY_DAYS))
+            for i in range(tenants)
+        ]
+        _bulk(User, users, batch_size)
+        ids = dict(User.objects.filter(username__startswith=SEED_PREFIX).values_list("username", "pk"))
+        landlord_ids = [ids[f"{SEED_PREFIX}landlord_{i}"] for i in range(landlords)]
+        tenant_ids = [ids[f"{SEED_PREFIX}tenant_{i}"] for i in range(tenants)]
+        counts["users"] = len(users)
+        log(f"{len(users)} users")
+
+        # ---------- Properties ----------
+        location_texts, location_weights = locations()
+        categories, category_weights = weighted({c: w for c, (w, _median) in CATEGORIES.items()})
+        owner_weights = zipf_weights(landlords)
+        objs = []
+        for i in range(properties):
+            category = rng.choices(categories, cum_weights=category_weights)[0]
+            location = rng.choices(location_texts, cum_weights=location_weights)[0]
+            price = CATEGORIES[category][1] * math.exp(rng.gauss(0, 0.35))
+            created = past(HISTORY_DAYS)
+            prop = Property(
+                landlord_id=rng.choices(landlord_ids, cum_weights=owner_weights)[0],
+                name=f"{rng.choice(ADJECTIVES)} {KINDS[category]} in {location.split(',')[0]} #{i}",
+                category=category,
+                description=f"{KINDS[category]} with {', '.join(rng.sample(FEATURES, 3))}.",
+                location=location,
+                price=Decimal(round(price, -2) or 1000),
+                is_available=rng.random() < 0.7,
+                created_at=created,
+                updated_at=created,
+            )
+            apply_geocoding(prop)  # bulk_create skips the pre_save signal
+            objs.append(prop)
+        for start in range(0, len(objs), batch_size):
+            index_properties(Property.objects.bulk_create(objs[start:start + batch_size]))
+        props = list(Property.objects.filter(landlord_id__in=landlord_ids)
+                     .values_list("pk", "price", "created_at").order_by("pk"))
+        counts["properties"] = len(props)
+        log(f"{len(props)} properties")
+
+        # ---------- Applications ----------
+        # Popularity is independent of age: shuffle before ranking
+        popular = props[:]
+        rng.shuffle(popular)
+        popularity = zipf_weights(len(popular), s=0.9)
+        statuses, status_weights = weighted(APPLICATION_STATUSES)
+        pairs, objs = set(), []
+        for _ in range(applications):
+            prop_id, _price, listed = rng.choices(popular, cum_weights=popularity)[0]
+            tenant_id = rng.choice(tenant_ids)
+            if (prop_id, tenant_id) in pairs:
+                continue
+            pairs.add((prop_id, tenant_id))
+            objs.append(RentalApplication(
+                property_id=prop_id, tenant_id=tenant_id,
+                status=rng.choices(statuses, cum_weights=status_weights)[0],
+                created_at=listed + (now - listed) * rng.random(),
+            ))
+        _bulk(RentalApplication, objs, batch_size)
+        counts["applications"] = len(objs)
+        log(f"{len(objs)} applications")
+
+        # ---------- Payments and reviews, for approved applications ----------
+        prices = {pk: price for pk, price, _created in props}
+        approved = (RentalApplication.objects.filter(tenant_id__in=tenant_ids, status="approved")
+                    .values_list("pk", "property_id", "tenant_id", "created_at"))
+        statuses, status_weights = weighted(PAYMENT_STATUSES)
+        payments, reviews = [], []
+        for app_id, prop_id, tenant_id, applied in approved.iterator(chunk_size=batch_size):
+            months = max(1, min(24, (now - applied).days // 30))
+            for month in range(rng.randint(1, months)):
+                payments.append(Payment(
+                    application_id=app_id, tenant_id=tenant_id, property_id=prop_id,
+                    amount=prices[prop_id],
+                    status=rng.choices(statuses, cum_weights=status_weights)[0],
+                    transaction_id=new_transaction_id(),
+                    created_at=min(now, applied + timedelta(days=30 * month + rng.randrange(5))),
+                ))
+            if rng.random() < 0.4:
+                created = applied + (now - applied) * rng.random()
+                reviews.append(Review(
+                    property_id=prop_id, tenant_id=tenant_id,
+                    rating=rng.choices(range(1, 6), weights=RATING_WEIGHTS)[0],
+                    comment=rng.choice(("", "Great landlord.", "Water issues sometimes.", "Secure and quiet.",
+                                        "Good value for the area.", "Noisy at night.")),
+                    created_at=created, updated_at=created,
+                ))
+        _bulk(Payment, payments, batch_size)
+        _bulk(Review, reviews, batch_size)
+        counts["payments"], counts["reviews"] = len(payments), len(reviews)
+        log(f"{len(payments)} payments, {len(reviews)} reviews")
+
+        # bulk_create skipped the denormalized counters; rebuild them in bulk
+        recompute_review_aggregates()
+        rebuild_payment_ledger()
+        rebuild_listings()
+        invalidate_tags("properties", "applications", "payments", "reviews")
+    return counts
+
+
+def clear_seed_data():
+    """Delete the seeded users and everything they own. Returns the number of users deleted."""
+    from .models import User
+
+    with transaction.atomic():
+        users = User.objects.filter(username__startswith=SEED_PREFIX)
+        count = users.count()
+        users.delete()
+    return count
@@ -35,16 +35,41 @@ class UserSerializer(serializers.ModelSerializer):
         return user
 
 
+class RenditionsField(serializers.ReadOnlyField):
+    """Image rendition storage paths as absolute URLs, keyed by rendition name."""
+
+    def __init__(self, image_field="image", **kwargs):
+        # The renditions live in the image field's storage
+        self.image_field = image_field
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        request = self.context.get("request")
+        storage = self.parent.Meta.model._meta.get_field(self.image_field).storage
+        urls = {}
+        for name, path in (value or {}).items():
+            if name == "source":
+                continue
+            url = storage.url(path)
+            urls[name] = request.build_absolute_uri(url) if request else url
+        return urls
+
+
 class PropertySerializer(serializers.ModelSerializer):
     landlord = serializers.ReadOnlyField(source="landlord.username")
+    image_renditions = RenditionsField()
+    # Only present on radius searches (annotated by api.geo.within_radius)
+    distance_km = serializers.FloatField(read_only=True)
 
     class Meta:
         model = Property
         fields = [
             "id", "landlord", "name", "category", "description",
-            "location", "price", "is_available", "created_at", "image"
+            "location", "latitude", "longitude", "distance_km", "price", "is_available",
+            "created_at", "image", "image_renditions", "review_count", "avg_rating",
         ]
-        read_only_fields = ["id", "landlord", "created_at"]
+        read_only_fields = ["id", "landlord", "created_at", "review_count", "avg_rating"]
+        annotated_fields = ["distance_km"]
 
 
 class RentalApplicationSerializer(serializers.ModelSerializer):
@@ -77,14 +102,28 @@ class RentalApplicationSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("You have already applied for this property.")
 
 
+class ApplicationStatusBatchSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), min_length=1, max_length=500)
+    status = serializers.ChoiceField(choices=["pending", "approved", "rejected"])
+    reject_others = serializers.BooleanField(default=False)
+
+    def validate(self, attrs):
+        if attrs["reject_others"] and attrs["status"] != "approved":
+            raise serializers.ValidationError({"reject_others": "Only applies when approving."})
+        return attrs
+
+
 class PaymentSerializer(serializers.ModelSerializer):
-    tenant = serializers.ReadOnlyField(source="application.tenant.username")
-    property_name = serializers.ReadOnlyField(source="application.property.name")
+    tenant = serializers.ReadOnlyField(source="tenant.username")
+    property_name = serializers.ReadOnlyField(source="property.name")
 
     class Meta:
         model = Payment
-        fields = ["id", "application", "tenant", "property_name", "amount", "status", "transaction_id", "created_at"]
-        read_only_fields = ["id", "status", "transaction_id", "created_at", "tenant", "property_name"]
+        fields = [
+            "id", "application", "tenant", "property", "property_name", "amount", "status",
+            "transaction_id", "created_at",
+        ]
+        read_only_fields = ["id", "status", "transaction_id", "created_at", "tenant", "property", "property_name"]
 
     def validate_amount(self, value):
         if value <= 0:
@@ -92,6 +131,22 @@ class PaymentSerializer(serializers.ModelSerializer):
         return value
 
 
+class PaymentSummarySerializer(serializers.Serializer):
+    payment_count = serializers.IntegerField()
+    total_paid = serializers.DecimalField(max_digits=14, decimal_places=2)
+    last_payment_at = serializers.DateTimeField(allow_null=True)
+    last_payment_amount = serializers.DecimalField(max_digits=10, decimal_places=2, allow_null=True)
+
+
+class PropertyPaymentSummarySerializer(PaymentSummarySerializer):
+    property = serializers.IntegerField()
+    property_name = serializers.CharField()
+
+
+class PaymentLedgerSerializer(PaymentSummarySerializer):
+    properties = PropertyPaymentSummarySerializer(many=True)
+
+
 class ReviewSerializer(serializers.ModelSerializer):
     tenant = serializers.ReadOnlyField(source="tenant.username")
     property_name = serializers.ReadOnlyField(source="property.name")
@@ -0,0 +1,111 @@
+from django.db.models import Q, QuerySet
+from django.db.models.functions import Now
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .authentication import user_cache
+from .cache import invalidate_tags
+from .geo import apply_geocoding
+from .images import schedule_renditions
+from .ledger import apply_payment_delta, contribution
+from .listings import refresh_listings, rename_landlord
+from .models import Payment, Property, RentalApplication, Review, User
+from .ratings import apply_review_delta
+from .search import index_property
+
+
+@receiver(pre_save, sender=Property)
+def property_geocode(sender, instance, raw=False, **kwargs):
+    if not raw:
+        apply_geocoding(instance)
+
+
+@receiver(post_save, sender=Property)
+def property_saved(sender, instance, raw=False, using="default", **kwargs):
+    # Keep the full-text search document in step with the row
+    if raw:
+        return
+    index_property(instance, using=using)
+    schedule_renditions(instance, using=using)
+    # After schedule_renditions, which may clear stale renditions
+    refresh_listings([instance.pk], using=using)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    # Other processes pick the change up when their entry expires
+    user_cache.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def user_renamed(sender, instance, created=False, raw=False, using="default", **kwargs):
+    if created or raw or not instance.has_changed("username"):
+        return
+    # Property responses embed the landlord's username, reviews and the
+    # property detail page the tenant's. Touch the reviews so their ETag
+    # (MAX(updated_at), see ConditionalGetMixin) moves too; rename_landlord
+    # touches the properties.
+    Review.objects.using(using).filter(tenant_id=instance.pk).update(updated_at=Now())
+    pks = (Property.objects.using(using)
+           .filter(Q(landlord_id=instance.pk) | Q(reviews__tenant_id=instance.pk))
+           .values_list("pk", flat=True).distinct())
+    invalidate_tags("properties", "reviews", *(f"property:{pk}" for pk in pks), using=using)
+
+
+@receiver(post_save, sender=User)
+def landlord_renamed(sender, instance, created=False, raw=False, using="default", **kwargs):
+    # Other saves would needlessly move the ETags of every property they own
+    if created or raw or not instance.has_changed("username"):
+        return
+    rename_landlord(instance.pk, instance.username, using=using)
+
+
+@receiver(post_save, sender=Property)
+def property_renamed(sender, instance, created=False, raw=False, using="default", **kwargs):
+    # Review responses embed the property's name
+    if not created and not raw and instance.has_changed("name"):
+        Review.objects.using(using).filter(property_id=instance.pk).update(updated_at=Now())
+        invalidate_tags("reviews", using=using)
+
+
+@receiver(post_save, sender=Property)
+@receiver(post_delete, sender=Property)
+def property_changed(sender, instance, using="default", **kwargs):
+    invalidate_tags("properties", f"property:{instance.pk}", using=using)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def review_changed(sender, instance, using="default", **kwargs):
+    # apply_review_delta skips comment-only edits, which the cached
+    # property detail page shows too
+    invalidate_tags("reviews", f"property:{instance.property_id}", using=using)
+
+
+@receiver(post_save, sender=RentalApplication)
+@receiver(post_delete, sender=RentalApplication)
+def application_changed(sender, instance, using="default", **kwargs):
+    invalidate_tags("applications", f"application:{instance.pk}", using=using)
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def payment_changed(sender, instance, using="default", **kwargs):
+    invalidate_tags("payments", f"application:{instance.application_id}", using=using)
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, using="default", origin=None, **kwargs):
+    # Also runs for queryset and cascade deletes, which bypass Model.delete(),
+    # except when the reviews go with their property: its aggregates go too
+    if isinstance(origin, Property) or (isinstance(origin, QuerySet) and origin.model is Property):
+        return
+    apply_review_delta(instance.property_id, -1, -instance.rating, using=using)
+
+
+@receiver(post_delete, sender=Payment)
+def payment_deleted(sender, instance, using="default", **kwargs):
+    count, amount = contribution(instance.status, instance.amount)
+    if count:
+        apply_payment_delta(instance.tenant_id, instance.property_id, -count, -amount, using=using)
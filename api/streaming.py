@@ -0,0 +1,53 @@
+"""
+Streamed responses.
+
+StreamingJSONRenderer writes a JSON array item by item, with the same
+encoding as DRF's JSONRenderer, and buffers output into chunks of about
+CHUNK_BYTES. streaming_response() wraps any chunk iterator in a
+StreamingHttpResponse that stays streamed under both handlers: under ASGI
+Django would otherwise load a sync iterator whole into memory before
+sending it, so there the chunks are pulled one at a time from the request's
+sync thread.
+"""
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+
+CHUNK_BYTES = 64 * 1024
+
+
+class StreamingJSONRenderer(JSONRenderer):
+    def render_array(self, items, chunk_bytes=CHUNK_BYTES):
+        """Yield ``items`` (plain data, as from a serializer) as one JSON array, in byte chunks."""
+        buffer, size = [b"["], 1
+        for i, item in enumerate(items):
+            encoded = self.render(item)
+            buffer.append(b"," + encoded if i else encoded)
+            size += len(encoded) + 1
+            if size >= chunk_bytes:
+                yield b"".join(buffer)
+                buffer, size = [], 0
+        buffer.append(b"]")
+        yield b"".join(buffer)
+
+
+async def _pull(chunks):
+    # Sync DB cursors must stay on the thread that opened them: the
+    # thread-sensitive executor of the request, like the view itself.
+    iterator = iter(chunks)
+    pull = sync_to_async(next)
+    try:
+        while (chunk := await pull(iterator, None)) is not None:
+            yield chunk
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            await sync_to_async(close)()
+
+
+def streaming_response(request, chunks, content_type):
+    """A StreamingHttpResponse for ``chunks`` (an iterator of bytes) that streams under WSGI and ASGI."""
+    if isinstance(getattr(request, "_request", request), ASGIRequest):
+        chunks = _pull(chunks)
+    return StreamingHttpResponse(chunks, content_type=content_type)
@@ -0,0 +1,163 @@
+"""
+Per-endpoint query budgets for every router endpoint.
+
+Every route in ``router.urls`` (``@action`` routes included) needs a budget.
+Each is exercised with more rows than fit on a page, so a per-row query
+(N+1) blows the budget instead of reaching production.
+"""
+from decimal import Decimal
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from kenyarentalhub_api.urls import router
+from .models import Payment, Property, RentalApplication, Review
+from .testing import TEST_STORAGES
+
+User = get_user_model()
+
+ROWS = 15
+
+# route name -> (user fixture, max queries) on a cold cache.
+# Authenticated requests spend two queries on the session and user lookups;
+# endpoints with conditional GET spend one on the ETag fingerprint.
+QUERY_BUDGETS = {
+    "api-root": (None, 0),
+    "property-list": (None, 3),
+    "property-detail": (None, 2),
+    "property-facets": (None, 1),
+    "property-export": ("landlord", 3),
+    "property-bulk-import": ("landlord", 9),
+    "application-list": ("tenant", 4),
+    "application-detail": ("tenant", 3),
+    "application-bulk-status": ("landlord", 6),
+    "payment-list": ("tenant", 4),
+    "payment-detail": ("tenant", 3),
+    "payment-summary": ("tenant", 3),
+    "review-list": (None, 3),
+    "review-detail": (None, 2),
+}
+
+
+class QueryBudgetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = User.objects.create_user(username="budget_tenant", password="x", role="tenant")
+        landlords = [
+            User.objects.create_user(username=f"budget_landlord{i}", password="x", role="landlord")
+            for i in range(ROWS)
+        ]
+        for i, landlord in enumerate(landlords):
+            prop = Property.objects.create(
+                landlord=landlord, name=f"Unit {i}", category="apartment",
+                location="Nairobi", price=Decimal("25000"),
+            )
+            app = RentalApplication.objects.create(property=prop, tenant=cls.tenant, status="approved")
+            Payment.objects.create(application=app, amount=Decimal("25000"))
+            Review.objects.create(property=prop, tenant=cls.tenant, rating=4)
+        # A landlord with many applications, for the batch endpoints
+        cls.landlord = User.objects.create_user(username="budget_owner", password="x", role="landlord")
+        owned = Property.objects.create(
+            landlord=cls.landlord, name="Block", category="apartment", location="Nairobi", price=Decimal("25000"),
+        )
+        cls.owned_apps = [
+            RentalApplication.objects.create(
+                property=owned, tenant=User.objects.create_user(username=f"budget_applicant{i}", password="x",
+                                                                role="tenant"),
+            )
+            for i in range(ROWS)
+        ]
+        cls.objects = {
+            "property": Property.objects.first(),
+            "application": RentalApplication.objects.first(),
+            "payment": Payment.objects.first(),
+            "review": Review.objects.first(),
+        }
+
+    def route_request(self, name):
+        """(method, url, request kwargs) exercising route ``name``."""
+        basename, _, route = name.partition("-")
+        if route == "list":
+            return "get", reverse(name), {}
+        if route == "detail":
+            return "get", reverse(name, args=[self.objects[basename].pk]), {}
+        if name == "property-bulk-import":
+            rows = "".join(f"Import {i},apartment,Kilimani,{20000 + i},true\n" for i in range(ROWS))
+            upload = SimpleUploadedFile("units.csv", ("name,category,location,price,is_available\n" + rows).encode())
+            return "post", reverse(name), {"data": {"file": upload}}
+        if name == "application-bulk-status":
+            ids = [app.pk for app in self.owned_apps]
+            return "post", reverse(name), {"data": {"ids": ids, "status": "rejected"},
+                                           "content_type": "application/json"}
+        return "get", reverse(name), {}
+
+    def test_every_router_endpoint_has_a_budget(self):
+        routes = {pattern.name for pattern in router.urls}
+        self.assertEqual(routes - set(QUERY_BUDGETS), set())
+
+    def test_query_budgets(self):
+        for name in dict.fromkeys(pattern.name for pattern in router.urls):
+            user, budget = QUERY_BUDGETS[name]
+            method, url, kwargs = self.route_request(name)
+            with self.subTest(endpoint=name):
+                self.client.logout()
+                if user:
+                    self.client.force_login(getattr(self, user))
+                cache.clear()
+                with CaptureQueriesContext(connection) as captured:
+                    response = getattr(self.client, method)(url, **kwargs)
+                    if response.streaming:
+                        b"".join(response.streaming_content)
+                self.assertIn(response.status_code, (200, 201))
+                if name.endswith("-list"):
+                    self.assertEqual(len(response.json()["results"]), 10)
+                self.assertLessEqual(
+                    len(captured), budget,
+                    "\n".join(q["sql"] for q in captured.captured_queries),
+                )
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class PageQueryBudgetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.landlord = User.objects.create_user(username="page_landlord", password="x", role="landlord")
+        cls.tenant = User.objects.create_user(username="page_tenant", password="x", role="tenant")
+        cls.prop = Property.objects.create(
+            landlord=cls.landlord, name="Budget Flat", category="apartment",
+            location="Nairobi", price=Decimal("25000"),
+        )
+        for i in range(ROWS):
+            reviewer = User.objects.create_user(username=f"page_reviewer{i}", password="x", role="tenant")
+            Review.objects.create(property=cls.prop, tenant=reviewer, rating=3)
+            RentalApplication.objects.create(property=cls.prop, tenant=reviewer)
+        app = RentalApplication.objects.create(property=cls.prop, tenant=cls.tenant, status="approved")
+        Payment.objects.create(application=app, amount=Decimal("25000"))
+
+    def assertPageBudget(self, url, user, budget):
+        self.client.logout()
+        if user:
+            self.client.force_login(user)
+        cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(captured), budget, "\n".join(q["sql"] for q in captured.captured_queries))
+        return response
+
+    def test_home_page(self):
+        self.assertPageBudget("/", None, 2)
+
+    def test_property_detail(self):
+        url = f"/properties/{self.prop.pk}/"
+        self.assertPageBudget(url, None, 2)
+        response = self.assertPageBudget(url, self.tenant, 6)
+        self.assertEqual(response.context["user_payment"].amount, Decimal("25000"))
+        response = self.assertPageBudget(url, self.landlord, 5)
+        self.assertEqual(len(response.context["landlord_applications"]), ROWS + 1)
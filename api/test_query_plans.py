@@ -0,0 +1,220 @@
+"""
+Query-plan regression suite.
+
+Every production query shape is captured by driving the real endpoint through
+the test client, then EXPLAINed against a seeded dataset. A shape fails if the
+plan falls back to a sequential scan of a table or to a filesort.
+"""
+import random
+import re
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .geo import apply_geocoding
+from .ledger import rebuild_payment_ledger
+from .listings import rebuild_listings
+from .models import AvailableListing, Payment, Property, RentalApplication, Review
+from .ratings import recompute_review_aggregates
+from .search import rebuild_index
+from .testing import TEST_STORAGES
+
+User = get_user_model()
+
+LANDLORDS = 25
+TENANTS = 60
+PROPERTIES = 5000
+CATEGORIES = ["apartment", "house", "bedsitter", "single_room"]
+
+
+def explain(sql):
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("EXPLAIN " + sql)
+        else:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql)
+        return "\n".join(str(row[-1]) for row in cursor.fetchall())
+
+
+def plan_problems(plan):
+    """Return the offending plan lines (sequential scans and filesorts)."""
+    problems = []
+    for line in plan.splitlines():
+        if connection.vendor == "postgresql":
+            if "Seq Scan" in line or re.search(r"(^|->\s+)(Incremental )?Sort\b", line.strip()):
+                problems.append(line.strip())
+        else:
+            if re.search(r"\bSCAN [\w\"]+$", line.strip()) or "USE TEMP B-TREE FOR ORDER BY" in line:
+                problems.append(line.strip())
+    return problems
+
+
+def row_queries(captured):
+    # COUNT(*) for page-number pagination and the conditional-GET fingerprint
+    # (MAX(updated_at) + COUNT) visit every matching row by definition; the
+    # cursor pagination mode and the response cache exist to avoid them.
+    for query in captured:
+        sql = query["sql"]
+        if sql.startswith("SELECT") and not sql.startswith(("SELECT COUNT(*)", "SELECT MAX(")):
+            yield sql
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class QueryPlanTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(42)
+        now = timezone.now()
+        landlords = User.objects.bulk_create(
+            User(username=f"landlord{i}", role="landlord") for i in range(LANDLORDS)
+        )
+        tenants = User.objects.bulk_create(
+            User(username=f"tenant{i}", role="tenant") for i in range(TENANTS)
+        )
+        seeded = [
+            Property(
+                landlord=rng.choice(landlords),
+                name=f"Unit {i}",
+                category=rng.choice(CATEGORIES),
+                location=rng.choice(["Westlands", "Kilimani", "Nyali", "Ruaka", "Karen"]),
+                price=Decimal(rng.randrange(5000, 250000)),
+                is_available=rng.random() < 0.7,
+            ) for i in range(PROPERTIES)
+        ]
+        # bulk_create skips the pre_save geocoding signal
+        for prop in seeded:
+            apply_geocoding(prop)
+        Property.objects.bulk_create(seeded, batch_size=500)
+        # auto_now_add ignores explicit values, so spread created_at afterwards
+        props = list(Property.objects.only("id"))
+        for offset, prop in enumerate(props):
+            prop.created_at = now - timedelta(minutes=offset)
+        Property.objects.bulk_update(props, ["created_at"], batch_size=500)
+        rebuild_index()
+
+        apps = RentalApplication.objects.bulk_create(
+            RentalApplication(property=prop, tenant=tenant, status=rng.choice(["pending", "approved"]))
+            for tenant in tenants
+            for prop in rng.sample(props, 30)
+        )
+        Payment.objects.bulk_create(
+            Payment(application=app, tenant_id=app.tenant_id, property_id=app.property_id,
+                    amount=Decimal("1000.00"), status=rng.choice(["pending", "completed"]))
+            for app in apps if app.status == "approved"
+        )
+        rebuild_payment_ledger()
+        Review.objects.bulk_create(
+            Review(property=prop, tenant=tenant, rating=rng.randint(1, 5))
+            for tenant in tenants
+            for prop in rng.sample(props, 20)
+        )
+        recompute_review_aggregates()
+        # The home page and the available list read the listings table, which bulk_create leaves empty
+        rebuild_listings()
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+        cls.landlord = landlords[0]
+        cls.tenant = tenants[0]
+        cls.owned = Property.objects.filter(landlord=cls.landlord).first()
+
+    def assertPlansClean(self, url, user=None, allow_sort=False):
+        if user is not None:
+            self.client.force_login(user)
+        cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        for sql in row_queries(captured):
+            plan = explain(sql)
+            problems = plan_problems(plan)
+            if allow_sort:
+                problems = [p for p in problems if "Sort" not in p and "B-TREE" not in p]
+            self.assertEqual(problems, [], f"{url}\n{sql}\n{plan}")
+
+    def test_home_page(self):
+        self.assertPlansClean("/")
+
+    def test_property_list(self):
+        self.assertPlansClean("/api/properties/")
+
+    def test_property_list_cursor(self):
+        first = self.client.get("/api/properties/?pagination=cursor&is_available=true").json()
+        self.assertPlansClean(first["next"].replace("http://testserver", ""))
+
+    def test_property_list_available(self):
+        self.assertEqual(AvailableListing.objects.count(), Property.objects.filter(is_available=True).count())
+        self.assertPlansClean("/api/properties/?is_available=true")
+
+    def test_property_list_category(self):
+        self.assertPlansClean("/api/properties/?category=House")
+
+    def test_property_list_price_range(self):
+        # A price range and a created_at ordering cannot share one B-tree; the
+        # planner sorts the (index-bounded) range, which is the cheaper plan.
+        self.assertPlansClean("/api/properties/?min_price=20000&max_price=40000", allow_sort=True)
+
+    def test_property_list_category_and_price(self):
+        self.assertPlansClean("/api/properties/?category=house&min_price=20000&max_price=40000",
+                              allow_sort=True)
+
+    def test_property_list_by_rating(self):
+        self.assertPlansClean("/api/properties/?ordering=-rating")
+
+    def test_property_search(self):
+        # Relevance is computed per query, so ordering by rank always sorts.
+        self.assertPlansClean("/api/properties/?q=unit", allow_sort=True)
+
+    def test_property_radius_search(self):
+        # Distances are computed per query, so ordering by distance always sorts.
+        self.assertPlansClean("/api/properties/?lat=-4.03&lng=39.71&radius_km=5&ordering=distance",
+                              allow_sort=True)
+
+    def test_property_bbox_search(self):
+        self.assertPlansClean("/api/properties/?bbox=39.6,-4.1,39.8,-4.0")
+
+    def test_property_facets(self):
+        self.assertPlansClean("/api/properties/facets/?category=house&is_available=true")
+
+    def test_property_retrieve(self):
+        self.assertPlansClean(f"/api/properties/{self.owned.pk}/")
+
+    def test_tenant_applications(self):
+        self.assertPlansClean("/api/applications/", user=self.tenant)
+
+    def test_landlord_applications(self):
+        # Ordering spans a join, so the sort over the landlord's own
+        # applications is accepted; every table access must still be indexed.
+        self.assertPlansClean("/api/applications/", user=self.landlord, allow_sort=True)
+
+    def test_tenant_payments(self):
+        self.assertPlansClean("/api/payments/", user=self.tenant)
+
+    def test_tenant_payments_filtered(self):
+        self.assertPlansClean("/api/payments/?status=completed&since=2020-01-01&count=exact", user=self.tenant)
+
+    def test_landlord_payments(self):
+        # As with applications, ordering spans the join to the landlord's properties
+        self.assertPlansClean("/api/payments/", user=self.landlord, allow_sort=True)
+
+    def test_payment_summary(self):
+        self.assertPlansClean("/api/payments/summary/", user=self.tenant)
+        self.assertPlansClean("/api/payments/summary/", user=self.landlord, allow_sort=True)
+
+    def test_review_list(self):
+        self.assertPlansClean("/api/reviews/")
+
+    def test_property_detail_page_anonymous(self):
+        self.assertPlansClean(f"/properties/{self.owned.pk}/")
+
+    def test_property_detail_page_tenant(self):
+        self.assertPlansClean(f"/properties/{self.owned.pk}/", user=self.tenant)
+
+    def test_property_detail_page_landlord(self):
+        self.assertPlansClean(f"/properties/{self.owned.pk}/", user=self.landlord)
@@ -0,0 +1,7 @@
+"""Settings shared by the test modules."""
+
+# The manifest storage needs collectstatic; tests that render pages use plain storage
+TEST_STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
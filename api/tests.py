@@ -1,6 +1,49 @@
-from django.test import TestCase
+import datetime
+import json
+import re
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import AsyncRequestFactory, Client, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from django.contrib.auth import get_user_model
-from .models import Property
+from django.contrib.auth.hashers import make_password
+from django.contrib.messages import get_messages
+from PIL import Image
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+from rest_framework.throttling import BaseThrottle
+
+from . import async_views
+from .authentication import user_cache
+from .benchmark import compare, run_benchmarks, run_serializer_benchmarks
+from .cache import cache_key, entry_timeout, invalidate_tags
+from .management.commands.simulate_payment_gateway import GatewaySimulator
+from .metrics import Histogram, log_buckets, registry
+from .payments import DuplicatePayment, submit_payment
+from .replicas import STICKY_COOKIE, ReplicaRouter, read_alias, use_replica
+from .rows import RowSerializer, row_plan
+from .seed import seed_data
+from .streaming import StreamingJSONRenderer
+from .testing import TEST_STORAGES
+from .models import (
+    AvailableListing, IdempotencyKey, Payment, PaymentLedger, PaymentWebhookEvent, Property, RentalApplication, Review,
+)
+from .views import PropertyViewSet
+from .webhooks import SIGNATURE_HEADER, process_batch, sign
 
 User = get_user_model()
 
@@ -22,3 +65,1352 @@ class ViewTest(TestCase):
     def test_home_page_status(self):
         response = self.client.get("/")
         self.assertEqual(response.status_code, 200)
+
+class PropertySearchTest(TestCase):
+    def setUp(self):
+        self.landlord = User.objects.create_user(username="land2", password="testpass", role="landlord")
+        self.by_name = Property.objects.create(
+            landlord=self.landlord, name="Westlands Loft", category="apartment",
+            location="Nairobi", price=60000,
+        )
+        self.by_description = Property.objects.create(
+            landlord=self.landlord, name="Garden Cottage", category="house",
+            location="Kiambu", price=40000, description="Short drive to Westlands",
+        )
+        Property.objects.create(
+            landlord=self.landlord, name="Beach House", category="house",
+            location="Mombasa", price=80000,
+        )
+
+    def search(self, **params):
+        response = self.client.get("/api/properties/", params)
+        self.assertEqual(response.status_code, 200)
+        return [row["id"] for row in response.json()["results"]]
+
+    def test_results_are_ranked_by_field_weight(self):
+        self.assertEqual(self.search(q="westlands"), [self.by_name.id, self.by_description.id])
+
+    def test_prefix_match_and_filters_combine(self):
+        self.assertEqual(self.search(q="West", category="house"), [self.by_description.id])
+
+    def test_every_term_must_match(self):
+        self.assertEqual(self.search(q="westlands cottage"), [self.by_description.id])
+
+    def test_index_follows_updates(self):
+        self.by_name.name = "Kilimani Loft"
+        self.by_name.save()
+        self.assertEqual(self.search(q="westlands"), [self.by_description.id])
+
+class KeysetPaginationTest(TestCase):
+    def setUp(self):
+        landlord = User.objects.create_user(username="land3", password="testpass", role="landlord")
+        self.props = [
+            Property.objects.create(
+                landlord=landlord, name=f"Unit {i}", category="apartment", location="Nairobi", price=10000 + i
+            )
+            for i in range(25)
+        ]
+        # Identical timestamps force the id tie-breaker
+        Property.objects.filter(pk__in=[p.pk for p in self.props[5:15]]).update(
+            created_at=self.props[10].created_at
+        )
+
+    def test_cursor_pages_cover_every_row_once(self):
+        expected = list(
+            Property.objects.order_by("-created_at", "-id").values_list("id", flat=True)
+        )
+        seen = []
+        url = "/api/properties/?pagination=cursor"
+        while url:
+            body = self.client.get(url).json()
+            self.assertNotIn("count", body)
+            seen.extend(row["id"] for row in body["results"])
+            url = body["next"]
+        self.assertEqual(seen, expected)
+
+    def test_count_modes(self):
+        body = self.client.get("/api/properties/?pagination=cursor&count=exact").json()
+        self.assertEqual(body["count"], 25)
+        body = self.client.get("/api/properties/?count=estimate").json()
+        self.assertEqual(body["count"], 25)
+        self.assertFalse(body["count_is_estimate"])
+
+    def test_low_estimate_does_not_hide_pages(self):
+        with mock.patch("api.pagination.estimate_count", return_value=(3, True)):
+            body = self.client.get("/api/properties/?count=estimate&page=2").json()
+            self.assertEqual((body["count"], body["count_is_estimate"]), (3, True))
+            self.assertEqual(len(body["results"]), 10)
+            self.assertIn("page=3", body["next"])
+            body = self.client.get(body["next"]).json()
+            self.assertEqual(len(body["results"]), 5)
+            self.assertIsNone(body["next"])
+            self.assertEqual(self.client.get("/api/properties/?count=estimate&page=4").status_code, 404)
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get("/api/properties/?cursor=bogus").status_code, 404)
+
+    def test_page_numbers_remain_default(self):
+        body = self.client.get("/api/properties/?page=3").json()
+        self.assertEqual(body["count"], 25)
+        self.assertEqual(len(body["results"]), 5)
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class PropertyListPageTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.landlord = User.objects.create_user(username="land4", password="testpass", role="landlord")
+        for i in range(15):
+            Property.objects.create(
+                landlord=self.landlord, name=f"Listing {i}", category="house", location="Nakuru", price=20000
+            )
+
+    def test_pages(self):
+        first = self.client.get("/")
+        self.assertEqual(len(first.context["page_obj"]), 12)
+        self.assertContains(first, "Page 1 of 2")
+        self.assertContains(self.client.get("/?page=2"), "Listing 0")
+        # Past the end is the last page, under the last page's cache entry
+        with self.assertNumQueries(0):
+            self.assertContains(self.client.get("/?page=999999"), "Page 2 of 2")
+
+    def test_cached_page_skips_database(self):
+        self.client.get("/")
+        with self.assertNumQueries(0):
+            response = self.client.get("/")
+        self.assertContains(response, "Listing 14")
+
+    def test_saving_a_property_invalidates_the_cache(self):
+        self.client.get("/")
+        Property.objects.create(
+            landlord=self.landlord, name="Fresh Listing", category="house", location="Nakuru", price=20000
+        )
+        self.assertContains(self.client.get("/"), "Fresh Listing")
+
+
+class ReviewAggregateTest(TestCase):
+    def setUp(self):
+        landlord = User.objects.create_user(username="land5", password="testpass", role="landlord")
+        self.tenants = [
+            User.objects.create_user(username=f"tenant5_{i}", password="testpass", role="tenant") for i in range(3)
+        ]
+        self.prop = Property.objects.create(
+            landlord=landlord, name="Rated Flat", category="apartment", location="Thika", price=15000
+        )
+        self.other = Property.objects.create(
+            landlord=landlord, name="Other Flat", category="apartment", location="Thika", price=15000
+        )
+
+    def counters(self, prop):
+        prop.refresh_from_db()
+        return prop.review_count, prop.rating_sum, prop.avg_rating
+
+    def test_create_update_delete(self):
+        first = Review.objects.create(property=self.prop, tenant=self.tenants[0], rating=5)
+        Review.objects.create(property=self.prop, tenant=self.tenants[1], rating=2)
+        self.assertEqual(self.counters(self.prop), (2, 7, 3.5))
+
+        first.rating = 3
+        first.save()
+        self.assertEqual(self.counters(self.prop), (2, 5, 2.5))
+
+        first.property = self.other
+        first.save()
+        self.assertEqual(self.counters(self.prop), (1, 2, 2.0))
+        self.assertEqual(self.counters(self.other), (1, 3, 3.0))
+
+        Review.objects.filter(property=self.prop).delete()
+        self.assertEqual(self.counters(self.prop), (0, 0, 0.0))
+
+    def test_property_delete_skips_review_deltas(self):
+        for tenant in self.tenants:
+            Review.objects.create(property=self.prop, tenant=tenant, rating=4)
+            Review.objects.create(property=self.other, tenant=tenant, rating=2)
+        for origin in (self.prop, Property.objects.filter(pk=self.other.pk)):
+            with CaptureQueriesContext(connection) as captured:
+                origin.delete()
+            self.assertFalse([q for q in captured.captured_queries if q["sql"].startswith("UPDATE")])
+
+    def test_api_exposes_and_sorts_by_rating(self):
+        Review.objects.create(property=self.other, tenant=self.tenants[0], rating=4)
+        Review.objects.create(property=self.prop, tenant=self.tenants[1], rating=2)
+        rows = self.client.get("/api/properties/?ordering=-rating").json()["results"]
+        self.assertEqual([(r["id"], r["avg_rating"]) for r in rows], [(self.other.id, 4.0), (self.prop.id, 2.0)])
+
+    def test_recompute_command(self):
+        Review.objects.create(property=self.prop, tenant=self.tenants[0], rating=4)
+        Property.objects.filter(pk=self.prop.pk).update(review_count=9, rating_sum=1)
+        with self.assertRaises(CommandError):
+            call_command("recompute_review_aggregates", "--check", stdout=StringIO())
+        call_command("recompute_review_aggregates", stdout=StringIO())
+        self.assertEqual(self.counters(self.prop), (1, 4, 4.0))
+        call_command("recompute_review_aggregates", "--check", stdout=StringIO())
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class TaggedCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.landlord = User.objects.create_user(username="land6", password="testpass", role="landlord")
+        self.tenant = User.objects.create_user(username="tenant6", password="testpass", role="tenant")
+        self.prop = Property.objects.create(
+            landlord=self.landlord, name="Cached Flat", category="apartment", location="Eldoret", price=12000
+        )
+
+    def test_api_list_and_retrieve_are_cached(self):
+        self.client.get("/api/properties/")
+        self.client.get(f"/api/properties/{self.prop.pk}/")
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get("/api/properties/").json()["count"], 1)
+            self.assertEqual(self.client.get(f"/api/properties/{self.prop.pk}/").json()["name"], "Cached Flat")
+
+    def test_review_invalidates_property_caches(self):
+        self.client.get(f"/api/properties/{self.prop.pk}/")
+        self.client.get(f"/properties/{self.prop.pk}/")
+        Review.objects.create(property=self.prop, tenant=self.tenant, rating=4)
+        self.assertEqual(self.client.get(f"/api/properties/{self.prop.pk}/").json()["review_count"], 1)
+        self.assertEqual(self.client.get(f"/properties/{self.prop.pk}/").context["review_count"], 1)
+
+    def test_anonymous_detail_page_is_cached(self):
+        self.client.get(f"/properties/{self.prop.pk}/")
+        with self.assertNumQueries(0):
+            self.client.get(f"/properties/{self.prop.pk}/")
+
+    def test_comment_edits_and_renames_invalidate_caches(self):
+        review = Review.objects.create(property=self.prop, tenant=self.tenant, rating=4, comment="Quiet")
+        self.client.get(f"/properties/{self.prop.pk}/")
+        self.client.get("/api/properties/")
+        review.comment = "Noisy at night"
+        review.save()
+        self.assertContains(self.client.get(f"/properties/{self.prop.pk}/"), "Noisy at night")
+        self.tenant.username = "renamed-tenant"
+        self.tenant.save()
+        self.assertContains(self.client.get(f"/properties/{self.prop.pk}/"), "renamed-tenant")
+        self.landlord.username = "renamed-landlord"
+        self.landlord.save()
+        self.assertEqual(self.client.get("/api/properties/").json()["results"][0]["landlord"], "renamed-landlord")
+
+
+class ConditionalRequestTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        landlord = User.objects.create_user(username="land7", password="testpass", role="landlord")
+        self.tenant = User.objects.create_user(username="tenant7", password="testpass", role="tenant")
+        self.prop = Property.objects.create(
+            landlord=landlord, name="Polled Flat", category="apartment", location="Kisumu", price=18000
+        )
+
+    def test_list_etag_round_trip(self):
+        first = self.client.get("/api/properties/")
+        self.assertEqual(first.status_code, 200)
+        self.assertIn("Last-Modified", first)
+        again = self.client.get("/api/properties/", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again["ETag"], first["ETag"])
+
+        self.prop.price = 19000
+        self.prop.save()
+        changed = self.client.get("/api/properties/", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed["ETag"], first["ETag"])
+
+    def test_retrieve_last_modified(self):
+        first = self.client.get(f"/api/properties/{self.prop.pk}/")
+        again = self.client.get(f"/api/properties/{self.prop.pk}/", HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+        self.assertEqual(again.status_code, 304)
+
+    def test_review_etag_changes_with_rating(self):
+        review = Review.objects.create(property=self.prop, tenant=self.tenant, rating=3)
+        first = self.client.get("/api/reviews/")
+        self.assertEqual(self.client.get("/api/reviews/", HTTP_IF_NONE_MATCH=first["ETag"]).status_code, 304)
+        review.rating = 5
+        review.save()
+        self.assertEqual(self.client.get("/api/reviews/", HTTP_IF_NONE_MATCH=first["ETag"]).status_code, 200)
+
+    def test_renames_change_embedding_etags(self):
+        Review.objects.create(property=self.prop, tenant=self.tenant, rating=3)
+        properties, reviews = self.client.get("/api/properties/"), self.client.get("/api/reviews/")
+        self.prop.landlord.username = "land7-renamed"
+        self.prop.landlord.save()
+        changed = self.client.get("/api/properties/", HTTP_IF_NONE_MATCH=properties["ETag"])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.json()["results"][0]["landlord"], "land7-renamed")
+        self.prop.name = "Renamed Flat"
+        self.prop.save()
+        changed = self.client.get("/api/reviews/", HTTP_IF_NONE_MATCH=reviews["ETag"])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.json()["results"][0]["property_name"], "Renamed Flat")
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), IMAGE_PROCESSING_EAGER=True)
+class ImageRenditionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.landlord = User.objects.create_user(username="land8", password="testpass", role="landlord")
+
+    def upload(self, filename="phone.jpg", image_format="JPEG"):
+        buffer = BytesIO()
+        Image.new("RGB", (2400, 1800), "teal").save(buffer, image_format)
+        photo = SimpleUploadedFile(filename, buffer.getvalue(), content_type=f"image/{image_format.lower()}")
+        self.client.force_login(self.landlord)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/api/properties/", {
+                "name": "Photo Flat", "category": "apartment", "location": "Nyeri",
+                "price": "22000", "image": photo,
+            })
+        self.assertEqual(response.status_code, 201)
+        # The upload response does not wait for the renditions
+        self.assertEqual(response.json()["image_renditions"], {})
+        return Property.objects.get(pk=response.json()["id"])
+
+    def test_renditions_are_generated_after_commit(self):
+        prop = self.upload()
+        self.assertEqual(
+            set(prop.image_renditions),
+            {"source", "thumbnail_jpeg", "thumbnail_webp", "medium_jpeg", "medium_webp"},
+        )
+        with prop.image.storage.open(prop.image_renditions["thumbnail_webp"]) as fh:
+            thumb = Image.open(fh)
+            self.assertEqual(thumb.format, "WEBP")
+            self.assertEqual(thumb.size, (320, 240))
+        body = self.client.get(f"/api/properties/{prop.pk}/").json()
+        self.assertTrue(body["image_renditions"]["medium_jpeg"].startswith("http://testserver/media/"))
+        self.assertEqual(prop.thumbnail_url, prop.image.storage.url(prop.image_renditions["thumbnail_jpeg"]))
+
+    def test_replacing_the_image_drops_old_renditions(self):
+        prop = self.upload()
+        old = prop.image_renditions
+        prop.image = None
+        with self.captureOnCommitCallbacks(execute=True):
+            prop.save()
+        prop.refresh_from_db()
+        self.assertEqual(prop.image_renditions, {})
+        self.assertFalse(prop.image.storage.exists(old["thumbnail_jpeg"]))
+
+    def test_same_basename_does_not_share_renditions(self):
+        first, second = self.upload("a.jpg"), self.upload("a.png", "PNG")
+        self.assertNotEqual(first.image_renditions["thumbnail_jpeg"], second.image_renditions["thumbnail_jpeg"])
+        self.assertTrue(first.image.storage.exists(first.image_renditions["thumbnail_jpeg"]))
+
+    def test_renditions_use_the_image_field_storage(self):
+        storage = FileSystemStorage(location=tempfile.mkdtemp(), base_url="/property-media/")
+        with mock.patch.object(Property._meta.get_field("image"), "storage", storage):
+            prop = self.upload()
+            self.assertTrue(storage.exists(prop.image_renditions["medium_webp"]))
+            body = self.client.get(f"/api/properties/{prop.pk}/").json()
+            self.assertTrue(body["image_renditions"]["medium_jpeg"].startswith("http://testserver/property-media/"))
+
+    def test_command_rebuild_changes_etags(self):
+        prop = self.upload()
+        detail, listing = self.client.get(f"/api/properties/{prop.pk}/"), self.client.get("/api/properties/")
+        call_command("generate_renditions", all=True, stdout=StringIO())
+        changed = self.client.get(f"/api/properties/{prop.pk}/", HTTP_IF_NONE_MATCH=detail["ETag"])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed["ETag"], detail["ETag"])
+        prop.refresh_from_db()
+        self.assertTrue(changed.json()["image_renditions"]["thumbnail_jpeg"]
+                        .endswith(prop.image_renditions["thumbnail_jpeg"]))
+        self.assertEqual(self.client.get("/api/properties/", HTTP_IF_NONE_MATCH=listing["ETag"]).status_code, 200)
+
+class GeoSearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        landlord = User.objects.create_user(username="land9", password="testpass", role="landlord")
+        for name, location in [("Ridge", "Westlands, Nairobi"), ("Garden", "Karen"),
+                               ("Creek", "Kilimani"), ("Beach", "Nyali, Mombasa"), ("Nowhere", "Atlantis")]:
+            Property.objects.create(landlord=landlord, name=name, category="house", location=location, price=30000)
+
+    def names(self, query):
+        response = self.client.get(f"/api/properties/?{query}")
+        self.assertEqual(response.status_code, 200, response.content)
+        return [row["name"] for row in response.json()["results"]]
+
+    def test_geocoded_on_save(self):
+        prop = Property.objects.get(name="Beach")
+        self.assertAlmostEqual(prop.latitude, -4.03)
+        self.assertTrue(prop.geohash.startswith("kzk"))
+        self.assertIsNone(Property.objects.get(name="Nowhere").latitude)
+        prop.location = "Kisumu"
+        prop.save()
+        self.assertAlmostEqual(prop.longitude, 34.768)
+
+    def test_radius_search_ordered_by_distance(self):
+        # From Westlands: Kilimani ~3.5 km, Karen ~12 km, Mombasa ~440 km
+        self.assertEqual(self.names("lat=-1.2676&lng=36.8108&radius_km=15&ordering=distance"),
+                         ["Ridge", "Creek", "Garden"])
+        rows = self.client.get("/api/properties/?lat=-1.2676&lng=36.8108&radius_km=5&ordering=distance").json()
+        self.assertEqual(rows["results"][1]["name"], "Creek")
+        self.assertAlmostEqual(rows["results"][1]["distance_km"], 3.5, delta=0.5)
+        self.assertNotIn("distance_km", self.client.get("/api/properties/").json()["results"][0])
+
+    def test_bbox_search(self):
+        self.assertEqual(set(self.names("bbox=39.5,-4.2,39.9,-3.9")), {"Beach"})
+        self.assertEqual(set(self.names("bbox=36.6,-1.4,36.9,-1.2")), {"Ridge", "Garden", "Creek"})
+
+    def test_invalid_parameters(self):
+        for query in ["bbox=1,2,3", "lat=-1.2&lng=36.8", "lat=x&lng=36.8&radius_km=5",
+                      "lat=-1.2&lng=36.8&radius_km=0", "ordering=distance"]:
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(f"/api/properties/?{query}").status_code, 400)
+
+class PropertyFacetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        landlord = User.objects.create_user(username="land10", password="testpass", role="landlord")
+        for name, category, price, available in [
+            ("Sunny Flat", "apartment", 8000, True),
+            ("Sunny Villa", "house", 60000, True),
+            ("Quiet Flat", "apartment", 30000, False),
+            ("Sunny Room", "single_room", 30000, True),
+        ]:
+            Property.objects.create(landlord=landlord, name=name, category=category, location="Nairobi",
+                                    price=price, is_available=available)
+
+    def setUp(self):
+        cache.clear()
+
+    def counts(self, facet, body, key="value"):
+        return {row[key]: row["count"] for row in body[facet] if row["count"]}
+
+    def test_every_facet_in_one_query(self):
+        with self.assertNumQueries(1):
+            body = self.client.get("/api/properties/facets/?q=sunny").json()
+        self.assertEqual(body["count"], 3)
+        self.assertEqual(self.counts("category", body), {"apartment": 1, "house": 1, "single_room": 1})
+        self.assertEqual(len(body["category"]), 4)
+        self.assertEqual(self.counts("price", body, "max"), {"10000.00": 1, "35000.00": 1, "100000.00": 1})
+        self.assertEqual(self.counts("is_available", body), {True: 3})
+        # Served from the cache until a property changes
+        with self.assertNumQueries(0):
+            self.client.get("/api/properties/facets/?q=sunny&ordering=price")
+        Property.objects.filter(name="Sunny Room").first().save()
+        with self.assertNumQueries(1):
+            self.client.get("/api/properties/facets/?q=sunny")
+
+    def test_custom_price_buckets(self):
+        body = self.client.get("/api/properties/facets/?price_buckets=50000,20000").json()
+        self.assertEqual([row["count"] for row in body["price"]], [1, 2, 1])
+        self.assertEqual(body["price"][1], {"min": "20000.00", "max": "50000.00", "count": 2})
+        for raw in ("cheap", "12500.005", "100000000"):
+            response = self.client.get(f"/api/properties/facets/?price_buckets={raw}")
+            self.assertEqual(response.status_code, 400)
+
+class BulkImportExportTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.landlord = User.objects.create_user(username="land11", password="testpass", role="landlord")
+        self.client.force_login(self.landlord)
+
+    def upload(self, name, content, query=""):
+        upload = SimpleUploadedFile(name, content.encode("utf-8"))
+        return self.client.post(f"/api/properties/import/{query}", {"file": upload})
+
+    def test_csv_import_reports_bad_rows(self):
+        rows = "".join(f"Unit {i},apartment,Kilimani,{20000 + i},true\n" for i in range(40))
+        content = "name,category,location,price,is_available\n" + rows + "Broken,castle,Karen,abc,true\n"
+        # Validation and writes are batched, so the query count does not grow with the file
+        # (the last two read and insert the new available listings)
+        with self.assertNumQueries(9):
+            response = self.upload("units.csv", content)
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual((body["rows"], body["created"], body["error_count"]), (41, 40, 1))
+        self.assertEqual(body["errors"][0]["line"], 42)
+        self.assertEqual(set(body["errors"][0]["errors"]), {"category", "price"})
+        prop = Property.objects.get(name="Unit 7")
+        self.assertEqual(prop.landlord, self.landlord)
+        self.assertIsNotNone(prop.latitude)
+        self.assertEqual(self.client.get("/api/properties/?q=unit").json()["count"], 40)
+
+    def test_import_without_pks_from_bulk_insert(self):
+        # As on MySQL, whose bulk_create does not return the new pks
+        content = "name,category,location,price\nLoft One,apartment,Kilimani,20000\nLoft Two,house,Karen,30000\n"
+        with mock.patch.object(type(connection.features), "can_return_rows_from_bulk_insert", False):
+            self.assertEqual(self.upload("units.csv", content).status_code, 201)
+        self.assertEqual(self.client.get("/api/properties/?q=loft").json()["count"], 2)
+        self.assertEqual(set(AvailableListing.objects.values_list("name", flat=True)), {"Loft One", "Loft Two"})
+
+    def test_jsonl_import_and_dry_run(self):
+        content = '{"name": "Loft", "category": "house", "location": "Nyeri", "price": "9000"}\nnot json\n'
+        response = self.upload("units.jsonl", content, "?dry_run=true")
+        self.assertEqual(response.json()["created"], 1)
+        self.assertFalse(Property.objects.exists())
+        self.assertEqual(self.upload("units.jsonl", content).status_code, 201)
+        self.assertEqual(Property.objects.get().name, "Loft")
+        self.assertEqual(self.upload("units.txt", content).status_code, 400)
+
+    def test_streaming_export_round_trip(self):
+        for i in range(3):
+            Property.objects.create(landlord=self.landlord, name=f"Flat {i}", category="apartment",
+                                    location="Nairobi", price=15000, is_available=i != 1)
+        response = self.client.get("/api/properties/export/?is_available=true")
+        self.assertTrue(response.streaming)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(",")[:3], ["id", "landlord", "name"])
+        self.assertEqual(len(lines), 3)
+
+        response = self.client.get("/api/properties/export/?type=jsonl")
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual([row["name"] for row in rows], ["Flat 0", "Flat 1", "Flat 2"])
+
+        # Landlords export only their own listings; everyone else is refused
+        other = User.objects.create_user(username="land11b", password="testpass", role="landlord")
+        Property.objects.create(landlord=other, name="Elsewhere", category="house", location="Nakuru", price=9000)
+        self.assertEqual(len(b"".join(self.client.get("/api/properties/export/").streaming_content)
+                             .decode().splitlines()), 4)
+        tenant = User.objects.create_user(username="tenant11", password="testpass", role="tenant")
+        self.client.force_login(tenant)
+        self.assertEqual(self.client.get("/api/properties/export/").status_code, 403)
+        self.client.logout()
+        self.assertIn(self.client.get("/api/properties/export/").status_code, (401, 403))
+        self.client.force_login(self.landlord)
+
+        with tempfile.NamedTemporaryFile("w+", suffix=".jsonl") as fh:
+            call_command("export_properties", type="jsonl", output=fh.name, stderr=StringIO())
+            out = StringIO()
+            call_command("import_properties", fh.name, landlord="land11", stdout=out)
+        self.assertIn("Imported 4 of 4 rows", out.getvalue())
+        self.assertEqual(Property.objects.count(), 8)
+
+class BulkApplicationStatusTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.landlord = User.objects.create_user(username="land12", password="testpass", role="landlord")
+        other = User.objects.create_user(username="land13", password="testpass", role="landlord")
+        cls.flat = Property.objects.create(landlord=cls.landlord, name="Flat", category="apartment",
+                                           location="Nairobi", price=20000)
+        cls.house = Property.objects.create(landlord=cls.landlord, name="House", category="house",
+                                            location="Nairobi", price=40000)
+        foreign = Property.objects.create(landlord=other, name="Other", category="house",
+                                          location="Nairobi", price=40000)
+        tenants = [User.objects.create_user(username=f"bulk_tenant{i}", password="x", role="tenant")
+                   for i in range(3)]
+        cls.flat_apps = [RentalApplication.objects.create(property=cls.flat, tenant=t) for t in tenants]
+        cls.house_app = RentalApplication.objects.create(property=cls.house, tenant=tenants[0])
+        cls.foreign_app = RentalApplication.objects.create(property=foreign, tenant=tenants[0])
+
+    def setUp(self):
+        self.client.force_login(self.landlord)
+
+    def post(self, payload):
+        return self.client.post("/api/applications/bulk-status/", payload, content_type="application/json")
+
+    def test_batch_update_reports_each_id(self):
+        ids = [self.flat_apps[0].pk, self.house_app.pk, self.foreign_app.pk]
+        # session + user, then lock-and-check, one UPDATE and the savepoint pair
+        with self.assertNumQueries(6):
+            response = self.post({"ids": ids, "status": "rejected"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r["result"] for r in response.json()["results"]], ["updated", "updated", "not_found"])
+        self.assertEqual(
+            set(RentalApplication.objects.filter(status="rejected").values_list("pk", flat=True)), set(ids[:2]),
+        )
+        self.assertEqual(self.post({"ids": ids[:1], "status": "rejected"}).json()["results"][0]["result"],
+                         "unchanged")
+
+    def test_approve_one_rejects_the_rest(self):
+        chosen = self.flat_apps[1]
+        response = self.post({"ids": [chosen.pk], "status": "approved", "reject_others": True})
+        results = response.json()["results"]
+        self.assertEqual(results[0], {"id": chosen.pk, "result": "updated", "status": "approved"})
+        self.assertEqual({r["id"] for r in results[1:]}, {self.flat_apps[0].pk, self.flat_apps[2].pk})
+        statuses = dict(RentalApplication.objects.values_list("pk", "status"))
+        self.assertEqual([statuses[a.pk] for a in self.flat_apps], ["rejected", "approved", "rejected"])
+        self.assertEqual(statuses[self.house_app.pk], "pending")
+
+        response = self.post({"ids": [self.flat_apps[0].pk, self.flat_apps[2].pk], "status": "approved",
+                              "reject_others": True})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.post({"ids": [1], "status": "rejected", "reject_others": True}).status_code, 400)
+
+    def test_tenants_cannot_bulk_update(self):
+        self.client.force_login(self.flat_apps[0].tenant)
+        response = self.client.post("/api/applications/bulk-status/", {"ids": [self.flat_apps[0].pk],
+                                    "status": "approved"}, content_type="application/json")
+        self.assertEqual(response.status_code, 403)
+
+class PaymentHistoryTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.landlord = User.objects.create_user(username="land14", password="testpass", role="landlord")
+        cls.tenant = User.objects.create_user(username="pay_tenant", password="x", role="tenant")
+        cls.other = User.objects.create_user(username="pay_other", password="x", role="tenant")
+        cls.flat = Property.objects.create(landlord=cls.landlord, name="Flat", category="apartment",
+                                           location="Nairobi", price=20000)
+        cls.house = Property.objects.create(landlord=cls.landlord, name="House", category="house",
+                                            location="Nairobi", price=40000)
+        cls.app = RentalApplication.objects.create(property=cls.flat, tenant=cls.tenant, status="approved")
+        cls.house_app = RentalApplication.objects.create(property=cls.house, tenant=cls.tenant, status="approved")
+        cls.other_app = RentalApplication.objects.create(property=cls.flat, tenant=cls.other, status="approved")
+
+    def pay(self, app, amount, status="completed"):
+        return Payment.objects.create(application=app, amount=amount, status=status)
+
+    def test_list_is_scoped_and_filterable(self):
+        mine = self.pay(self.app, 20000)
+        self.pay(self.house_app, 40000, status="pending")
+        theirs = self.pay(self.other_app, 20000)
+        self.assertEqual((mine.tenant, mine.property), (self.tenant, self.flat))
+
+        self.client.force_login(self.tenant)
+        ids = [row["id"] for row in self.client.get("/api/payments/").json()["results"]]
+        self.assertEqual(len(ids), 2)
+        self.assertNotIn(theirs.pk, ids)
+        self.assertEqual(self.client.get(f"/api/payments/{theirs.pk}/").status_code, 404)
+        body = self.client.get("/api/payments/?status=completed&count=exact").json()
+        self.assertEqual((body["count"], body["results"][0]["id"]), (1, mine.pk))
+        self.assertEqual(self.client.get("/api/payments/?until=2000-01-01").json()["results"], [])
+        self.assertEqual(self.client.get("/api/payments/?since=yesterday").status_code, 400)
+
+        self.client.force_login(self.landlord)
+        body = self.client.get(f"/api/payments/?property={self.flat.pk}&count=exact").json()
+        self.assertEqual(body["count"], 2)
+
+    def test_ledger_follows_payment_changes(self):
+        first = self.pay(self.app, 20000)
+        pending = self.pay(self.app, 21000, status="pending")
+        self.pay(self.house_app, 40000)
+        ledger = PaymentLedger.objects.get(tenant=self.tenant, property=self.flat)
+        self.assertEqual((ledger.payment_count, ledger.total_paid), (1, 20000))
+
+        pending.status = "completed"
+        pending.save()
+        ledger.refresh_from_db()
+        self.assertEqual((ledger.payment_count, ledger.total_paid, ledger.last_payment_amount), (2, 41000, 21000))
+        pending.delete()
+        ledger.refresh_from_db()
+        self.assertEqual((ledger.total_paid, ledger.last_payment_at), (20000, first.created_at))
+
+        self.client.force_login(self.tenant)
+        with self.assertNumQueries(3):
+            body = self.client.get("/api/payments/summary/").json()
+        self.assertEqual((body["payment_count"], body["total_paid"]), (2, "60000.00"))
+        self.assertEqual([row["property_name"] for row in body["properties"]], ["Flat", "House"])
+
+        out = StringIO()
+        call_command("recompute_payment_ledger", "--check", stdout=out)
+        self.assertIn("consistent", out.getvalue())
+        PaymentLedger.objects.update(total_paid=0)
+        with self.assertRaises(CommandError):
+            call_command("recompute_payment_ledger", "--check", stdout=StringIO())
+        call_command("recompute_payment_ledger", stdout=StringIO())
+        ledger.refresh_from_db()
+        self.assertEqual(ledger.total_paid, 20000)
+
+class IdempotentPaymentTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        landlord = User.objects.create_user(username="land15", password="testpass", role="landlord")
+        cls.tenant = User.objects.create_user(username="idem_tenant", password="x", role="tenant")
+        prop = Property.objects.create(landlord=landlord, name="Flat", category="apartment",
+                                       location="Nairobi", price=20000)
+        cls.app = RentalApplication.objects.create(property=prop, tenant=cls.tenant, status="approved")
+
+    def setUp(self):
+        self.client.force_login(self.tenant)
+
+    def post(self, amount, key=None):
+        headers = {"HTTP_IDEMPOTENCY_KEY": key} if key else {}
+        return self.client.post("/api/payments/", {"application": self.app.pk, "amount": amount},
+                                content_type="application/json", **headers)
+
+    def test_replay_returns_the_stored_response(self):
+        first = self.post("20000.00", key="k-1")
+        self.assertEqual(first.status_code, 201)
+        replay = self.post("20000.00", key="k-1")
+        self.assertEqual((replay.status_code, replay.json()), (201, first.json()))
+        self.assertEqual(replay["Idempotent-Replayed"], "true")
+        self.assertEqual(Payment.objects.count(), 1)
+        self.assertEqual(self.post("1.00", key="k-1").status_code, 422)
+
+    def test_duplicate_pending_payment_conflicts(self):
+        first = self.post("20000.00")
+        second = self.post("20000.00", key="k-2")
+        self.assertEqual(second.status_code, 409)
+        self.assertEqual(second.json()["payment"], first.json()["id"])
+        # The failed attempt did not consume the key
+        Payment.objects.update(status="completed")
+        self.assertEqual(self.post("20000.00", key="k-2").status_code, 201)
+
+    def test_older_pending_payment_does_not_block_the_next(self):
+        self.assertEqual(self.post("20000.00").status_code, 201)
+        Payment.objects.update(created_at=timezone.now() - datetime.timedelta(days=30))
+        self.assertEqual(self.post("20000.00").status_code, 201)
+        self.assertEqual(Payment.objects.filter(status="pending").count(), 2)
+
+    def test_resubmitted_payment_form_is_replayed(self):
+        url = f"/applications/{self.app.pk}/pay/"
+        for _ in range(2):
+            response = self.client.post(url, {"amount": "20000", "idempotency_key": "form-key"})
+            self.assertEqual(response.status_code, 302)
+        self.assertEqual(Payment.objects.count(), 1)
+
+    def test_payment_form_errors_are_reported_separately(self):
+        url = f"/applications/{self.app.pk}/pay/"
+
+        def message_for(amount, key):
+            response = self.client.post(url, {"amount": amount, "idempotency_key": key})
+            return [str(m) for m in get_messages(response.wsgi_request)][-1]
+
+        self.assertEqual(message_for("20000", "form-key"), "Payment submitted. Status: pending.")
+        self.assertEqual(message_for("15000", "form-key"),
+                         "This payment form was already submitted with a different amount. Please start a new payment.")
+        self.assertEqual(message_for("20000", "other-key"), "This payment is already pending.")
+        self.assertEqual(message_for("15000", "k" * 256),
+                         "This payment form is no longer valid. Please submit it again.")
+        self.assertEqual(Payment.objects.count(), 1)
+
+    def test_second_submission_raises_duplicate_payment(self):
+        # What the row lock serializes (IdempotentPaymentStressTest), run one after the other
+        def create():
+            return Payment.objects.create(application=self.app, amount=Decimal("20000.00"))
+
+        first = submit_payment(self.app.pk, Decimal("20000.00"), create)
+        with self.assertRaises(DuplicatePayment) as raised:
+            submit_payment(self.app.pk, Decimal("20000.00"), create)
+        self.assertEqual(raised.exception.payment, first)
+        self.assertEqual(Payment.objects.count(), 1)
+
+    def test_expired_keys_are_reused_and_purged(self):
+        self.post("100.00", key="k-3")
+        IdempotencyKey.objects.update(expires_at=timezone.now())
+        Payment.objects.update(status="completed")
+        response = self.post("100.00", key="k-3")
+        self.assertFalse(response.has_header("Idempotent-Replayed"))
+        self.assertEqual(Payment.objects.count(), 2)
+        IdempotencyKey.objects.update(expires_at=timezone.now())
+        call_command("purge_idempotency_keys", stdout=StringIO())
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+@override_settings(PAYMENT_WEBHOOK_SECRET="test-webhook-secret")
+class PaymentWebhookTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        landlord = User.objects.create_user(username="land17", password="testpass", role="landlord")
+        cls.tenants = [User.objects.create_user(username=f"hook_tenant{i}", password="x", role="tenant")
+                       for i in range(3)]
+        cls.props = [Property.objects.create(landlord=landlord, name=f"Flat {i}", category="apartment",
+                                             location="Nairobi", price=20000) for i in range(3)]
+        cls.apps = [RentalApplication.objects.create(property=prop, tenant=tenant, status="approved")
+                    for prop in cls.props for tenant in cls.tenants]
+
+    def post(self, body, signature=None):
+        body = json.dumps(body).encode()
+        return self.client.post("/api/payments/webhook/", body, content_type="application/json",
+                                headers={SIGNATURE_HEADER: signature or sign(body)})
+
+    def test_callbacks_are_queued_then_applied_in_batches(self):
+        payments = [Payment.objects.create(application=app, amount=1000 + i) for i, app in enumerate(self.apps)]
+        self.assertTrue(all(p.transaction_id.startswith("KRH-") for p in payments))
+        simulator = GatewaySimulator(fail_rate=0.3, duplicate_rate=0.3, seed=7)
+        events, statuses = simulator.settle([p.transaction_id for p in payments], batch_size=4)
+        self.assertEqual(set(statuses), {202})
+        self.assertGreater(len(events), len(payments))
+        # Acknowledged without touching the payments
+        self.assertFalse(Payment.objects.exclude(status="pending").exists())
+        # Redeliveries share an event_id and are stored once
+        unique = len({e["event_id"] for e in events})
+        self.assertEqual(PaymentWebhookEvent.objects.count(), unique)
+
+        # Fixed cost per batch (savepoints included), whatever its size
+        with self.assertNumQueries(11):
+            counts = process_batch()
+        self.assertEqual(counts, {"applied": unique, "ignored": 0, "unknown": 0})
+        expected = {e["transaction_id"]: e["status"] for e in events}
+        self.assertEqual(dict(Payment.objects.values_list("transaction_id", "status")), expected)
+        self.assertEqual(process_batch(), {})
+
+        out = StringIO()
+        call_command("recompute_payment_ledger", "--check", stdout=out)
+        self.assertIn("consistent", out.getvalue())
+
+    def test_redelivered_unknown_and_stale_callbacks(self):
+        payment = Payment.objects.create(application=self.apps[0], amount=20000)
+        event = {"event_id": "evt_1", "transaction_id": payment.transaction_id, "status": "completed"}
+        self.assertEqual(self.post(event).status_code, 202)
+        self.assertEqual(self.post(event).status_code, 202)
+        self.post({"events": [{"event_id": "evt_2", "transaction_id": "KRH-NOPE", "status": "completed"},
+                              {"event_id": "evt_3", "transaction_id": payment.transaction_id, "status": "failed"}]})
+        call_command("process_payment_webhooks", stdout=StringIO())
+        payment.refresh_from_db()
+        # A completed payment never goes back to failed
+        self.assertEqual(payment.status, "completed")
+        self.assertEqual(dict(PaymentWebhookEvent.objects.values_list("event_id", "result")),
+                         {"evt_1": "applied", "evt_2": "unknown", "evt_3": "ignored"})
+        ledger = PaymentLedger.objects.get(tenant=self.tenants[0], property=self.props[0])
+        self.assertEqual((ledger.payment_count, ledger.total_paid), (1, 20000))
+
+    def test_rejects_bad_signatures_and_bodies(self):
+        event = {"event_id": "evt_1", "transaction_id": "KRH-1", "status": "completed"}
+        self.assertEqual(self.post(event, signature="0" * 64).status_code, 403)
+        self.assertEqual(self.post({**event, "status": "refunded"}).status_code, 400)
+        # No secret configured: even a body signed with the empty key is refused
+        with self.settings(PAYMENT_WEBHOOK_SECRET=""):
+            self.assertEqual(self.post(event).status_code, 503)
+        self.assertFalse(PaymentWebhookEvent.objects.exists())
+        self.assertEqual(self.post({"events": []}).status_code, 400)
+        self.assertFalse(PaymentWebhookEvent.objects.exists())
+
+
+# Row locks are what serialize the duplicates; SQLite has none (and its shared
+# in-memory test database rejects concurrent writers), so run on Postgres/MySQL.
+@skipUnlessDBFeature("has_select_for_update")
+class IdempotentPaymentStressTest(TransactionTestCase):
+    """Parallel duplicate submissions must produce exactly one payment."""
+    WORKERS = 8
+
+    def setUp(self):
+        landlord = User.objects.create_user(username="land16", password="testpass", role="landlord")
+        self.tenant = User.objects.create_user(username="stress_tenant", password="x", role="tenant")
+        prop = Property.objects.create(landlord=landlord, name="Flat", category="apartment",
+                                       location="Nairobi", price=20000)
+        self.app = RentalApplication.objects.create(property=prop, tenant=self.tenant, status="approved")
+
+    def fire(self, headers_for):
+        barrier = threading.Barrier(self.WORKERS, timeout=30)
+
+        def submit(i):
+            client = Client()
+            client.force_login(self.tenant)
+            barrier.wait()
+            try:
+                return client.post("/api/payments/", {"application": self.app.pk, "amount": "20000.00"},
+                                   content_type="application/json", **headers_for(i)).status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(self.WORKERS) as pool:
+            return sorted(pool.map(submit, range(self.WORKERS)))
+
+    def test_parallel_replays_of_one_key(self):
+        codes = self.fire(lambda i: {"HTTP_IDEMPOTENCY_KEY": "same-key"})
+        self.assertEqual(codes, [201] * self.WORKERS)
+        self.assertEqual(Payment.objects.count(), 1)
+
+    def test_parallel_double_submits_without_a_key(self):
+        codes = self.fire(lambda i: {})
+        self.assertEqual(codes, [201] + [409] * (self.WORKERS - 1))
+        self.assertEqual(Payment.objects.count(), 1)
+
+
+class RequestMetricsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        landlord = User.objects.create_user(username="land19", password="testpass", role="landlord")
+        Property.objects.create(landlord=landlord, name="Flat", category="apartment", location="Nairobi", price=1)
+
+    def setUp(self):
+        registry.clear()
+        cache.clear()
+
+    def test_histogram_buckets_and_percentiles(self):
+        self.assertEqual(log_buckets(1, 100, 2), (1, 3.2, 10, 32, 100))
+        histogram = Histogram((1, 10, 100))
+        for value in (0.5, 5, 5, 50, 500):
+            histogram.observe(value)
+        self.assertEqual((histogram.percentile(50), histogram.percentile(80), histogram.percentile(100)),
+                         (10, 100, float("inf")))
+
+    @override_settings(METRICS_TOKEN="s3cret")
+    def test_requests_are_recorded_per_endpoint(self):
+        self.client.get("/api/properties/")
+        self.client.get("/api/properties/")
+        self.client.generic("BREW", "/api/properties/")
+        body = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer s3cret").content.decode()
+        labels = 'endpoint="PropertyViewSet.list",method="GET"'
+        self.assertIn(f"krh_http_request_duration_seconds_count{{{labels}}} 2", body)
+        self.assertIn(f'krh_http_db_queries_bucket{{{labels},le="+Inf"}} 2', body)
+        self.assertIn(f"krh_http_serializer_duration_seconds_count{{{labels}}} 2", body)
+        self.assertIn(f"krh_http_response_size_bytes_count{{{labels}}} 2", body)
+        # Served by the row serializers (api/rows.py), which are timed too
+        serializer_sum = re.search(rf"krh_http_serializer_duration_seconds_sum{{{labels}}} (\S+)", body)
+        self.assertGreater(float(serializer_sum.group(1)), 0)
+        self.assertIn('method="OTHER"', body)
+        self.assertNotIn("BREW", body)
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer s3cre").status_code, 403)
+        with override_settings(METRICS_TOKEN=""):
+            self.assertEqual(self.client.get("/metrics").status_code, 404)
+
+    @override_settings(METRICS_SLOW_REQUEST_MS=0)
+    def test_slow_requests_are_logged_with_their_sql(self):
+        with self.assertLogs("api.metrics.slow", "WARNING") as logs:
+            self.client.get("/api/properties/")
+        self.assertIn("PropertyViewSet.list", logs.output[0])
+        self.assertIn('FROM "api_property"', logs.output[0])
+
+
+class SyntheticBenchmarkTest(TestCase):
+    def test_seeded_data_is_consistent_and_benchmarks_run(self):
+        counts = seed_data(landlords=3, tenants=20, properties=40, applications=150, seed=3)
+        self.assertEqual((counts["users"], counts["properties"]), (23, 40))
+        self.assertEqual(Payment.objects.count(), counts["payments"])
+        # bulk_create bypassed the signals; the denormalized counters were rebuilt
+        call_command("recompute_review_aggregates", "--check", stdout=StringIO())
+        call_command("recompute_payment_ledger", "--check", stdout=StringIO())
+
+        results = run_benchmarks(iterations=3, warmup=0, cold=True, plain_static=True,
+                                 only={"properties_list", "applications_tenant", "home_page"})
+        self.assertEqual(set(results["scenarios"]), {"properties_list", "applications_tenant", "home_page"})
+        for row in results["scenarios"].values():
+            self.assertEqual(row["errors"], 0)
+            self.assertGreater(row["queries"], 0)
+        self.assertEqual(compare(results, results), [])
+        slower = json.loads(json.dumps(results))
+        slower["scenarios"]["home_page"]["queries"] += 1
+        self.assertEqual([r[:2] for r in compare(slower, results)], [("home_page", "queries")])
+
+
+@override_settings(JWT_STATELESS_AUTH=True)
+class StatelessJWTAuthTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.landlord = User.objects.create_user(username="land18", password="testpass", role="landlord")
+        cls.tenant = User.objects.create_user(username="jwt_tenant", email="t@example.com",
+                                              password="testpass", role="tenant")
+
+    def setUp(self):
+        user_cache.clear()
+
+    def token(self, username="jwt_tenant"):
+        response = self.client.post("/api/auth/token/", {"username": username, "password": "testpass"})
+        return {"HTTP_AUTHORIZATION": f"Bearer {response.json()['access']}"}
+
+    def test_claims_replace_the_user_query(self):
+        auth = self.token()
+        with override_settings(JWT_STATELESS_AUTH=False):
+            with self.assertNumQueries(2):  # user + payments page
+                self.assertEqual(self.client.get("/api/payments/", **auth).status_code, 200)
+        self.client.get("/api/payments/", **auth)  # fills the user cache
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get("/api/payments/", **auth).status_code, 200)
+        self.assertEqual(self.client.post("/api/properties/", {}, **auth).status_code, 403)
+        with self.assertNumQueries(0):
+            body = self.client.get("/api/auth/me/", **auth).json()
+        self.assertEqual((body["username"], body["email"], body["role"]), ("jwt_tenant", "t@example.com", "tenant"))
+
+    def test_revoked_and_stale_tokens_are_rejected(self):
+        auth, landlord_auth = self.token(), self.token("land18")
+        self.assertEqual(self.client.get("/api/auth/me/", **auth).status_code, 200)
+        self.tenant.revoke_tokens()
+        self.assertEqual(self.client.get("/api/auth/me/", **auth).status_code, 401)
+        self.assertEqual(self.client.get("/api/auth/me/", **self.token()).status_code, 200)
+
+        self.landlord.role = "tenant"
+        self.landlord.save()
+        self.assertEqual(self.client.get("/api/auth/me/", **landlord_auth).status_code, 401)
+        self.landlord.is_active = False
+        self.landlord.save()
+        self.assertEqual(self.client.get("/api/auth/me/", **landlord_auth).status_code, 401)
+
+    def test_revocation_applies_without_stateless_auth(self):
+        with override_settings(JWT_STATELESS_AUTH=False):
+            auth = self.token()
+            self.assertEqual(self.client.get("/api/auth/me/", **auth).status_code, 200)
+            self.tenant.revoke_tokens()
+            self.assertEqual(self.client.get("/api/auth/me/", **auth).status_code, 401)
+            auth = self.token()
+            self.tenant.set_password("testpass")
+            self.tenant.save()
+            self.assertEqual(self.client.get("/api/auth/me/", **auth).status_code, 401)
+
+    def test_renamed_users_see_their_new_username(self):
+        auth = self.token()
+        self.tenant.username = "jwt_tenant_renamed"
+        self.tenant.save()
+        self.assertEqual(self.client.get("/api/auth/me/", **auth).json()["username"], "jwt_tenant_renamed")
+
+    def test_password_changes_saved_with_update_fields(self):
+        auth = self.token()
+        self.tenant.set_password("testpass")
+        self.tenant.save(update_fields=["password"])
+        self.assertEqual(self.client.get("/api/auth/me/", **auth).status_code, 401)
+        # Logging in with an outdated hasher rehashes the password the same way
+        with self.settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.PBKDF2PasswordHasher",
+                                             "django.contrib.auth.hashers.MD5PasswordHasher"]):
+            User.objects.filter(pk=self.tenant.pk).update(password=make_password("testpass", hasher="md5"))
+            auth = self.token()
+        self.assertTrue(User.objects.get(pk=self.tenant.pk).password.startswith("pbkdf2_"))
+        self.assertEqual(self.client.get("/api/auth/me/", **auth).status_code, 200)
+
+    def test_rehash_on_login_keeps_existing_tokens(self):
+        auth = self.token()
+        with self.settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.PBKDF2PasswordHasher",
+                                             "django.contrib.auth.hashers.MD5PasswordHasher"]):
+            User.objects.filter(pk=self.tenant.pk).update(password=make_password("testpass", hasher="md5"))
+            self.token()  # logging in on another device upgrades the outdated hash
+            self.assertTrue(User.objects.get(pk=self.tenant.pk).password.startswith("pbkdf2_"))
+        self.assertEqual(self.client.get("/api/auth/me/", **auth).status_code, 200)
+
+
+class AsyncReadViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        landlord = User.objects.create_user(username="land21", password="testpass", role="landlord")
+        tenant = User.objects.create_user(username="tenant21", password="testpass", role="tenant")
+        cls.props = [
+            Property.objects.create(landlord=landlord, name=f"Flat {i}", category="apartment",
+                                    location="Nairobi", price=10000 + i)
+            for i in range(12)
+        ]
+        Review.objects.create(property=cls.props[0], tenant=tenant, rating=4, comment="Quiet")
+
+    def setUp(self):
+        cache.clear()
+
+    def get_async(self, view, path, **kwargs):
+        headers = kwargs.pop("headers", {})
+        return async_to_sync(view)(AsyncRequestFactory().get(path, headers=headers), **kwargs)
+
+    def test_responses_match_the_sync_views(self):
+        pk = self.props[3].pk
+        cases = [
+            (async_views.property_list, "/api/properties/", {}),
+            (async_views.property_list, "/api/properties/?page=2&min_price=10005", {}),
+            (async_views.property_list, "/api/properties/?page=9", {}),
+            (async_views.property_list, "/api/properties/?ordering=distance", {}),
+            (async_views.property_detail, f"/api/properties/{pk}/", {"pk": pk}),
+            (async_views.property_detail, "/api/properties/999999/", {"pk": 999999}),
+            (async_views.review_list, "/api/reviews/", {}),
+        ]
+        for view, path, kwargs in cases:
+            with self.subTest(path=path):
+                # Cold, then served from the response and fingerprint caches
+                for _ in range(2):
+                    expected = self.client.get(path)
+                    cache.clear()
+                    response = self.get_async(view, path, **kwargs)
+                    self.assertEqual(response.status_code, expected.status_code)
+                    self.assertEqual(response.content, expected.content)
+                    self.assertEqual(response.get("ETag"), expected.get("ETag"))
+                    self.assertEqual(response["Allow"], expected["Allow"])
+
+        etag = self.client.get("/api/properties/")["ETag"]
+        response = self.get_async(async_views.property_list, "/api/properties/", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+
+    def test_other_requests_fall_back_to_the_viewset(self):
+        with self.assertNumQueries(2):  # fingerprint and keyset page, no COUNT(*)
+            response = self.get_async(async_views.property_list, "/api/properties/?pagination=cursor").render()
+        self.assertEqual(json.loads(response.content)["results"][0]["id"], self.props[-1].pk)
+        response = self.get_async(async_views.property_list, "/api/properties/", headers={"Accept": "text/html"})
+        self.assertEqual(response.accepted_renderer.format, "api")  # the browsable API, from the viewset
+        request = AsyncRequestFactory().post("/api/properties/", {}, content_type="application/json")
+        self.assertIn(async_to_sync(async_views.property_list)(request).status_code, (401, 403))
+
+    def test_initial_checks_run_on_the_async_path(self):
+        class Closed(BaseThrottle):
+            def allow_request(self, request, view):
+                return False
+
+        with mock.patch.object(PropertyViewSet, "throttle_classes", [Closed]):
+            response = self.get_async(async_views.property_list, "/api/properties/")
+        self.assertEqual(response.status_code, 429)
+
+        # The replica initial() picks is used for the reads, and only for this request
+        routed = []
+        db_for_read = ReplicaRouter.db_for_read
+
+        def spy(router, model, **hints):
+            routed.append(db_for_read(router, model, **hints))
+            return routed[-1]
+
+        with override_settings(DATABASE_REPLICAS=["default"]), mock.patch.object(ReplicaRouter, "db_for_read", spy):
+            self.assertEqual(self.get_async(async_views.property_list, "/api/properties/").status_code, 200)
+        self.assertEqual(set(routed), {"default"})
+        self.assertIsNone(read_alias.get())
+
+    def test_asgi_requests_are_measured(self):
+        registry.clear()
+        response = async_to_sync(self.async_client.get)("/api/properties/")
+        self.assertEqual(response.status_code, 200)
+        histogram = registry.histogram("db_queries", "PropertyViewSet.list", "GET")
+        self.assertEqual(histogram.count, 1)
+        self.assertGreater(histogram.sum, 0)
+
+
+class ReadReplicaRoutingTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        landlord = User.objects.create_user(username="land22", password="testpass", role="landlord")
+        cls.tenant = User.objects.create_user(username="tenant22", password="testpass", role="tenant")
+        cls.prop = Property.objects.create(landlord=landlord, name="Flat", category="apartment",
+                                           location="Nairobi", price=1)
+
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(DATABASE_REPLICAS=["replica_1"])
+    def test_router_and_replica_cache_entries(self):
+        router = ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Property))
+        with use_replica("replica_1"):
+            self.assertEqual(router.db_for_read(Property), "replica_1")
+            self.assertIsNone(router.db_for_read(User))
+            self.assertEqual(router.db_for_write(Property), "default")
+            replica_key = cache_key("k", tags=["properties"])
+        self.assertFalse(router.allow_migrate("replica_1", "api"))
+        self.assertNotEqual(cache_key("k", tags=["properties"]), replica_key)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_tags("properties")
+        self.assertEqual(entry_timeout(["properties"], 300), 300)
+        with use_replica("replica_1"):
+            self.assertEqual(entry_timeout(["properties"], 300), 10)
+
+    # "default" stands in for a replica: the test database has no second copy
+    @override_settings(DATABASE_REPLICAS=["default"], STORAGES=TEST_STORAGES)
+    def test_clients_read_the_primary_after_writing(self):
+        routed = []
+        db_for_read = ReplicaRouter.db_for_read
+
+        def spy(router, model, **hints):
+            alias = db_for_read(router, model, **hints)
+            if model in (Property, AvailableListing):
+                routed.append(alias)
+            return alias
+
+        def reads(client, path="/api/properties/", **extra):
+            routed.clear()
+            invalidate_tags("properties", f"property:{self.prop.pk}")  # miss the response cache
+            self.assertEqual(client.get(path, **extra).status_code, 200)
+            return set(routed)
+
+        token = Client().post("/api/auth/token/", {"username": "tenant22", "password": "testpass"}).json()
+        auth = {"HTTP_AUTHORIZATION": f"Bearer {token['access']}"}
+        with mock.patch.object(ReplicaRouter, "db_for_read", spy):
+            self.assertEqual(reads(self.client), {"default"})
+            self.assertEqual(reads(Client(), f"/api/properties/{self.prop.pk}/", **auth), {"default"})
+            self.assertEqual(reads(self.client, "/"), {"default"})
+
+            response = self.client.post("/api/reviews/", {"property": self.prop.pk, "rating": 5}, **auth)
+            self.assertEqual(response.status_code, 201)
+            self.assertIn(STICKY_COOKIE, response.cookies)
+            self.assertEqual(reads(self.client), {None})  # the cookie
+            self.assertEqual(reads(Client(), **auth), {None})  # the user, for token clients
+            self.assertEqual(reads(Client()), {"default"})
+
+
+class StreamingListTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.landlord = User.objects.create_user(username="land23", password="testpass", role="landlord")
+        cls.tenant = User.objects.create_user(username="tenant23", password="testpass", role="tenant")
+        for i in range(13):
+            prop = Property.objects.create(landlord=cls.landlord, name=f"Flat – {i}", category="apartment",
+                                           location="Nairobi", price=10000 + i)
+            app = RentalApplication.objects.create(property=prop, tenant=cls.tenant, status="approved")
+            Payment.objects.create(application=app, amount=prop.price, status="completed")
+
+    def setUp(self):
+        cache.clear()
+
+    def paged(self, path):
+        rows = []
+        while path:
+            body = self.client.get(path).json()
+            rows += body["results"]
+            path = body["next"]
+        return rows
+
+    def test_stream_matches_the_paginated_list(self):
+        self.client.force_login(self.tenant)
+        for path in ("/api/properties/?min_price=10002", "/api/applications/", "/api/payments/", "/api/reviews/"):
+            with self.subTest(path=path):
+                response = self.client.get(path + ("&" if "?" in path else "?") + "stream=true")
+                self.assertTrue(response.streaming)
+                self.assertEqual(response["Content-Type"], "application/json")
+                self.assertEqual(json.loads(b"".join(response.streaming_content)), self.paged(path))
+        self.assertIn("ETag", self.client.get("/api/properties/?stream=true"))
+
+    def test_anonymous_clients_cannot_stream_public_lists(self):
+        for path in ("/api/properties/?stream=true", "/api/reviews/?stream=1"):
+            with self.subTest(path=path):
+                response = self.client.get(path)
+                self.assertIn(response.status_code, (401, 403))
+                self.assertFalse(response.streaming)
+        self.assertEqual(self.client.get("/api/properties/").status_code, 200)
+
+    def test_chunks_and_asgi_streaming(self):
+        renderer = StreamingJSONRenderer()
+        chunks = list(renderer.render_array(({"n": i} for i in range(100)), chunk_bytes=64))
+        self.assertGreater(len(chunks), 10)
+        self.assertEqual(json.loads(b"".join(chunks)), [{"n": i} for i in range(100)])
+        self.assertEqual(b"".join(renderer.render_array([])), b"[]")
+
+        async def stream():
+            await self.async_client.aforce_login(self.tenant)
+            response = await self.async_client.get("/api/properties/?stream=true")
+            return response.is_async, b"".join([chunk async for chunk in response.streaming_content])
+
+        is_async, content = async_to_sync(stream)()
+        self.assertTrue(is_async)
+        self.assertEqual(len(json.loads(content)), 13)
+
+
+class FastReadTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.landlord = User.objects.create_user(username="land24", password="testpass", role="landlord")
+        cls.tenant = User.objects.create_user(username="tenant24", password="testpass", role="tenant")
+        for i, location in enumerate(("Kilimani", "Atlantis", "Westlands, Nairobi")):
+            prop = Property.objects.create(landlord=cls.landlord, name=f"Flat {i}", category="apartment",
+                                           location=location, price="12500.5", description=None if i else "Sunny")
+            app = RentalApplication.objects.create(property=prop, tenant=cls.tenant, status="approved")
+            Payment.objects.create(application=app, amount="12500.50", status="completed")
+            Review.objects.create(property=prop, tenant=cls.tenant, rating=4 - i, comment="Fine")
+        Property.objects.filter(name="Flat 0").update(
+            image="property_images/flat.jpg",
+            image_renditions={"source": "property_images/flat.jpg", "thumbnail_jpeg": "renditions/flat.jpg"},
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_rows_match_the_serializers(self):
+        from .geo import within_radius
+        from .serializers import PaymentSerializer, PropertySerializer, RentalApplicationSerializer, ReviewSerializer
+
+        renderer = JSONRenderer()
+        context = {"request": APIRequestFactory().get("/api/")}
+        radius = within_radius(Property.objects.all(), -1.29, 36.78, 50)
+        for serializer_class, queryset in ((PropertySerializer, Property.objects.all()),
+                                           (PropertySerializer, radius),
+                                           (RentalApplicationSerializer, RentalApplication.objects.all()),
+                                           (PaymentSerializer, Payment.objects.all()),
+                                           (ReviewSerializer, Review.objects.all())):
+            with self.subTest(serializer=serializer_class.__name__):
+                expected = serializer_class(queryset.order_by("pk"), many=True, context=context).data
+                rows = RowSerializer(serializer_class(context=context), row_plan(serializer_class), queryset)
+                self.assertEqual(renderer.render(rows.many(rows.values(queryset).order_by("pk"))),
+                                 renderer.render(expected))
+        # The annotated field is read only where the queryset has the annotation
+        plan = row_plan(PropertySerializer)
+        self.assertIn("distance_km", RowSerializer(PropertySerializer(), plan, radius).columns)
+        self.assertNotIn("distance_km", RowSerializer(PropertySerializer(), plan, Property.objects.all()).columns)
+
+        class ComputedSerializer(PropertySerializer):
+            summary = serializers.SerializerMethodField()
+
+            class Meta(PropertySerializer.Meta):
+                fields = PropertySerializer.Meta.fields + ["summary"]
+
+            def get_summary(self, obj):
+                return obj.name
+
+        self.assertIsNone(row_plan(ComputedSerializer))
+
+    def test_endpoints_serve_identical_bodies(self):
+        pk = Property.objects.get(name="Flat 0").pk
+        self.client.force_login(self.tenant)
+        for path in ("/api/properties/", f"/api/properties/{pk}/", "/api/properties/?lat=-1.29&lng=36.78&radius_km=50",
+                     "/api/properties/?pagination=cursor", "/api/applications/", "/api/payments/",
+                     f"/api/applications/{RentalApplication.objects.first().pk}/", "/api/reviews/"):
+            with self.subTest(path=path):
+                with mock.patch.object(RowSerializer, "represent", autospec=True,
+                                       side_effect=RowSerializer.represent) as represent:
+                    fast = self.client.get(path)
+                self.assertTrue(represent.called)
+                cache.clear()
+                with mock.patch("api.mixins.row_plan", return_value=None):
+                    slow = self.client.get(path)
+                cache.clear()
+                self.assertEqual(fast.status_code, 200)
+                self.assertEqual(fast.content, slow.content)
+
+    def test_benchmark_reports_identical_json(self):
+        results = run_serializer_benchmarks(rows=3, repeat=1)
+        self.assertEqual(set(results["serializers"]), {"properties", "applications", "payments", "reviews"})
+        for row in results["serializers"].values():
+            self.assertEqual(row["rows"], 3)
+            self.assertTrue(row["identical"])
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class AvailableListingTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.landlord = User.objects.create_user(username="land25", password="testpass", role="landlord")
+        cls.tenant = User.objects.create_user(username="tenant25", password="testpass", role="tenant")
+        cls.props = [
+            Property.objects.create(landlord=cls.landlord, name=f"Home {i}", category="house", location="Karen",
+                                    price=30000 + i, is_available=i != 2)
+            for i in range(4)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def listed(self):
+        return set(AvailableListing.objects.values_list("property_id", flat=True))
+
+    def test_maintained_incrementally(self):
+        first, second, hidden, _ = self.props
+        self.assertEqual(self.listed(), {p.pk for p in self.props if p.is_available})
+
+        Review.objects.create(property=first, tenant=self.tenant, rating=5, comment="Great")
+        row = AvailableListing.objects.get(pk=first.pk)
+        self.assertEqual((row.review_count, row.avg_rating), (1, 5.0))
+
+        second.is_available = False
+        second.save()
+        hidden.is_available = True
+        hidden.save()
+        self.assertNotIn(second.pk, self.listed())
+        self.assertIn(hidden.pk, self.listed())
+
+        self.landlord.username = "land25-renamed"
+        self.landlord.save()
+        self.assertEqual(set(AvailableListing.objects.values_list("landlord_username", flat=True)),
+                         {"land25-renamed"})
+
+        first.delete()
+        self.assertNotIn(first.pk, self.listed())
+        call_command("recompute_listings", "--check", stdout=StringIO())
+
+        # QuerySet.update() sends no signals; the command finds and fixes the drift
+        Property.objects.filter(pk=hidden.pk).update(name="Drifted")
+        with self.assertRaises(CommandError):
+            call_command("recompute_listings", "--check", stdout=StringIO())
+        call_command("recompute_listings", stdout=StringIO())
+        self.assertEqual(AvailableListing.objects.get(pk=hidden.pk).name, "Drifted")
+
+    def test_rebuild_invalidates_cached_pages(self):
+        path, home = "/api/properties/?is_available=true", self.props[3]
+        AvailableListing.objects.filter(pk=home.pk).update(name="Corrupted")
+        self.assertEqual(self.client.get(path).json()["results"][0]["name"], "Corrupted")
+        self.assertContains(self.client.get("/"), "Corrupted")
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("recompute_listings", stdout=StringIO())
+        self.assertEqual(self.client.get(path).json()["results"][0]["name"], "Home 3")
+        page = self.client.get("/")
+        self.assertContains(page, "Home 3")
+        self.assertNotContains(page, "Corrupted")
+
+    def test_list_pages_read_the_listings(self):
+        Review.objects.create(property=self.props[1], tenant=self.tenant, rating=3, comment="Fine")
+        with CaptureQueriesContext(connection) as captured:
+            listed = self.client.get("/api/properties/?is_available=true")
+        self.assertTrue(any("api_availablelisting" in q["sql"] for q in captured.captured_queries))
+        # An explicit ordering takes the regular queryset path
+        regular = self.client.get("/api/properties/?is_available=true&ordering=-created_at")
+        self.assertEqual(listed.json()["results"], regular.json()["results"])
+        self.assertEqual(listed.json()["count"], 3)
+        # The ETag comes from the listings too, and moves with their ratings
+        path, etag = "/api/properties/?is_available=true", listed["ETag"]
+        self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        Review.objects.create(property=self.props[0], tenant=self.tenant, rating=4, comment="Good")
+        etag = self.client.get(path)["ETag"]
+        self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # and with their landlord's username
+        self.landlord.username = "land25-moved"
+        self.landlord.save()
+        renamed = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(renamed.status_code, 200)
+        self.assertEqual(renamed.json()["results"][0]["landlord"], "land25-moved")
+
+        with CaptureQueriesContext(connection) as captured:
+            page = self.client.get("/")
+        self.assertTrue(any("api_availablelisting" in q["sql"] for q in captured.captured_queries))
+        self.assertContains(page, "Home 3")
+        self.assertNotContains(page, "Home 2")
@@ -1,27 +1,52 @@
+import io
+import math
+import uuid
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login
 from django.contrib.auth.views import LoginView as DjangoLoginView
 from django.contrib.auth.decorators import login_required
 from django.db import IntegrityError
-from django.db.models import Q
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from django.contrib import messages
-from django.db.models import Avg, Count
+from django.core.paginator import Paginator
+from django.utils.functional import SimpleLazyObject
 
-from .models import Property, RentalApplication, Payment, Review
-from .forms import UserRegisterForm, PropertyForm
+from .models import AvailableListing, Property, RentalApplication, Payment, PaymentLedger, Review
+from .forms import UserRegisterForm, PropertyForm, PaymentForm
 from .serializers import (
     UserSerializer,
     PropertySerializer,
     RentalApplicationSerializer,
+    ApplicationStatusBatchSerializer,
     PaymentSerializer,
+    PaymentLedgerSerializer,
     ReviewSerializer
 )
 from .permissions import IsLandlord, IsTenant, IsOwnerOrReadOnly
+from .mixins import (
+    CachedReadMixin, ConditionalGetMixin, EagerLoadingMixin, FastReadMixin, ReplicaReadMixin, StreamingListMixin,
+)
+from .cache import cache_key, entry_timeout, get_or_set
+from .search import search_properties
+from .loaders import load_property_detail
+from .geo import within_box, within_radius
+from .facets import parse_price_buckets, price_buckets, property_facets
+from .applications import bulk_update_status
+from .idempotency import MAX_KEY_LENGTH, IdempotencyKeyReused, request_fingerprint, run_once
+from .payments import DuplicatePayment, submit_payment
+from .ledger import LEDGER_FIELDS, summarize
+from .pagination import KeysetPagination, parse_datetime_or_date
+from .bulk import FORMATS, detect_format, export_properties, import_properties
+from .webhooks import SIGNATURE_HEADER, receive
+from .listings import listing_values
+from .replicas import replica_reads
+from .streaming import streaming_response
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -29,19 +54,46 @@ User = get_user_model()
 # ---------------------------
 # Frontend Function-Based Views
 # ---------------------------
+PROPERTY_LIST_PAGE_SIZE = 12
+PROPERTY_LIST_CACHE_TIMEOUT = 60 * 15
+PROPERTY_DETAIL_CACHE_TIMEOUT = 60 * 5
+
+
+@replica_reads
 def property_list(request):
-    properties = Property.objects.filter(is_available=True)
-    return render(request, 'api/property_list.html', {'properties': properties})
+    try:
+        page_number = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page_number = 1
+    # The available-listings table holds exactly what the page shows (api/listings.py)
+    properties = (AvailableListing.objects
+                  .only('property_id', 'name', 'location', 'price', 'image', 'thumbnail', 'thumbnail_webp')
+                  .order_by('-created_at'))
+    paginator = Paginator(properties, PROPERTY_LIST_PAGE_SIZE)
+    # Versioned like the API caches (and kept apart when read from a replica)
+    cache_version = cache_key('property_list', tags=['properties'])
+    # get_page() serves the last page for any number past it; key the fragment
+    # on the page actually shown, or every ?page=N would get its own entry
+    num_pages = get_or_set(f'{cache_version}:pages', lambda: paginator.num_pages, PROPERTY_LIST_CACHE_TIMEOUT,
+                           tags=['properties'])
+    page_number = min(page_number, num_pages)
+    # Only evaluated when the template's fragment cache misses, so a cached
+    # page is served without touching the database.
+    page_obj = SimpleLazyObject(lambda: paginator.get_page(page_number))
+    return render(request, 'api/property_list.html', {
+        'page_obj': page_obj,
+        'page_number': page_number,
+        'cache_version': cache_version,
+        'cache_timeout': entry_timeout(['properties'], PROPERTY_LIST_CACHE_TIMEOUT),
+    })
 
 def property_detail(request, pk):
-    # Get the property object or return a 404 if not found
-    property_obj = get_object_or_404(Property, pk=pk)
-
     error = None
     if request.method == 'POST':
         # Handle rental application submit (tenants only)
         if not request.user.is_authenticated or getattr(request.user, "role", None) != "tenant":
             return redirect('login')
+        property_obj = get_object_or_404(Property, pk=pk)
         message = (request.POST.get('message') or '').strip()
         try:
             RentalApplication.objects.create(property=property_obj, tenant=request.user, message=message)
@@ -50,45 +102,14 @@ def property_detail(request, pk):
         except IntegrityError:
             error = 'You have already applied for this property.'
 
-    # ---- Reviews context ----
-    reviews_qs = property_obj.reviews.select_related('tenant').order_by('-created_at')
-    agg = reviews_qs.aggregate(avg=Avg('rating'), count=Count('id'))
-    user_has_reviewed = (
-        request.user.is_authenticated
-        and Review.objects.filter(property=property_obj, tenant=request.user).exists()
-    )
-
-    # ---- Current user's application & payment (for payment CTA) ----
-    user_application = None
-    user_payment = None
-    if request.user.is_authenticated and getattr(request.user, "role", None) == "tenant":
-        user_application = (RentalApplication.objects
-                            .filter(property=property_obj, tenant=request.user)
-                            .order_by('-created_at')
-                            .first())
-        if user_application:
-            user_payment = (Payment.objects
-                            .filter(application=user_application)
-                            .order_by('-created_at')
-                            .first())
-
-    # ---- Pass landlord applications ----
-    landlord_applications = None
-    if request.user.is_authenticated and getattr(request.user, "role", None) == "landlord" and property_obj.landlord_id == request.user.id:
-        landlord_applications = property_obj.applications.select_related('tenant').order_by('-created_at')
-
-    # Add all the required context to the dictionary
-    context = {
-        'property': property_obj,
-        'error': error,
-        'reviews': reviews_qs,
-        'review_count': agg['count'] or 0,
-        'avg_rating': agg['avg'] or 0,
-        'user_has_reviewed': user_has_reviewed,
-        'user_application': user_application,
-        'user_payment': user_payment,
-        'landlord_applications': landlord_applications,  # Add landlord applications context
-    }
+    # Property, reviews, per-user flags and applications in a bounded number of queries.
+    # Anonymous viewers all see the same page, so their context is cached.
+    if request.user.is_authenticated:
+        context = load_property_detail(pk, request.user)
+    else:
+        key = cache_key('property_detail', pk, tags=[f'property:{pk}'])
+        context = dict(get_or_set(key, lambda: load_property_detail(pk, request.user), PROPERTY_DETAIL_CACHE_TIMEOUT))
+    context['error'] = error
 
     return render(request, 'api/property_detail.html', context)
 
@@ -154,15 +175,42 @@ class MeView(APIView):
     def get(self, request):
         return Response(UserSerializer(request.user).data)
 
+class PaymentWebhookView(APIView):
+    """
+    Gateway callbacks. Verified events go to the webhook inbox and are
+    acknowledged with 202; ``process_payment_webhooks`` applies them.
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def post(self, request):
+        status_code, data = receive(request.body, request.headers.get(SIGNATURE_HEADER))
+        return Response(data, status=status_code)
+
 class LoginView(DjangoLoginView):
     template_name = 'api/login.html'
 
-class PropertyViewSet(viewsets.ModelViewSet):
+class PropertyViewSet(ReplicaReadMixin, ConditionalGetMixin, StreamingListMixin, CachedReadMixin, FastReadMixin,
+                      EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = Property.objects.all().order_by("-created_at")
     serializer_class = PropertySerializer
+    cache_tag = "properties"
+    cache_object_tag = "property"
+    orderings = {
+        "rating": ("avg_rating", "review_count", "created_at"),
+        "-rating": ("-avg_rating", "-review_count", "-created_at"),
+        "price": ("price", "created_at"),
+        "-price": ("-price", "-created_at"),
+        "-created_at": ("-created_at",),
+        "distance": ("distance_km", "-created_at"),
+    }
+    filter_params = ("q", "category", "location", "min_price", "max_price", "is_available",
+                     "bbox", "lat", "lng", "radius_km")
+    # Query params of the lists the available-listings table answers by itself
+    listing_params = {"is_available", "page", "format"}
 
     def get_permissions(self):
-        if self.action == "create":
+        if self.action in ["create", "bulk_import", "export"]:
             return [IsAuthenticated(), IsLandlord()]
         if self.action in ["update", "partial_update", "destroy"]:
             return [IsAuthenticated(), IsOwnerOrReadOnly()]
@@ -181,10 +229,10 @@ class PropertyViewSet(viewsets.ModelViewSet):
         min_price = p.get("min_price")
         max_price = p.get("max_price")
         is_available = p.get("is_available")
-        if q:
-            qs = qs.filter(Q(name__icontains=q) | Q(description__icontains=q) | Q(location__icontains=q))
+        ordering = p.get("ordering")
         if category:
-            qs = qs.filter(category__iexact=category)
+            # Category values are lower-case choices; exact match keeps the index usable
+            qs = qs.filter(category=category.lower())
         if location:
             qs = qs.filter(location__icontains=location)
         if min_price:
@@ -193,20 +241,143 @@ class PropertyViewSet(viewsets.ModelViewSet):
             qs = qs.filter(price__lte=max_price)
         if is_available in ("true", "false"):
             qs = qs.filter(is_available=(is_available == "true"))
+        qs = self.filter_location(qs, p)
+        if q:
+            # Ranked full-text search; results are ordered by relevance
+            qs = search_properties(qs, q)
+        if ordering == "distance" and "distance_km" not in qs.query.annotations:
+            raise ValidationError({"ordering": "Ordering by distance needs lat, lng and radius_km."})
+        if ordering in self.orderings:
+            # An explicit ordering wins over relevance
+            qs = qs.order_by(*self.orderings[ordering])
+        return qs
+
+    def reads_listings(self):
+        """Whether this is the default ?is_available=true list, read from the listings table."""
+        params = self.request.query_params
+        return self.action == "list" and params.get("is_available") == "true" and set(params) <= self.listing_params
+
+    def values_queryset(self, row_serializer, queryset):
+        if self.reads_listings():
+            return listing_values(row_serializer.columns, using=queryset.db)
+        return super().values_queryset(row_serializer, queryset)
+
+    def fingerprint_queryset(self):
+        if self.reads_listings():
+            return AvailableListing.objects.all()
+        return super().fingerprint_queryset()
+
+    @action(detail=False, methods=["get"])
+    def facets(self, request):
+        """Category, price-bucket and availability counts for the current filters."""
+        raw = request.query_params.get("price_buckets")
+        bounds = parse_price_buckets(raw) if raw else price_buckets()
+        if bounds is None:
+            raise ValidationError({"price_buckets": "Expected comma-separated positive prices."})
+        # Keyed on the filters only, so ordering/pagination params share an entry
+        params = request.query_params
+        filters = sorted((k, params.get(k)) for k in self.filter_params if params.get(k))
+        key = cache_key("api:property:facets", filters, bounds, tags=(self.cache_tag,))
+        data = get_or_set(
+            key,
+            lambda: property_facets(self.filter_queryset(self.get_queryset()), bounds),
+            self.cache_timeout,
+        )
+        return Response(data)
+
+    @action(detail=False, methods=["post"], url_path="import")
+    def bulk_import(self, request):
+        """
+        Create many properties from an uploaded CSV/JSONL ``file`` (format from
+        the extension or ``?type=``). ``?dry_run=true`` only validates.
+        """
+        upload = request.FILES.get("file")
+        if upload is None:
+            raise ValidationError({"file": "Upload a CSV or JSONL file."})
+        fmt = request.query_params.get("type") or detect_format(upload.name)
+        # Decode the upload incrementally rather than reading it into memory
+        upload.seek(0)
+        stream = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+        try:
+            report = import_properties(
+                stream, fmt, request.user, dry_run=request.query_params.get("dry_run") == "true",
+            )
+        except ValueError as exc:
+            raise ValidationError({"file": str(exc)})
+        finally:
+            stream.detach()
+        if report["created"]:
+            return Response(report, status=status.HTTP_201_CREATED)
+        return Response(report, status=status.HTTP_400_BAD_REQUEST if report["error_count"] else status.HTTP_200_OK)
+
+    @action(detail=False, methods=["get"], url_path="export")
+    def export(self, request):
+        """Stream the landlord's own filtered listings as CSV (default) or ``?type=jsonl``."""
+        fmt = request.query_params.get("type", "csv")
+        if fmt not in FORMATS:
+            raise ValidationError({"type": f"Expected one of: {', '.join(FORMATS)}."})
+        queryset = self.filter_queryset(self.get_queryset()).filter(landlord=request.user)
+        response = streaming_response(request, export_properties(queryset, fmt), FORMATS[fmt])
+        response["Content-Disposition"] = f'attachment; filename="properties.{fmt}"'
+        return response
+
+    @staticmethod
+    def parse_floats(name, raw, count):
+        try:
+            values = [float(v) for v in raw.split(",")]
+        except ValueError:
+            values = []
+        if len(values) != count or not all(map(math.isfinite, values)):
+            raise ValidationError({name: f"Expected {count} comma-separated number(s)."})
+        return values
+
+    def filter_location(self, qs, p):
+        """?lat=&lng=&radius_km= (annotates distance_km) and ?bbox=min_lng,min_lat,max_lng,max_lat"""
+        bbox = p.get("bbox")
+        if bbox:
+            west, south, east, north = self.parse_floats("bbox", bbox, 4)
+            if south > north or west > east:
+                raise ValidationError({"bbox": "Expected min_lng,min_lat,max_lng,max_lat."})
+            qs = within_box(qs, south, west, north, east)
+        if any(p.get(k) for k in ("lat", "lng", "radius_km")):
+            lat, = self.parse_floats("lat", p.get("lat", ""), 1)
+            lng, = self.parse_floats("lng", p.get("lng", ""), 1)
+            radius, = self.parse_floats("radius_km", p.get("radius_km", ""), 1)
+            if not (-90 <= lat <= 90 and -180 <= lng <= 180 and 0 < radius <= 500):
+                raise ValidationError({"radius_km": "lat/lng must be valid and 0 < radius_km <= 500."})
+            qs = within_radius(qs, lat, lng, radius)
         return qs
 
-class RentalApplicationViewSet(viewsets.ModelViewSet):
+class RentalApplicationViewSet(StreamingListMixin, FastReadMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     serializer_class = RentalApplicationSerializer
-    queryset = RentalApplication.objects.select_related("property", "tenant").all()
+    queryset = RentalApplication.objects.all()
 
     def get_permissions(self):
         if self.action == "create":
             return [IsAuthenticated(), IsTenant()]
+        if self.action == "bulk_status":
+            return [IsAuthenticated(), IsLandlord()]
         return [IsAuthenticated()]
 
     def perform_create(self, serializer):
         serializer.save(tenant=self.request.user)
 
+    @action(detail=False, methods=["post"], url_path="bulk-status")
+    def bulk_status(self, request):
+        """
+        Set ``status`` on every application in ``ids`` (the landlord's own) in
+        one transaction. ``reject_others`` with ``approved`` also rejects every
+        other application for the same properties.
+        """
+        serializer = ApplicationStatusBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            data = serializer.validated_data
+            results = bulk_update_status(request.user, data["ids"], data["status"], data["reject_others"])
+        except ValueError as exc:
+            raise ValidationError({"ids": str(exc)})
+        return Response({"results": results})
+
     def get_queryset(self):
         user = self.request.user
         qs = super().get_queryset()
@@ -231,24 +402,116 @@ class RentalApplicationViewSet(viewsets.ModelViewSet):
         self.perform_update(serializer)
         return Response(serializer.data)
 
-class PaymentViewSet(viewsets.ModelViewSet):
+class PaymentViewSet(StreamingListMixin, FastReadMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     serializer_class = PaymentSerializer
-    queryset = Payment.objects.select_related("application", "application__tenant", "application__property").all()
+    queryset = Payment.objects.all()
+    # Payment history only grows; keyset pages stay one index range scan deep in it
+    pagination_class = KeysetPagination
 
     def get_permissions(self):
         if self.action in ["create"]:
             return [IsAuthenticated(), IsTenant()]
         return [IsAuthenticated()]
 
+    def get_queryset(self):
+        user = self.request.user
+        qs = super().get_queryset()
+        if user.role == "tenant":
+            qs = qs.filter(tenant=user)
+        elif user.role == "landlord":
+            qs = qs.filter(property__landlord=user)
+        else:
+            return qs.none()
+        p = self.request.query_params
+        if p.get("status"):
+            qs = qs.filter(status=p["status"])
+        if p.get("property"):
+            qs = qs.filter(property_id=self.parse_param("property", p["property"], int))
+        if p.get("since"):
+            qs = qs.filter(created_at__gte=self.parse_param("since", p["since"], parse_datetime_or_date))
+        if p.get("until"):
+            qs = qs.filter(created_at__lt=self.parse_param("until", p["until"], parse_datetime_or_date))
+        return qs.order_by("-created_at", "-id")
+
+    @staticmethod
+    def parse_param(name, raw, parse):
+        try:
+            value = parse(raw)
+        except (TypeError, ValueError):
+            value = None
+        if value is None:
+            raise ValidationError({name: "Invalid value."})
+        return value
+
+    @action(detail=False, methods=["get"])
+    def summary(self, request):
+        """
+        Completed-payment totals and last payment, overall and per property,
+        read from the payment ledger (``?property=`` narrows it to one).
+        """
+        user = request.user
+        rows = PaymentLedger.objects.all()
+        if user.role == "tenant":
+            rows = rows.filter(tenant=user)
+        elif user.role == "landlord":
+            rows = rows.filter(property__landlord=user)
+        else:
+            rows = rows.none()
+        if request.query_params.get("property"):
+            rows = rows.filter(property_id=self.parse_param("property", request.query_params["property"], int))
+        rows = list(rows.order_by("property_id").values("property_id", "property__name", *LEDGER_FIELDS))
+        by_property = {}
+        for row in rows:
+            by_property.setdefault((row["property_id"], row["property__name"]), []).append(row)
+        return Response(PaymentLedgerSerializer({
+            **summarize(rows),
+            "properties": [
+                {"property": pk, "property_name": name, **summarize(group)}
+                for (pk, name), group in by_property.items()
+            ],
+        }).data)
+
+    def create(self, request, *args, **kwargs):
+        try:
+            return self.create_once(request, *args, **kwargs)
+        except DuplicatePayment as exc:
+            return Response({"detail": str(exc), "payment": exc.payment.pk}, status=status.HTTP_409_CONFLICT)
+
+    def create_once(self, request, *args, **kwargs):
+        key = request.headers.get("Idempotency-Key")
+        if not key:
+            return super().create(request, *args, **kwargs)
+
+        def execute():
+            response = super(PaymentViewSet, self).create(request, *args, **kwargs)
+            return response.status_code, response.data
+
+        if len(key) > MAX_KEY_LENGTH:
+            raise ValidationError({"Idempotency-Key": f"Must be at most {MAX_KEY_LENGTH} characters."})
+        try:
+            status_code, body, replayed = run_once(
+                request.user.pk, "api.payments.create", key, request_fingerprint(request.data), execute,
+            )
+        except IdempotencyKeyReused:
+            return Response({"detail": "Idempotency-Key was already used with a different request."},
+                            status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+        response = Response(body, status=status_code)
+        if replayed:
+            response["Idempotent-Replayed"] = "true"
+        return response
+
     def perform_create(self, serializer):
         application = serializer.validated_data["application"]
         if application.tenant != self.request.user:
             raise PermissionDenied("You can only pay for your own applications.")
-        serializer.save()
+        # Serialized per application; raises DuplicatePayment (409 in create())
+        submit_payment(application.pk, serializer.validated_data["amount"], serializer.save)
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(ReplicaReadMixin, ConditionalGetMixin, StreamingListMixin, FastReadMixin, EagerLoadingMixin,
+                    viewsets.ModelViewSet):
     serializer_class = ReviewSerializer
-    queryset = Review.objects.select_related("property", "tenant").all()
+    queryset = Review.objects.order_by("-created_at")
+    replica_actions = ("list",)
 
     def get_permissions(self):
         if self.action == "create":
@@ -311,9 +574,38 @@ def payment_create(request, application_id):
         if form.is_valid():
             payment = form.save(commit=False)
             payment.application = application
-            # Leave status = 'pending' (default). In a real gateway, you’d update to 'completed' on success.
-            payment.save()
-            messages.success(request, "Payment submitted. Status: pending.")
+
+            def execute():
+                # Leave status = 'pending' (default). In a real gateway, you’d update to 'completed' on success.
+                submit_payment(application.pk, payment.amount, payment.save)
+                return 201, {"payment": payment.pk}
+
+            # The form carries a one-time key, so a double-click or a resubmitted
+            # POST replays the first submission instead of paying twice.
+            key = request.POST.get("idempotency_key") or ""
+            if len(key) > MAX_KEY_LENGTH:
+                messages.error(request, "This payment form is no longer valid. Please submit it again.")
+                return redirect('payment_create', application_id=application.pk)
+            try:
+                if key:
+                    _status, _body, replayed = run_once(
+                        request.user.pk, "frontend.payment_create", key, request_fingerprint(form.cleaned_data),
+                        execute,
+                    )
+                else:
+                    execute()
+                    replayed = False
+            except DuplicatePayment:
+                messages.info(request, "This payment is already pending.")
+                return redirect('property_detail', pk=application.property_id)
+            except IdempotencyKeyReused:
+                messages.error(request, "This payment form was already submitted with a different amount. "
+                                        "Please start a new payment.")
+                return redirect('payment_create', application_id=application.pk)
+            if replayed:
+                messages.info(request, "This payment was already submitted.")
+            else:
+                messages.success(request, "Payment submitted. Status: pending.")
             return redirect('property_detail', pk=application.property_id)
     else:
         form = PaymentForm()
@@ -321,6 +613,7 @@ def payment_create(request, application_id):
     return render(request, 'api/payment_create.html', {
         'form': form,
         'application': application,
+        'idempotency_key': request.POST.get("idempotency_key") or uuid.uuid4().hex,
     })
 
 from django.views.decorators.http import require_POST
@@ -342,6 +635,13 @@ def application_update_status(request, application_id):
         messages.error(request, "Invalid status.")
         return redirect('property_detail', pk=app.property_id)
 
+    if request.POST.get("reject_others") and new_status == "approved":
+        # Approve this one and reject every other application in one transaction
+        results = bulk_update_status(request.user, [app.pk], new_status, reject_others=True)
+        rejected = sum(r["result"] == "auto_rejected" for r in results)
+        messages.success(request, f"Application approved; {rejected} other application(s) rejected.")
+        return redirect('property_detail', pk=app.property_id)
+
     app.status = new_status
     app.save(update_fields=["status"])
     messages.success(request, f"Application status set to {new_status}.")
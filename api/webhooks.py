@@ -0,0 +1,157 @@
+"""
+Payment gateway webhooks.
+
+The webhook endpoint only verifies the signature and inserts the callbacks
+into the PaymentWebhookEvent inbox, so a month-end burst costs each web
+worker one INSERT per request. ``process_payment_webhooks`` drains the inbox
+in batches: one locking read of the batch, one read of the affected payments
+by transaction_id (unique index), one UPDATE per resulting status and one
+ledger update for the whole batch.
+"""
+import hashlib
+import hmac
+import json
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import invalidate_tags
+from .ledger import apply_completed_batch
+
+SIGNATURE_HEADER = "X-Gateway-Signature"
+BATCH_SIZE = 500
+MAX_EVENTS_PER_REQUEST = 1000
+# Status changes a gateway callback may make
+TRANSITIONS = {"pending": {"completed", "failed"}, "failed": {"completed"}}
+GATEWAY_STATUSES = {"completed", "failed"}
+
+
+def webhooks_configured():
+    return bool(settings.PAYMENT_WEBHOOK_SECRET)
+
+
+def sign(body, secret=None):
+    secret = secret if secret is not None else settings.PAYMENT_WEBHOOK_SECRET
+    return hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+
+
+def verify_signature(body, signature):
+    # Without a configured secret nothing verifies
+    return webhooks_configured() and bool(signature) and hmac.compare_digest(sign(body), signature)
+
+
+def parse_events(body):
+    """
+    Events from a callback body: one event object or ``{"events": [...]}``.
+    Raises ValueError when the body is malformed.
+    """
+    try:
+        data = json.loads(body)
+    except (TypeError, ValueError):
+        raise ValueError("Body must be JSON.")
+    events = data.get("events", [data]) if isinstance(data, dict) else None
+    if not isinstance(events, list) or not 0 < len(events) <= MAX_EVENTS_PER_REQUEST:
+        raise ValueError(f"Expected an event or 1-{MAX_EVENTS_PER_REQUEST} events.")
+    for event in events:
+        if not isinstance(event, dict) or not all(isinstance(event.get(k), str) and event[k]
+                                                  for k in ("event_id", "transaction_id", "status")):
+            raise ValueError("Every event needs event_id, transaction_id and status.")
+        if event["status"] not in GATEWAY_STATUSES:
+            raise ValueError(f"Unknown status {event['status']!r}.")
+    return events
+
+
+def receive(body, signature):
+    """
+    Handle one callback request: verify ``body`` against ``signature`` and
+    queue its events. Returns the ``(HTTP status, response data)`` to answer with.
+    """
+    if not webhooks_configured():
+        return 503, {"detail": "Payment webhooks are not configured."}
+    if not verify_signature(body, signature):
+        return 403, {"detail": "Invalid signature."}
+    try:
+        events = parse_events(body)
+    except ValueError as exc:
+        return 400, {"detail": str(exc)}
+    ingest(events)
+    return 202, {"received": len(events)}
+
+
+def ingest(events, using="default"):
+    """Store callbacks in the inbox; redelivered event_ids are ignored."""
+    from .models import PaymentWebhookEvent
+
+    PaymentWebhookEvent.objects.using(using).bulk_create(
+        [PaymentWebhookEvent(event_id=e["event_id"][:100], transaction_id=e["transaction_id"][:100],
+                             status=e["status"], payload=e) for e in events],
+        ignore_conflicts=True,
+    )
+
+
+def process_batch(batch_size=BATCH_SIZE, using="default"):
+    """
+    Apply up to ``batch_size`` unprocessed callbacks. Returns the number of
+    events by result (``applied``, ``ignored``, ``unknown``).
+    """
+    from .models import Payment, PaymentWebhookEvent
+
+    with transaction.atomic(using=using):
+        # skip_locked lets several workers drain the inbox side by side
+        events = list(
+            PaymentWebhookEvent.objects.using(using)
+            .select_for_update(skip_locked=True)
+            .filter(processed_at__isnull=True)
+            .order_by("id")
+            .values_list("pk", "transaction_id", "status")[:batch_size]
+        )
+        if not events:
+            return {}
+        payments = {
+            row["transaction_id"]: row
+            for row in Payment.objects.using(using).select_for_update()
+            .filter(transaction_id__in={transaction_id for _pk, transaction_id, _status in events})
+            .values("pk", "transaction_id", "status", "amount", "created_at",
+                    "tenant_id", "property_id", "application_id")
+        }
+
+        # Replay each transaction's callbacks in arrival order through TRANSITIONS
+        current = {transaction_id: row["status"] for transaction_id, row in payments.items()}
+        results = {"applied": [], "ignored": [], "unknown": []}
+        for pk, transaction_id, status in events:
+            if transaction_id not in current:
+                results["unknown"].append(pk)
+            elif status in TRANSITIONS.get(current[transaction_id], ()):
+                current[transaction_id] = status
+                results["applied"].append(pk)
+            else:
+                results["ignored"].append(pk)
+
+        changes = {t: s for t, s in current.items() if s != payments[t]["status"]}
+        for status in set(changes.values()):
+            ids = [payments[t]["pk"] for t, s in changes.items() if s == status]
+            Payment.objects.using(using).filter(pk__in=ids).update(status=status)
+        # QuerySet.update() bypasses Payment.save(), so settle the ledger here
+        apply_completed_batch(
+            [payments[t] for t, s in changes.items() if s == "completed"], using=using,
+        )
+        now = timezone.now()
+        for result, ids in results.items():
+            if ids:
+                PaymentWebhookEvent.objects.using(using).filter(pk__in=ids).update(processed_at=now, result=result)
+        if changes:
+            invalidate_tags("payments", *{f"application:{payments[t]['application_id']}" for t in changes},
+                            using=using)
+    return {result: len(ids) for result, ids in results.items()}
+
+
+def process_inbox(batch_size=BATCH_SIZE, using="default"):
+    """Drain the inbox batch by batch. Returns the totals by result."""
+    totals = {}
+    while True:
+        counts = process_batch(batch_size=batch_size, using=using)
+        if not counts:
+            return totals
+        for result, count in counts.items():
+            totals[result] = totals.get(result, 0) + count
@@ -0,0 +1,53 @@
+"""
+gunicorn settings for every deployment (Dockerfile, app.yaml, Procfile).
+
+SERVER_MODE picks the worker model:
+
+- ``wsgi`` (default): sync workers running kenyarentalhub_api.wsgi. One
+  request per worker at a time, so a slow client (a phone on a bad
+  connection trickling its request) holds a whole worker.
+- ``asgi`` (opt-in): uvicorn workers running kenyarentalhub_api.asgi, with
+  the async read views on (ASYNC_READ_VIEWS). Slow clients wait on the event
+  loop, so a worker holds hundreds of them and keeps serving everyone else,
+  but the remaining sync views (the writes included) share one thread per
+  worker and run one at a time.
+
+``python manage.py benchmark_api --url ... --slow-clients N`` measures the
+difference.
+
+Cache invalidation (api/cache.py) bumps tag versions in the cache backend,
+so every worker must share it. Without REDIS_URL the cache is in-process:
+one worker is started (with threads under WSGI), and asking for more is an
+error rather than workers serving each other's stale entries.
+"""
+import multiprocessing
+import os
+
+SERVER_MODE = os.environ.get("SERVER_MODE", "wsgi")
+if SERVER_MODE not in ("asgi", "wsgi"):
+    raise ValueError(f"SERVER_MODE must be 'asgi' or 'wsgi', not {SERVER_MODE!r}")
+
+SHARED_CACHE = bool(os.environ.get("REDIS_URL"))
+CONCURRENCY = min(multiprocessing.cpu_count() * 2 + 1, 8)
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", CONCURRENCY if SHARED_CACHE else 1))
+if workers > 1 and not SHARED_CACHE:
+    raise RuntimeError(
+        f"WEB_CONCURRENCY={workers} needs a cache shared by the workers: set REDIS_URL "
+        "(each worker's in-process cache would miss the others' invalidations)."
+    )
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "30"))
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG") or None
+
+if SERVER_MODE == "asgi":
+    wsgi_app = "kenyarentalhub_api.asgi:application"
+    worker_class = "uvicorn_worker.UvicornWorker"
+    # Read by settings.py, which the workers import after this file runs
+    os.environ.setdefault("ASYNC_READ_VIEWS", "True")
+else:
+    wsgi_app = "kenyarentalhub_api.wsgi:application"
+    # Threads share the worker's in-process cache, so a lone worker keeps
+    # serving requests concurrently
+    threads = int(os.environ.get("GUNICORN_THREADS", 1 if SHARED_CACHE else CONCURRENCY))
+    worker_class = "gthread" if threads > 1 else "sync"
@@ -9,12 +9,71 @@ DEBUG = os.environ.get("DEBUG", "False") == "True"
 ALLOWED_HOSTS = [".onrender.com", os.environ.get("EXTRA_ALLOWED_HOST", "")]
 CSRF_TRUSTED_ORIGINS = [f'https://{os.environ.get("EXTRA_ALLOWED_HOST","")}'] if os.environ.get("EXTRA_ALLOWED_HOST") else [ ]
 
+# ---------- Database ----------
+# DATABASE_POOL picks how connections are pooled:
+#   ""         one persistent connection per worker thread, kept DATABASE_CONN_MAX_AGE seconds
+#   "pgbouncer" connect through PgBouncer in transaction mode (see pgbouncer.ini);
+#              server-side cursors do not survive its connection switching
+#   "psycopg"  Django's own pool per worker process (Postgres, needs psycopg[pool] 3.x)
+# Reused connections are health-checked before each request either way.
+DATABASE_POOL = os.environ.get("DATABASE_POOL", "")
+DATABASE_CONN_MAX_AGE = int(os.environ.get("DATABASE_CONN_MAX_AGE", "600"))
+
+
+def database_config(url):
+    config = dj_database_url.parse(url, conn_max_age=DATABASE_CONN_MAX_AGE, conn_health_checks=True)
+    if DATABASE_POOL == "pgbouncer":
+        config["DISABLE_SERVER_SIDE_CURSORS"] = True
+    elif DATABASE_POOL == "psycopg":
+        try:
+            import psycopg, psycopg_pool  # noqa: F401
+        except ImportError:
+            raise ValueError("DATABASE_POOL=psycopg needs psycopg 3 with its pool: pip install 'psycopg[pool]'")
+        config["CONN_MAX_AGE"] = 0  # the pool replaces persistent connections
+        config.setdefault("OPTIONS", {})["pool"] = {
+            "min_size": int(os.environ.get("DATABASE_POOL_MIN_SIZE", "2")),
+            "max_size": int(os.environ.get("DATABASE_POOL_MAX_SIZE", "10")),
+            "timeout": int(os.environ.get("DATABASE_POOL_TIMEOUT", "10")),
+        }
+    elif DATABASE_POOL:
+        raise ValueError(f"DATABASE_POOL must be '', 'pgbouncer' or 'psycopg', not {DATABASE_POOL!r}")
+    return config
+
+
 DATABASES = {
-    "default": dj_database_url.config(
-        default=os.environ["DATABASE_URL"],  # use Internal URL inside Render
-        conn_max_age=600
-    )
+    "default": database_config(os.environ["DATABASE_URL"]),  # use Internal URL inside Render
 }
+# Comma-separated read replica URLs, as aliases replica_1, replica_2... The
+# public list/detail reads go to them (api/replicas.py); tests read the primary.
+for i, url in enumerate(filter(None, os.environ.get("DATABASE_REPLICA_URLS", "").split(",")), start=1):
+    DATABASES[f"replica_{i}"] = {**database_config(url.strip()), "TEST": {"MIRROR": "default"}}
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+DATABASE_ROUTERS = ["api.replicas.ReplicaRouter"]
+# How long a client reads only from the primary after a write; keep it above the replica lag
+REPLICA_STICKY_SECONDS = int(os.environ.get("REPLICA_STICKY_SECONDS", "10"))
+
+# ---------- Cache ----------
+# Redis in production (set REDIS_URL); otherwise Django's in-process LRU cache,
+# bounded to CACHE_MAX_ENTRIES and evicting one least-recently-used entry at a time.
+CACHE_MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES", "5000"))
+if os.environ.get("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["REDIS_URL"],
+            "TIMEOUT": 300,
+            "KEY_PREFIX": "krh",
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "kenyarentalhub",
+            "TIMEOUT": 300,
+            "OPTIONS": {"MAX_ENTRIES": CACHE_MAX_ENTRIES, "CULL_FREQUENCY": CACHE_MAX_ENTRIES},
+        }
+    }
 
 # Security flags (conditional so local dev works)
 CSRF_COOKIE_SECURE = not DEBUG
@@ -36,14 +95,17 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    # WhiteNoise, async-capable so ASGI requests stay on the event loop
+    "api.middleware.AsyncWhiteNoiseMiddleware",
+    # After WhiteNoise, so static files are not timed
+    "api.metrics.MetricsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    # After authentication: pins a client to the primary after it writes
+    "api.replicas.ReplicaStickinessMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
-
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
@@ -67,6 +129,11 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "kenyarentalhub_api.wsgi.application"
 
+# Serve the public property/review reads from the async views in
+# api/async_views.py. Only useful under an ASGI worker (gunicorn.conf.py
+# turns it on with SERVER_MODE=asgi).
+ASYNC_READ_VIEWS = os.environ.get("ASYNC_READ_VIEWS", "False") == "True"
+
 # ---------- MySQL ----------
 #DATABASES = {
     #"default": {
@@ -104,16 +171,45 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "api.authentication.StatelessJWTAuthentication",
         "rest_framework.authentication.SessionAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticatedOrReadOnly",
     ),
-    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
+    "DEFAULT_PAGINATION_CLASS": "api.pagination.HybridPagination",
     "PAGE_SIZE": 10,
 }
 
+SIMPLE_JWT = {
+    # Adds the role/username/token-version claims used by JWT_STATELESS_AUTH
+    "TOKEN_OBTAIN_SERIALIZER": "api.authentication.RoleTokenObtainPairSerializer",
+}
+
+# Authenticate JWT requests from the token's claims instead of loading the
+# user row; revocation and deactivation are seen within AUTH_USER_CACHE_TTL seconds.
+JWT_STATELESS_AUTH = os.environ.get("JWT_STATELESS_AUTH", "False") == "True"
+AUTH_USER_CACHE_TTL = int(os.environ.get("AUTH_USER_CACHE_TTL", "30"))
+AUTH_USER_CACHE_SIZE = int(os.environ.get("AUTH_USER_CACHE_SIZE", "1000"))
+
+# ---------- Metrics ----------
+# Per-endpoint timing histograms (api/metrics.py), scraped from /metrics.
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "True") == "True"
+# /metrics requires "Authorization: Bearer <METRICS_TOKEN>"; unset, it is only
+# served when DEBUG is on
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+# Requests at least this slow are logged to api.metrics.slow with their SQL
+METRICS_SLOW_REQUEST_MS = int(os.environ.get("METRICS_SLOW_REQUEST_MS", "500"))
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {
+        "api": {"handlers": ["console"], "level": os.environ.get("API_LOG_LEVEL", "INFO")},
+    },
+}
+
 STATIC_URL = "/static/"
 STATIC_ROOT = BASE_DIR / "staticfiles"
 STATICFILES_DIRS = [os.path.join(BASE_DIR, "static")]
@@ -121,6 +217,27 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, "static")]
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Property image renditions are built off the request thread by this many
+# worker threads; IMAGE_PROCESSING_EAGER runs them inline (tests, one-off scripts).
+IMAGE_WORKERS = int(os.environ.get("IMAGE_WORKERS", "2"))
+IMAGE_PROCESSING_EAGER = os.environ.get("IMAGE_PROCESSING_EAGER", "False") == "True"
+
+# Upper bounds (KES) of the price buckets in /api/properties/facets/; clients
+# can override them per request with ?price_buckets=.
+FACET_PRICE_BUCKETS = [10000, 20000, 35000, 50000, 100000]
+
+# How long (seconds) a payment Idempotency-Key and its stored response are kept.
+IDEMPOTENCY_KEY_TTL = int(os.environ.get("IDEMPOTENCY_KEY_TTL", str(60 * 60 * 24)))
+
+# A keyless payment of the same amount as a pending one submitted this many
+# seconds earlier is refused as a double submit (409).
+PAYMENT_DUPLICATE_WINDOW = int(os.environ.get("PAYMENT_DUPLICATE_WINDOW", "120"))
+
+# Shared secret for the HMAC-SHA256 signature on payment gateway callbacks.
+# There is no default: while it is unset, the webhook rejects every callback.
+PAYMENT_WEBHOOK_SECRET = os.environ.get("PAYMENT_WEBHOOK_SECRET", "")
+
 STORAGES = {
-    "staticfiles": {"BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage"}
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage"},
 }
@@ -4,12 +4,14 @@ from django.contrib.auth.views import LoginView, LogoutView
 from django.conf import settings
 from django.conf.urls.static import static
 from api.views import application_update_status
+from api.metrics import metrics_view
 
 # Import your frontend views
 from api.views import register, property_list, property_detail, application_create, property_create, property_review_create,payment_create
 
 # DRF router for backend API
 from rest_framework.routers import DefaultRouter
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from api.views import (
     PropertyViewSet,
     RentalApplicationViewSet,
@@ -17,6 +19,7 @@ from api.views import (
     ReviewViewSet,
     RegisterView,
     MeView,
+    PaymentWebhookView,
 )
 
 router = DefaultRouter()
@@ -25,13 +28,31 @@ router.register(r"applications", RentalApplicationViewSet, basename="application
 router.register(r"payments", PaymentViewSet, basename="payment")
 router.register(r"reviews", ReviewViewSet, basename="review")
 
+# Under ASGI, the hot public reads are served by async views; they shadow
+# the router's routes and hand anything else back to the same viewsets.
+async_read_urls = []
+if settings.ASYNC_READ_VIEWS:
+    from api import async_views
+
+    async_read_urls = [
+        path("api/properties/", async_views.property_list, name="property-list"),
+        path("api/properties/<int:pk>/", async_views.property_detail, name="property-detail"),
+        path("api/reviews/", async_views.review_list, name="review-list"),
+    ]
+
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("metrics", metrics_view, name="metrics"),
 
     # Backend API routes (DRF)
+    # Ahead of the router so "webhook" is not taken for a payment id
+    path("api/payments/webhook/", PaymentWebhookView.as_view(), name="payment-webhook"),
+    *async_read_urls,
     path("api/", include(router.urls)),
     path("api/auth/register/", RegisterView.as_view(), name="auth-register"),
     path("api/auth/login/", include('rest_framework.urls')),
+    path("api/auth/token/", TokenObtainPairView.as_view(), name="auth-token"),
+    path("api/auth/token/refresh/", TokenRefreshView.as_view(), name="auth-token-refresh"),
     path("api/auth/me/", MeView.as_view(), name="auth-me"),
 
     # Frontend pages